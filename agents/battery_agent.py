@@ -1,23 +1,70 @@
-import pandas as pd
+import asyncio
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.soh_forecast import forecast_vehicle
+from agents.telemetry_sources import TELEMETRY_COLUMNS, FrameTelemetrySource, open_source
+from agents.tracing import span
+
+# Thresholds on per-cycle SoH drop (percentage points)
+ANOMALY_THRESHOLD = 30.0
+HIGH_DEGRADATION_THRESHOLD = 0.3
+RAPID_DEGRADATION_THRESHOLD = 0.2
+MODERATE_DEGRADATION_THRESHOLD = 0.1
+
+STATUS_RULES = [
+    # (minimum average loss, status, recommendation), checked in order
+    (RAPID_DEGRADATION_THRESHOLD, "rapid degradation", "Schedule battery inspection immediately."),
+    (MODERATE_DEGRADATION_THRESHOLD, "moderate degradation", "Monitor battery health closely."),
+]
+DEFAULT_STATUS = ("normal degradation", "No immediate action required.")
+
+# Temperature weights the SoH forecast; sources without it are still read
+ANALYSIS_COLUMNS = TELEMETRY_COLUMNS + ['temperature']
+
+def classify_status(avg_loss):
+    """Map an average SoH loss per cycle to a (status, recommendation) pair."""
+    for threshold, status, recommendation in STATUS_RULES:
+        if avg_loss > threshold:
+            return status, recommendation
+    return DEFAULT_STATUS
 
 class BatteryInsightAgent:
-    def __init__(self, state, data_path):
+    def __init__(self, state, data_path=None, vehicle_id=None, start=None, end=None, data=None):
         self.state = state
         self.data_path = data_path
+        # Already-loaded telemetry (DataFrame, Arrow table or file bytes);
+        # takes precedence over data_path so nothing is parsed twice
+        self.data = data
+        # Optional filters, pushed down to the file by columnar sources
+        self.vehicle_id = vehicle_id
+        self.start = start
+        self.end = end
     
-    # Load battery data from CSV (instance method)
+    # Load battery data from CSV or Parquet (instance method)
     ## Instance methods are functions defined in a class 
     ## that operate on an instance of that class. 
     ## They always take self as the first parameter,
     ## which refers to the object itself.
     def load_data(self):
-        df = pd.read_csv(self.data_path)
-        df['date'] = pd.to_datetime(df['date'])
-        df.sort_values('date', inplace=True)
+        if self.data is not None:
+            source = FrameTelemetrySource(self.data)
+        elif self.data_path is not None:
+            source = open_source(self.data_path)
+        else:
+            raise ValueError("BatteryInsightAgent needs either data or data_path")
+        with span("csv_load", source=type(source).__name__):
+            df = source.read(columns=ANALYSIS_COLUMNS,
+                             vehicle_ids=[self.vehicle_id] if self.vehicle_id is not None else None,
+                             start=self.start, end=self.end)
+        # Columnar sources are written sorted; skip the sort when it is a no-op
+        if not df['date'].is_monotonic_increasing:
+            df.sort_values('date', inplace=True)
         df['SoH_drop'] = df['SoH'].shift(1) - df['SoH']
         return df
     
-    def detect_anomalies(self, df, threshold=30.0):
+    def detect_anomalies(self, df, threshold=ANOMALY_THRESHOLD):
         anomalies = df[df['SoH_drop'] > threshold]
         return anomalies['date'].tolist()
     
@@ -26,11 +73,11 @@ class BatteryInsightAgent:
         return avg_drop
     
     def fast_slow_decline(self, df, fast_threshold=0.5):
-        fast = df[df['charge_type'] =="fast"]
-        slow = df[df['charge_type'] =="slow"]
+        # One grouped pass instead of a filtered copy per charge type
+        means = df.groupby('charge_type')['SoH_drop'].mean()
         return {
-            'fast_avg_drop': fast['SoH_drop'].mean(),
-            'slow_avg_drop': slow['SoH_drop'].mean()
+            'fast_avg_drop': means.get('fast', float('nan')),
+            'slow_avg_drop': means.get('slow', float('nan'))
         }
     
     def analyze(self):
@@ -39,18 +86,10 @@ class BatteryInsightAgent:
         avg_loss = self.calculate_average_loss(battery_data)
         decline_types = self.fast_slow_decline(battery_data)
 
-        high_degradation = battery_data[battery_data['SoH_drop'] > 0.3]
+        high_degradation = battery_data[battery_data['SoH_drop'] > HIGH_DEGRADATION_THRESHOLD]
         highlight_dates = high_degradation['date'].tolist()
 
-        if avg_loss > 0.2:
-            status = "rapid degradation"
-            recommendation = "Schedule battery inspection immediately."
-        elif avg_loss > 0.1:
-            status = "moderate degradation"
-            recommendation = "Monitor battery health closely."
-        else:
-            status = "normal degradation"
-            recommendation = "No immediate action required."
+        status, recommendation = classify_status(avg_loss)
             
         insights = {
             "status": status,
@@ -60,12 +99,18 @@ class BatteryInsightAgent:
             "decline_types": decline_types,
             "anomalies_count": anomalies,
             "highlight_dates": highlight_dates,
-            "latest_soh": round(battery_data['SoH'].iloc[-1], 2)
+            "latest_soh": round(battery_data['SoH'].iloc[-1], 2),
+            # Projected days until SoH reaches the service floor (None if too little data)
+            "forecast": forecast_vehicle(battery_data)
         }
 
         # Update state with results
         self.state["battery_insight"] = insights
         return self.state
+
+    async def aanalyze(self):
+        """Async analyze(): file reading and pandas work run on a worker thread, off the event loop."""
+        return await asyncio.to_thread(self.analyze)
     
     # Example use
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+"""
+Memory-mapped SQLite chunk store for the service-manual vector index.
+
+Replaces the pickled LangChain docstore (`index.pkl`): chunk text and
+metadata live in `chunks.sqlite` next to `index.faiss`, keyed by FAISS
+position. Readers open it read-only with SQLite memory-mapping, so worker
+processes share the OS page cache and only the chunks a search hits are
+materialized as Documents. Nothing is unpickled.
+
+Each chunk's ODIN routine ids, procedure flag, section name and summary are
+extracted once when the index is built and stored in its metadata; a
+`routines` table maps every PROC_* routine id to the chunks mentioning it.
+
+Migrate an existing index (or refresh an existing store's metadata) with:
+
+    python agents/chunk_store.py vector_index
+"""
+import json
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+
+CHUNK_STORE_FILE = "chunks.sqlite"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+ODIN_ROUTINE_PATTERN = re.compile(r'PROC_[A-Z0-9_-]+')
+WRAPPED_HYPHEN_PATTERN = re.compile(r'-\s*\n\s*')  # routine ids broken across PDF lines
+DOT_LEADER_PATTERN = re.compile(r'\s*\.{3,}.*$')  # table-of-contents "Title ....... 28"
+MAX_SECTION_TITLE = 60
+# Metadata keys filled in by extract_chunk_metadata when the index is built
+EXTRACTED_KEYS = ("odin_routines", "has_procedure", "section", "summary")
+
+
+def _section_title(content):
+    # First heading-like line: short, not a sentence or list item (this skips
+    # the disclaimer every manual page starts with)
+    for line in content.splitlines():
+        line = DOT_LEADER_PATTERN.sub("", line.strip())
+        if line and len(line) <= MAX_SECTION_TITLE and not line.endswith(".") and not line[0].isdigit():
+            return line
+    return "Unknown"
+
+
+def extract_chunk_metadata(content):
+    """Routine ids, procedure flag, section name and summary for one chunk of manual text."""
+    routines = ODIN_ROUTINE_PATTERN.findall(WRAPPED_HYPHEN_PATTERN.sub("-", content))
+    return {
+        # Unique, in order of first appearance
+        "odin_routines": list(dict.fromkeys(routines)),
+        "has_procedure": 'SOH' in content or 'procedure' in content.lower(),
+        "section": _section_title(content),
+        "summary": content[:200] + "...",
+    }
+
+
+class _PositionMap(Mapping):
+    # Lazy stand-in for FAISS.index_to_docstore_id: FAISS position -> chunk id
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, position):
+        row = self._store._query("SELECT id FROM chunks WHERE position = ?", (int(position),)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self):
+        return (row[0] for row in self._store._query("SELECT position FROM chunks ORDER BY position"))
+
+    def __len__(self):
+        return len(self._store)
+
+
+class ChunkStore:
+    """Read-only, docstore-compatible view of `chunks.sqlite` (implements `search(id)`)."""
+
+    def __init__(self, path, mmap_size=DEFAULT_MMAP_SIZE):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self.index_to_docstore_id = _PositionMap(self)
+
+    def _connection(self):
+        # One connection per thread and process (SQLite handles must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    @staticmethod
+    def _document(row):
+        from langchain_core.documents import Document
+
+        doc_id, content, metadata = row
+        return Document(page_content=content, metadata=json.loads(metadata), id=doc_id)
+
+    def search(self, doc_id):
+        row = self._query("SELECT id, content, metadata FROM chunks WHERE id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return f"ID {doc_id} not found."
+        return self._document(row)
+
+    def get_by_position(self, position):
+        row = self._query("SELECT id, content, metadata FROM chunks WHERE position = ?",
+                          (int(position),)).fetchone()
+        return self._document(row) if row is not None else None
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def find_routine(self, routine_id):
+        """Chunks that mention an ODIN routine id, via the inverted index (no embedding search)."""
+        rows = self._query(
+            "SELECT c.id, c.content, c.metadata FROM routines r JOIN chunks c ON c.position = r.position "
+            "WHERE r.routine = ? ORDER BY c.position", (routine_id,)).fetchall()
+        return [self._document(row) for row in rows]
+
+    def routine_ids(self):
+        return [row[0] for row in self._query("SELECT DISTINCT routine FROM routines ORDER BY routine")]
+
+    def to_docstore(self):
+        """Materialize every chunk as (InMemoryDocstore, index_to_docstore_id), for the index builder."""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        docs = {}
+        index_to_docstore_id = {}
+        for position, doc_id, content, metadata in self._query(
+                "SELECT position, id, content, metadata FROM chunks ORDER BY position"):
+            docs[doc_id] = self._document((doc_id, content, metadata))
+            index_to_docstore_id[position] = doc_id
+        return InMemoryDocstore(docs), index_to_docstore_id
+
+    @staticmethod
+    def write(path, docstore, index_to_docstore_id):
+        """Write a complete store to a temp file, then rename it over `path` so readers never see it half-written."""
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute(
+            "CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+            "content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        conn.execute("CREATE TABLE routines (routine TEXT NOT NULL, position INTEGER NOT NULL)")
+        rows = []
+        routine_rows = []
+        for position, doc_id in index_to_docstore_id.items():
+            doc = docstore.search(doc_id)
+            metadata = dict(doc.metadata)
+            if not all(key in metadata for key in EXTRACTED_KEYS):
+                # Chunks from older builds: extract once here
+                metadata = {**extract_chunk_metadata(doc.page_content), **metadata}
+            rows.append((int(position), doc_id, doc.page_content, json.dumps(metadata, default=str)))
+            routine_rows.extend((routine, int(position)) for routine in metadata["odin_routines"])
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO routines VALUES (?, ?)", routine_rows)
+        conn.execute("CREATE INDEX routines_by_id ON routines (routine)")
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, path)
+        return path
+
+
+def open_chunk_store(index_path):
+    path = os.path.join(index_path, CHUNK_STORE_FILE)
+    return ChunkStore(path) if os.path.exists(path) else None
+
+
+def save_vector_store(vector_store, index_path):
+    """
+    Replacement for FAISS.save_local that writes `index.faiss` plus `chunks.sqlite` (no pickle).
+
+    Each file is replaced by a rename, but the pair is not swapped as one: a
+    reader loading in between can see the new index with the old chunks. The
+    retriever checks the vector and chunk counts agree when it loads.
+    """
+    import faiss
+
+    os.makedirs(index_path, exist_ok=True)
+    index_file = os.path.join(index_path, "index.faiss")
+    faiss.write_index(vector_store.index, index_file + ".tmp")
+    os.replace(index_file + ".tmp", index_file)
+    ChunkStore.write(os.path.join(index_path, CHUNK_STORE_FILE),
+                     vector_store.docstore, vector_store.index_to_docstore_id)
+    legacy = os.path.join(index_path, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+
+def migrate_pickle_docstore(index_path, remove_pickle=True):
+    """
+    Convert a legacy `index.pkl` docstore into `chunks.sqlite`.
+
+    This is the one place that still unpickles; only run it on indexes you built.
+    """
+    legacy = os.path.join(index_path, LEGACY_DOCSTORE_FILE)
+    with open(legacy, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    path = ChunkStore.write(os.path.join(index_path, CHUNK_STORE_FILE), docstore, index_to_docstore_id)
+    if remove_pickle:
+        os.remove(legacy)
+    return path
+
+
+def refresh_chunk_store(index_path):
+    """Rewrite an existing chunk store, adding extracted metadata and the routine index."""
+    path = os.path.join(index_path, CHUNK_STORE_FILE)
+    docstore, index_to_docstore_id = ChunkStore(path).to_docstore()
+    return ChunkStore.write(path, docstore, index_to_docstore_id)
+
+
+if __name__ == "__main__":
+    index_path = sys.argv[1] if len(sys.argv) > 1 else "vector_index"
+    if os.path.exists(os.path.join(index_path, LEGACY_DOCSTORE_FILE)):
+        path = migrate_pickle_docstore(index_path)
+    else:
+        path = refresh_chunk_store(index_path)
+    store = ChunkStore(path)
+    print(f"✅ Wrote {len(store)} chunks ({len(store.routine_ids())} ODIN routines) to {path}")
@@ -17,6 +17,11 @@ class ComunicationAgent:
         summary = f"""Battery State of Health (SoH): {soh}%.\n
         The system detected {len(anomalies)} anomalies and an average SoH decline of {avg_loss} per cycle.\n"""
 
+        forecast = self.insight.get("forecast") or {}
+        if forecast.get("projected_date"):
+            summary += f"""
+        At the current rate, SoH is projected to reach {forecast['soh_floor']:g}% around {forecast['projected_date']}.\n"""
+
         return summary
     
     def summarize_plan(self):
@@ -62,6 +67,10 @@ class ComunicationAgent:
         """
         self.state["user_message"] = email_content
         return self.state
+
+    async def aemail_summary(self):
+        # String formatting only; nothing to offload
+        return self.email_summary()
     
 if __name__ == "__main__":
     mock_state = {
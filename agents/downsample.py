@@ -0,0 +1,98 @@
+"""
+Downsampling of long time series for plotting.
+
+A browser chart of a million SoH readings is slow to draw and no more
+readable than one of a couple of thousand. Largest-Triangle-Three-Buckets
+(LTTB) keeps a fixed number of points while preserving the shape of the
+series: peaks, drops and anomalies survive, unlike plain striding or
+averaging. A whole fleet is summarized by fleet_overview() instead of
+drawing one series per vehicle.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHART_POINTS = 2000
+FLEET_WORST_SERIES = 5  # vehicles drawn individually in the fleet overview
+
+
+def lttb_indices(x, y, n_out=DEFAULT_CHART_POINTS):
+    """
+    Indices of the points LTTB keeps, in order; the first and last points are always kept.
+
+    Args:
+        x (array-like): Ascending x values (numbers or datetime64).
+        y (array-like): Values to plot; NaNs should be dropped beforehand.
+        n_out (int): Number of points to keep.
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets over the inner points; bucket i is points[bounds[i]:bounds[i + 1]]
+    bounds = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    sizes = np.diff(bounds)
+    # Mean of every bucket, from prefix sums; the point after the last bucket is the last point
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    mean_x = np.append((cum_x[bounds[1:]] - cum_x[bounds[:-1]]) / sizes, x[-1])
+    mean_y = np.append((cum_y[bounds[1:]] - cum_y[bounds[:-1]]) / sizes, y[-1])
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        # Twice the area of the triangle (point a, candidate, mean of the next bucket)
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def downsample_frame(df, x, y, n_out=DEFAULT_CHART_POINTS):
+    """
+    Rows of `df` chosen by LTTB on columns `x` and `y`, sorted by `x`.
+
+    Rows with a missing `y` are dropped first; frames already short enough
+    are returned sorted but otherwise unchanged.
+    """
+    df = df[[x, y]].dropna(subset=[y])
+    if not df[x].is_monotonic_increasing:
+        df = df.sort_values(x, kind='stable')
+    if len(df) <= n_out:
+        return df.reset_index(drop=True)
+    kept = lttb_indices(df[x].to_numpy(), df[y].to_numpy(), n_out)
+    return df.iloc[kept].reset_index(drop=True)
+
+
+def fleet_overview(df, group, x, y, n_out=DEFAULT_CHART_POINTS, worst=FLEET_WORST_SERIES):
+    """
+    A bounded chart of many series: the per-`x` mean and min of `y`, plus
+    the `worst` groups by latest `y`, each downsampled with LTTB.
+
+    All aggregation is grouped pandas work (no Python loop over groups), and
+    the result has at most `worst + 2` series and `n_out` points in total,
+    however many groups `df` holds. Returns columns `series`, `x` and `y`;
+    the worst groups are labelled by their id.
+    """
+    df = df[[group, x, y]].dropna(subset=[y])
+    if df.empty:
+        return pd.DataFrame(columns=["series", x, y])
+    per_x = df.groupby(x, sort=True)[y].agg(["mean", "min"])
+    latest = df.loc[df.groupby(group, observed=True)[x].idxmax()]
+    worst_ids = latest.nsmallest(worst, y)[group].tolist()
+
+    series = [("Fleet mean", per_x["mean"].rename(y).reset_index()),
+              ("Fleet min", per_x["min"].rename(y).reset_index())]
+    picked = df[df[group].isin(worst_ids)]
+    series += [(str(key), rows[[x, y]]) for key, rows in picked.groupby(group, observed=True)]
+    per_series = max(n_out // len(series), 3)
+    return pd.concat([downsample_frame(rows, x, y, per_series).assign(series=name)
+                      for name, rows in series], ignore_index=True)[["series", x, y]]
@@ -0,0 +1,100 @@
+"""
+FAISS index types for the service-manual vector store.
+
+The builder (data/vector_embeddings.py) creates and trains the configured
+index type and records it in `index_meta.json`; the retriever reads that file
+to memory-map the index and apply search-time parameters.
+"""
+import json
+import math
+import os
+
+INDEX_META_FILE = "index_meta.json"
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8")
+# Index types that cannot drop vectors while keeping positional ids compact
+# (HNSW has no remove_ids; IVF keeps the old labels), so removals need a rebuild
+REBUILD_ON_REMOVE_TYPES = ("ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULT_SEARCH_PARAMS = {"nprobe": 8, "ef_search": 64}
+
+
+def factory_string(index_type, n_vectors, dim, nlist=None, pq_m=None, pq_nbits=None, hnsw_m=32):
+    """Translate an index type and corpus size into a faiss.index_factory string."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+
+    # IVF: ~4*sqrt(n) lists, but keep >= 39 training points per list
+    if nlist is None:
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        if pq_m is None:
+            pq_m = next(m for m in (48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+        if pq_nbits is None:
+            # PQ training needs at least 2**nbits points
+            pq_nbits = max(1, min(8, int(math.log2(max(n_vectors, 2)))))
+        return f"IVF{nlist},PQ{pq_m}x{pq_nbits}"
+    raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+
+def make_faiss_index(vectors, index_type="flat", **params):
+    """Create an empty index of the given type, trained on `vectors` if it needs training."""
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(index_type, n_vectors, dim, **params))
+    if hasattr(index, "do_polysemous_training"):
+        # Polysemous codes only help Hamming-filtered search, which is not used,
+        # and their training dominates IVF-PQ build time
+        index.do_polysemous_training = False
+    if not index.is_trained:
+        index.train(vectors)
+    return index
+
+
+def read_index_meta(index_path):
+    path = os.path.join(index_path, INDEX_META_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat"}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_index_meta(index_path, meta):
+    with open(os.path.join(index_path, INDEX_META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_faiss_index(index_path, mmap=True):
+    """Read `index.faiss`, memory-mapped (read-only, pages shared between processes) when possible."""
+    import faiss
+
+    path = os.path.join(index_path, "index.faiss")
+    if not mmap:
+        return faiss.read_index(path)
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """Set IVF nprobe / HNSW efSearch on an index (no-op for other types)."""
+    import faiss
+
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
@@ -0,0 +1,115 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.battery_agent import (
+    ANOMALY_THRESHOLD,
+    DEFAULT_STATUS,
+    HIGH_DEGRADATION_THRESHOLD,
+    STATUS_RULES,
+)
+from agents.soh_forecast import SOH_SERVICE_FLOOR, forecast_fleet, forecast_summary
+
+class FleetBatteryAnalyzer:
+    """
+    Vectorized BatteryInsightAgent for a whole fleet.
+
+    Takes one long table keyed by vehicle id and computes every per-vehicle
+    metric with grouped pandas operations, so there is no Python-level loop
+    per vehicle. `analyze()` returns the same `battery_insight` dict shape as
+    BatteryInsightAgent.analyze(), keyed by vehicle id.
+    """
+
+    def __init__(self, vehicle_column="vin"):
+        self.vehicle_column = vehicle_column
+
+    def prepare(self, df):
+        """Parse dates, sort by vehicle and date, and add a per-vehicle SoH_drop column."""
+        vin = self.vehicle_column
+        df = df.assign(date=pd.to_datetime(df['date']))
+        df = df.sort_values([vin, 'date'], kind='stable', ignore_index=True)
+        df['SoH_drop'] = df.groupby(vin, sort=False)['SoH'].shift(1) - df['SoH']
+        return df
+
+    def summarize(self, df):
+        """
+        Per-vehicle metrics as a DataFrame indexed by vehicle id.
+
+        Args:
+            df (pd.DataFrame): Output of prepare().
+        """
+        vin = self.vehicle_column
+        grouped = df.groupby(vin, sort=True)
+
+        latest = df.drop_duplicates(vin, keep='last').set_index(vin)['SoH']
+        summary = pd.DataFrame({'average_loss_per_cycle': grouped['SoH_drop'].mean()})
+        summary['latest_soh'] = latest.reindex(summary.index).round(2)
+
+        decline = (df.groupby([vin, 'charge_type'], sort=False)['SoH_drop'].mean()
+                     .unstack('charge_type')
+                     .reindex(index=summary.index, columns=['fast', 'slow']))
+        summary['fast_avg_drop'] = decline['fast']
+        summary['slow_avg_drop'] = decline['slow']
+
+        summary['anomalies'] = self._dates_where(df, df['SoH_drop'] > ANOMALY_THRESHOLD, summary.index)
+        summary['highlight_dates'] = self._dates_where(
+            df, df['SoH_drop'] > HIGH_DEGRADATION_THRESHOLD, summary.index)
+
+        avg_loss = summary['average_loss_per_cycle'].to_numpy()
+        conditions = [avg_loss > threshold for threshold, _, _ in STATUS_RULES]
+        summary['status'] = np.select(conditions, [status for _, status, _ in STATUS_RULES],
+                                      default=DEFAULT_STATUS[0])
+        summary['recommendation'] = np.select(conditions, [rec for _, _, rec in STATUS_RULES],
+                                              default=DEFAULT_STATUS[1])
+        return summary
+
+    def _dates_where(self, df, mask, index):
+        # Lists of matching dates per vehicle; vehicles without matches get []
+        dates = df.loc[mask, [self.vehicle_column, 'date']].groupby(self.vehicle_column)['date'].agg(list)
+        dates = dates.reindex(index)
+        return dates.where(dates.notna(), pd.Series([[] for _ in range(len(index))], index=index))
+
+    def analyze(self, df):
+        """Return {vehicle_id: battery_insight dict} for every vehicle in `df`."""
+        df = self.prepare(df)
+        summary = self.summarize(df)
+        forecasts = self.forecast(df)
+        insights = {}
+        for vehicle_id, row in zip(summary.index, summary.to_dict('records')):
+            insights[vehicle_id] = {
+                "status": row['status'],
+                "recommendation": row['recommendation'],
+                "anomalies": row['anomalies'],
+                "average_loss_per_cycle": row['average_loss_per_cycle'],
+                "decline_types": {
+                    'fast_avg_drop': row['fast_avg_drop'],
+                    'slow_avg_drop': row['slow_avg_drop']
+                },
+                "anomalies_count": row['anomalies'],
+                "highlight_dates": row['highlight_dates'],
+                "latest_soh": row['latest_soh'],
+                "forecast": forecasts.get(vehicle_id)
+            }
+        return insights
+
+    def forecast(self, df, floor=SOH_SERVICE_FLOOR):
+        """
+        {vehicle_id: battery_insight `forecast` dict or None}, fitted for all vehicles at once.
+
+        Args:
+            df (pd.DataFrame): Output of prepare().
+        """
+        fleet = forecast_fleet(df, vehicle_column=self.vehicle_column, floor=floor)
+        return {vehicle_id: forecast_summary(row, floor)
+                for vehicle_id, row in zip(fleet.index, fleet.to_dict('records'))}
+
+if __name__ == "__main__":
+    df = pd.read_csv('battery_logs.csv')
+    if 'vin' not in df.columns:
+        df['vin'] = 'VIN_0'
+    results = FleetBatteryAnalyzer().analyze(df)
+    for vehicle_id, insight in results.items():
+        print(f"{vehicle_id}: {insight['status']} (latest SoH {insight['latest_soh']})")
@@ -0,0 +1,274 @@
+"""
+Fleet-wide appointment assignment.
+
+Booking vehicles one at a time hands the earliest slots to whoever asks
+first. FleetScheduler instead takes every vehicle that needs service in a
+batch, together with all free dealer capacity, and assigns them jointly to
+keep total weighted wait low:
+
+  * each vehicle's weight comes from its plan urgency, raised for a lower
+    latest SoH (URGENCY_WEIGHTS, SOH_WEIGHT_BOOST);
+  * vehicles are served in descending weight, each taking the earliest free
+    slot (optionally at its preferred dealer) before its urgency deadline,
+    but not before its urgency's lead time (URGENCY_LEAD_DAYS, as in
+    SlotInventory.book_many).
+
+This is a greedy heuristic that follows Smith's ordering (heaviest unit
+job first), which would be optimal for weighted wait on its own; lead
+days, deadlines and preferred dealers restrict which slots a vehicle may
+take, so the result is not guaranteed optimal. Urgency classes never
+overlap in weight, so tighter deadlines are always served first. The
+sweep keeps one pointer per urgency into the time-ordered free slots (plus
+one per urgency and preferred dealer), so a solve is O(V log V + S) for V
+vehicles and S slots.
+"""
+import bisect
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.scheduler_agent import SchedulerAgent
+from agents.slot_inventory import get_slot_inventory, not_before
+from agents.tracing import span
+
+URGENCY_WEIGHTS = {"high": 10.0, "medium": 3.0, "low": 1.0}
+# Days from tomorrow by which a vehicle of this urgency should be seen (None: no deadline)
+URGENCY_DEADLINE_DAYS = {"high": 3, "medium": 14, "low": None}
+# Up to +50% weight as SoH falls from SOH_WEIGHT_CEILING to SOH_WEIGHT_FLOOR
+SOH_WEIGHT_BOOST = 0.5
+SOH_WEIGHT_CEILING = 100.0
+SOH_WEIGHT_FLOOR = 60.0
+
+
+def vehicle_weight(urgency, latest_soh=None):
+    """Priority weight for one vehicle; higher means it should be seen sooner."""
+    weight = URGENCY_WEIGHTS.get(urgency, URGENCY_WEIGHTS["low"])
+    if latest_soh is None:
+        return weight
+    wear = (SOH_WEIGHT_CEILING - float(latest_soh)) / (SOH_WEIGHT_CEILING - SOH_WEIGHT_FLOOR)
+    return weight * (1 + SOH_WEIGHT_BOOST * min(max(wear, 0.0), 1.0))
+
+
+def unique_vehicles(vehicles):
+    """One entry per vehicle id, the heaviest if it appears more than once; vehicles without an id are dropped."""
+    best = {}
+    for vehicle in vehicles:
+        vehicle_id = vehicle.get("vehicle_id")
+        if vehicle_id is None:
+            continue
+        current = best.get(vehicle_id)
+        if current is None or (vehicle_weight(vehicle.get("urgency"), vehicle.get("latest_soh"))
+                               > vehicle_weight(current.get("urgency"), current.get("latest_soh"))):
+            best[vehicle_id] = vehicle
+    return list(best.values())
+
+
+def _deadline(today, urgency):
+    days = URGENCY_DEADLINE_DAYS.get(urgency)
+    if days is None:
+        return None
+    return datetime.combine(today + timedelta(days=1 + days), datetime.min.time()).isoformat()
+
+
+def _assignment(vehicle, dealer, start, origin, deadline, existing=False):
+    urgency = vehicle.get("urgency")
+    slot = datetime.fromisoformat(start) if start is not None else None
+    return {
+        "vehicle_id": vehicle["vehicle_id"],
+        "urgency": urgency,
+        "weight": round(vehicle_weight(urgency, vehicle.get("latest_soh")), 3),
+        "dealer": dealer,
+        "slot": slot,
+        "wait_days": round((slot - origin).total_seconds() / 86400, 3) if slot is not None else None,
+        "late": start is None or (deadline is not None and start >= deadline),
+        "existing": existing,
+    }
+
+
+class _SlotCursor:
+    # Earliest slot with room left, over positions into the shared free-slot list
+    def __init__(self, positions, remaining, start=0):
+        self.positions = positions
+        self.remaining = remaining
+        self.i = start
+
+    def peek(self):
+        while self.i < len(self.positions) and self.remaining[self.positions[self.i]] == 0:
+            self.i += 1
+        return self.positions[self.i] if self.i < len(self.positions) else None
+
+
+class FleetScheduler:
+    """
+    Assigns a batch of vehicles to dealer slots, heaviest first, to keep weighted wait low.
+
+    Args:
+        inventory (SlotInventory): Slot inventory to read capacity from and book into
+            (default: the process-wide one).
+    """
+
+    def __init__(self, inventory=None):
+        self.inventory = inventory if inventory is not None else get_slot_inventory()
+
+    def vehicles_from_states(self, states):
+        """
+        Vehicles needing service, from workflow states after the service_plan node.
+
+        States without a vehicle id are left out; schedule_states() books them as one-offs.
+        """
+        vehicles = []
+        for state in states:
+            agent = SchedulerAgent(state, inventory=self.inventory)
+            if not agent.needs_appointment() or agent.vehicle_id is None:
+                continue
+            vehicles.append({
+                "vehicle_id": agent.vehicle_id,
+                "urgency": agent.urgency,
+                "latest_soh": agent.insight.get("latest_soh"),
+                "preferred_dealer": state.get("preferred_dealer"),
+            })
+        return vehicles
+
+    @staticmethod
+    def solve(vehicles, free_slots, today=None):
+        """
+        Assign vehicles to free slots in memory (nothing is booked).
+
+        Args:
+            vehicles (list): dicts with vehicle_id, urgency and optionally latest_soh,
+                preferred_dealer and booking (a current {"dealer", "slot"} booking).
+            free_slots (list): (dealer, start ISO time, free capacity) rows in time order,
+                as returned by SlotInventory.free_slots.
+
+        Returns:
+            list: one assignment dict per vehicle, in descending weight order; dealer
+            and slot are None when capacity ran out. A vehicle with a booking keeps
+            it ("existing") unless its urgency can get an earlier free slot.
+        """
+        today = today or date.today()
+        origin = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        starts = [start for _, start, _ in free_slots]
+        remaining = [room for _, _, room in free_slots]
+        by_dealer = {}
+        for position, (dealer, _, _) in enumerate(free_slots):
+            by_dealer.setdefault(dealer, []).append(position)
+        cursors = {}
+
+        def cursor(urgency, dealer=None):
+            # Starts at the urgency's lead time, like SlotInventory.book_many's pointers
+            key = (urgency, dealer)
+            if key not in cursors:
+                positions = range(len(free_slots)) if dealer is None else by_dealer[dealer]
+                first = bisect.bisect_left([starts[p] for p in positions], not_before(today, urgency))
+                cursors[key] = _SlotCursor(positions, remaining, first)
+            return cursors[key]
+
+        ranked = sorted(vehicles, key=lambda v: -vehicle_weight(v.get("urgency"), v.get("latest_soh")))
+        assignments = []
+        for vehicle in ranked:
+            urgency = vehicle.get("urgency")
+            deadline = _deadline(today, urgency)
+            position = None
+            preferred = vehicle.get("preferred_dealer")
+            if preferred in by_dealer:
+                position = cursor(urgency, preferred).peek()
+                if position is not None and deadline is not None and starts[position] >= deadline:
+                    position = None  # preferred dealer is too late; take the earliest anywhere
+            if position is None:
+                position = cursor(urgency).peek()
+
+            booking = vehicle.get("booking")
+            if booking is not None:
+                current = booking["slot"].isoformat()
+                if position is None or starts[position] >= current:
+                    # Already as soon as this urgency allows
+                    assignments.append(_assignment(vehicle, booking["dealer"], current, origin, deadline,
+                                                   existing=True))
+                    continue
+            elif position is None:
+                # Nothing left after this urgency's lead time: use earlier slots
+                position = cursor("high").peek()
+
+            if position is None:
+                assignments.append(_assignment(vehicle, None, None, origin, deadline))
+                continue
+            dealer, start, _ = free_slots[position]
+            remaining[position] -= 1
+            assignments.append(_assignment(vehicle, dealer, start, origin, deadline))
+        return assignments
+
+    @staticmethod
+    def summarize(assignments):
+        """Totals for newly made assignments (existing bookings are left out)."""
+        assignments = [a for a in assignments if not a["existing"]]
+        booked = [a for a in assignments if a["slot"] is not None]
+        return {
+            "vehicles": len(assignments),
+            "booked": len(booked),
+            "unassigned": len(assignments) - len(booked),
+            "late": sum(a["late"] for a in booked),
+            "weighted_wait_days": round(sum(a["weight"] * a["wait_days"] for a in booked), 2),
+            "mean_wait_days": round(sum(a["wait_days"] for a in booked) / len(booked), 3) if booked else None,
+        }
+
+    def assign(self, vehicles, today=None):
+        """
+        Solve and book a batch in one inventory transaction.
+
+        Vehicles that already hold an upcoming booking keep it (marked
+        "existing") unless their urgency can get an earlier slot, in which case
+        the old booking is released and the earlier slot booked, as in
+        SlotInventory.book. A vehicle id listed more than once is booked once,
+        at its highest weight; vehicles without an id are skipped (see
+        unique_vehicles). Returns (assignments, summary); the summary includes
+        the solve time.
+        """
+        vehicles = unique_vehicles(vehicles)
+        today = today or date.today()
+        origin = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        self.inventory.ensure_calendar(today)
+        with span("slot_selection", vehicles=len(vehicles)), self.inventory.transaction() as conn:
+            now = datetime.now().isoformat()
+            vehicles = [dict(vehicle, booking=self.inventory.upcoming_booking(conn, vehicle["vehicle_id"], now))
+                        for vehicle in vehicles]
+            start = time.perf_counter()
+            free_slots = self.inventory.free_slots(conn, origin.isoformat())
+            assignments = self.solve(vehicles, free_slots, today)
+            solve_s = time.perf_counter() - start
+            booked = {vehicle["vehicle_id"] for vehicle in vehicles if vehicle["booking"] is not None}
+            new = [a for a in assignments if not a["existing"] and a["slot"] is not None]
+            for assignment in new:
+                if assignment["vehicle_id"] in booked:
+                    self.inventory.release(conn, assignment["vehicle_id"])
+            self.inventory.reserve(conn, [
+                (a["vehicle_id"], a["dealer"], a["slot"].isoformat(), a["urgency"]) for a in new])
+        kept = sum(a["existing"] for a in assignments)
+        summary = dict(self.summarize(assignments), already_booked=kept, solve_s=round(solve_s, 4))
+        return assignments, summary
+
+    def schedule_states(self, states, today=None):
+        """Assign every state in a fleet batch and record its appointment, like SchedulerAgent.schedule."""
+        assignments, summary = self.assign(self.vehicles_from_states(states), today)
+        by_vehicle = {a["vehicle_id"]: a for a in assignments}
+        for state in states:
+            vehicle_id = state.get("vehicle_id")
+            assignment = by_vehicle.get(vehicle_id) if vehicle_id is not None else None
+            if assignment is None:
+                # No appointment needed, or a one-off booking for a state without a vehicle id
+                SchedulerAgent(state, inventory=self.inventory).schedule()
+                continue
+            if assignment["slot"] is None:
+                state["appointment"] = {
+                    "status": "no slot available",
+                    "details": "All dealer slots in the booking window are taken."
+                }
+            else:
+                state["appointment"] = {
+                    "status": "scheduled",
+                    "dealer": assignment["dealer"],
+                    "slot": assignment["slot"],
+                    "method": "assigned by fleet scheduler"
+                }
+        return summary
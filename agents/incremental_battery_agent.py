@@ -0,0 +1,265 @@
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.battery_agent import (
+    ANALYSIS_COLUMNS,
+    ANOMALY_THRESHOLD,
+    HIGH_DEGRADATION_THRESHOLD,
+    classify_status,
+)
+from agents.soh_forecast import (
+    HALF_LIFE_DAYS,
+    SOH_SERVICE_FLOOR,
+    forecast_summary,
+    heat_degrees,
+    solve_moments,
+)
+from agents.telemetry_sources import open_source
+
+STATE_DIR = 'battery_state'
+
+def empty_running_state():
+    return {
+        "rows": 0,
+        "last_soh": None,
+        "latest_date": None,
+        "drop_sum": 0.0,
+        "drop_count": 0,
+        "fast_sum": 0.0,
+        "fast_count": 0,
+        "slow_sum": 0.0,
+        "slow_count": 0,
+        "anomalies": [],
+        "highlight_dates": [],
+        "forecast": empty_forecast_moments(),
+    }
+
+def empty_forecast_moments():
+    # Running weighted least-squares terms of soh_forecast's model; weights
+    # are relative to ref_day (the latest reading) and rescaled when it moves
+    return {
+        "first_day": None,
+        "ref_day": None,
+        "cumulative": [0.0, 0.0, 0.0],  # fast charges, slow charges, heat degree-days
+        "xtx": [[0.0] * 4 for _ in range(4)],
+        "xty": [0.0] * 4,
+        "yty": 0.0,
+        "weight": 0.0,
+        "fast": 0.0,
+        "heat": 0.0,
+    }
+
+class IncrementalBatteryAgent:
+    """
+    BatteryInsightAgent that keeps per-vehicle running state between runs.
+
+    Only the rows newer than the last processed date are read and folded into
+    running sums and counts, so each update costs O(new rows) instead of
+    O(full history). The resulting battery_insight, including the SoH
+    forecast, matches a full recompute of the same history (up to
+    floating-point summation order).
+
+    The running state is persisted as one JSON file per vehicle in `state_dir`.
+    """
+
+    def __init__(self, state, vehicle_id="default", state_dir=STATE_DIR,
+                 floor=SOH_SERVICE_FLOOR, half_life_days=HALF_LIFE_DAYS):
+        self.state = state
+        self.vehicle_id = vehicle_id
+        self.state_dir = state_dir
+        self.floor = floor
+        self.half_life_days = half_life_days
+        self.running = self.load_state()
+
+    def _state_path(self):
+        return os.path.join(self.state_dir, f"{self.vehicle_id}.json")
+
+    def load_state(self):
+        path = self._state_path()
+        if not os.path.exists(path):
+            return empty_running_state()
+        with open(path) as f:
+            running = json.load(f)
+        # State saved before forecasts were tracked: no forecast until rebuild()
+        running.setdefault("forecast", None if running["rows"] else empty_forecast_moments())
+        return running
+
+    def save_state(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = self._state_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.running, f)
+        os.replace(tmp_path, self._state_path())  # atomic, so a crash never leaves half a file
+
+    def reset(self):
+        self.running = empty_running_state()
+
+    def update(self, new_rows):
+        """
+        Fold new telemetry rows (date, SoH, charge_type, optional temperature) into the running state.
+
+        Rows must be newer than everything already processed; use rebuild()
+        to recompute from a full history instead.
+        """
+        if len(new_rows) == 0:
+            return self.running
+        df = new_rows.assign(date=pd.to_datetime(new_rows['date']))
+        if not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date')
+
+        run = self.running
+        if run["latest_date"] is not None and df['date'].iloc[0] <= pd.Timestamp(run["latest_date"]):
+            raise ValueError(
+                f"Rows for {self.vehicle_id} are not newer than {run['latest_date']}; "
+                "call rebuild() with the full history instead.")
+
+        soh = df['SoH'].to_numpy(dtype=float)
+        previous = np.concatenate(([run["last_soh"] if run["last_soh"] is not None else np.nan], soh[:-1]))
+        drops = previous - soh
+        valid = ~np.isnan(drops)
+        charge_type = df['charge_type'].to_numpy()
+        dates = df['date']
+
+        run["drop_sum"] += float(drops[valid].sum())
+        run["drop_count"] += int(valid.sum())
+        for kind in ("fast", "slow"):
+            mask = valid & (charge_type == kind)
+            run[f"{kind}_sum"] += float(drops[mask].sum())
+            run[f"{kind}_count"] += int(mask.sum())
+        run["anomalies"] += [d.isoformat() for d in dates[drops > ANOMALY_THRESHOLD]]
+        run["highlight_dates"] += [d.isoformat() for d in dates[drops > HIGH_DEGRADATION_THRESHOLD]]
+
+        if run["forecast"] is not None:
+            self._update_forecast_moments(df, soh, charge_type == "fast")
+
+        run["rows"] += len(df)
+        run["last_soh"] = float(soh[-1])
+        run["latest_date"] = dates.iloc[-1].isoformat()
+        return run
+
+    def _update_forecast_moments(self, df, soh, is_fast):
+        moments = self.running["forecast"]
+        days = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64).astype(np.float64)
+        fast = is_fast.astype(np.float64)
+        if 'temperature' in df.columns:
+            heat = heat_degrees(df['temperature'].to_numpy())
+        else:
+            heat = np.zeros(len(df))
+
+        cumulative = np.array(moments["cumulative"]) + np.cumsum(np.stack((fast, 1.0 - fast, heat)), axis=1).T
+        features = np.column_stack((np.ones(len(df)), cumulative))
+        ref_day = days[-1]
+        if self.half_life_days:
+            weight = np.exp2((days - ref_day) / self.half_life_days)
+            # Earlier terms were weighted relative to the previous latest reading
+            decay = (np.exp2((moments["ref_day"] - ref_day) / self.half_life_days)
+                     if moments["ref_day"] is not None else 1.0)
+        else:
+            weight = np.ones(len(df))
+            decay = 1.0
+
+        weighted = features * weight[:, None]
+        moments["xtx"] = (np.array(moments["xtx"]) * decay + weighted.T @ features).tolist()
+        moments["xty"] = (np.array(moments["xty"]) * decay + weighted.T @ soh).tolist()
+        moments["yty"] = moments["yty"] * decay + float(weight @ (soh * soh))
+        moments["weight"] = moments["weight"] * decay + float(weight.sum())
+        moments["fast"] = moments["fast"] * decay + float(weight @ fast)
+        moments["heat"] = moments["heat"] * decay + float(weight @ heat)
+        moments["cumulative"] = cumulative[-1].tolist()
+        if moments["first_day"] is None:
+            moments["first_day"] = float(days[0])
+        moments["ref_day"] = float(ref_day)
+
+    def forecast(self):
+        """SoH forecast from the running moments, as BatteryInsightAgent reports it (None if too few readings)."""
+        run = self.running
+        moments = run["forecast"]
+        if moments is None or moments["ref_day"] is None:
+            return None
+        extra = {name: np.array([moments[name]]) for name in ("yty", "weight", "fast", "heat")}
+        extra["span"] = np.array([moments["ref_day"] - moments["first_day"]])
+        extra["latest"] = np.array([run["last_soh"]])
+        values = solve_moments(np.array([moments["xtx"]]), np.array([moments["xty"]]), extra,
+                               np.array([run["rows"]]), self.floor)
+        row = {name: per_vehicle[0] for name, per_vehicle in values.items()}
+        row["readings"] = run["rows"]
+        days_to_floor = row["days_to_floor"]
+        row["projected_date"] = (
+            pd.Timestamp(run["latest_date"]).normalize() + pd.Timedelta(days=math.ceil(days_to_floor))
+            if np.isfinite(days_to_floor) else pd.NaT)
+        return forecast_summary(row, self.floor)
+
+    def rebuild(self, history):
+        """Recompute the running state from a vehicle's full history."""
+        self.reset()
+        return self.update(history)
+
+    def update_from_source(self, data_path):
+        """Read only the rows after the last processed date from a telemetry source."""
+        run = self.running
+        source = open_source(data_path)
+        vehicle_ids = [self.vehicle_id] if self.vehicle_id != "default" else None
+        start = run["latest_date"]
+        df = source.read(columns=ANALYSIS_COLUMNS, vehicle_ids=vehicle_ids, start=start)
+        if start is not None:
+            df = df[df['date'] > pd.Timestamp(start)]
+        return self.update(df)
+
+    def insights(self):
+        run = self.running
+
+        def mean(total, count):
+            return total / count if count else math.nan
+
+        avg_loss = mean(run["drop_sum"], run["drop_count"])
+        status, recommendation = classify_status(avg_loss)
+        anomalies = [pd.Timestamp(d) for d in run["anomalies"]]
+        return {
+            "status": status,
+            "recommendation": recommendation,
+            "anomalies": anomalies,
+            "average_loss_per_cycle": avg_loss,
+            "decline_types": {
+                'fast_avg_drop': mean(run["fast_sum"], run["fast_count"]),
+                'slow_avg_drop': mean(run["slow_sum"], run["slow_count"])
+            },
+            "anomalies_count": anomalies,
+            "highlight_dates": [pd.Timestamp(d) for d in run["highlight_dates"]],
+            "latest_soh": round(run["last_soh"], 2) if run["last_soh"] is not None else None,
+            "forecast": self.forecast()
+        }
+
+    def analyze(self, data_path=None, new_rows=None):
+        """Apply new rows (from a DataFrame or a telemetry source), persist, and update the workflow state."""
+        if new_rows is not None:
+            self.update(new_rows)
+        elif data_path is not None:
+            self.update_from_source(data_path)
+        self.save_state()
+        self.state["battery_insight"] = self.insights()
+        return self.state
+
+def update_fleet(new_rows, vehicle_column="vin", state_dir=STATE_DIR):
+    """
+    Fold a nightly batch of new rows for many vehicles into their persisted state.
+
+    Only vehicles present in `new_rows` are touched. Returns {vehicle_id: battery_insight}.
+    """
+    results = {}
+    for vehicle_id, rows in new_rows.groupby(vehicle_column, sort=False):
+        agent = IncrementalBatteryAgent(state={}, vehicle_id=vehicle_id, state_dir=state_dir)
+        results[vehicle_id] = agent.analyze(new_rows=rows)["battery_insight"]
+    return results
+
+if __name__ == "__main__":
+    agent = IncrementalBatteryAgent(state={})
+    updated_state = agent.analyze(data_path='battery_logs.csv')
+    print(f"Processed {agent.running['rows']} rows up to {agent.running['latest_date']}")
+    for key, value in updated_state["battery_insight"].items():
+        print(f"{key}: {value}")
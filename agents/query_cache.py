@@ -0,0 +1,135 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryResultCache:
+    """
+    Bounded LRU/TTL cache for service-manual lookups, with an optional SQLite tier on disk.
+
+    Keys are normalized battery analyses (SoH bucketed to `soh_bucket` points,
+    anomaly count instead of raw dates), so practically identical vehicles
+    share one entry. Every entry is tagged with the vector index version; when
+    the index changes on disk, all older entries are dropped.
+    """
+
+    def __init__(self, maxsize=1024, ttl_s=3600.0, soh_bucket=0.5, disk_path=None):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.soh_bucket = soh_bucket
+        self.disk_path = disk_path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._version = None
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rag_cache ("
+                "key TEXT PRIMARY KEY, version TEXT, expires_at REAL, value TEXT)")
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        """False when nothing can be stored (maxsize=0 and no disk tier)."""
+        return self.maxsize > 0 or self._db is not None
+
+    def key_for(self, battery_analysis):
+        soh = float(battery_analysis.get('latest_soh', 100))
+        bucket = round(soh / self.soh_bucket) * self.soh_bucket
+        anomalies = battery_analysis.get('anomalies', []) or []
+        return f"soh={bucket:.2f}|anomalies={len(anomalies)}"
+
+    def _check_version(self, version):
+        # Caller holds the lock
+        if version != self._version:
+            if self._version is not None:
+                self._counters["invalidations"] += 1
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM rag_cache WHERE version != ?", (version,))
+                self._db.commit()
+            self._version = version
+
+    def get(self, key, version):
+        """Return the cached value or None; `version` identifies the current vector index."""
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM rag_cache WHERE key = ? AND version = ?",
+                    (key, version)).fetchone()
+                if row is not None and row[0] > now:
+                    value = json.loads(row[1])
+                    self._store(key, row[0], value)
+                    self._counters["disk_hits"] += 1
+                    return value
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key, version, value):
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._check_version(version)
+            self._store(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO rag_cache (key, version, expires_at, value) VALUES (?, ?, ?, ?)",
+                    (key, version, expires_at, json.dumps(value)))
+                self._db.commit()
+
+    def _store(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM rag_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 3) if lookups else None
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache():
+    """Return the process-wide query cache (memory only unless configured)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryResultCache()
+    return _cache
+
+
+def configure_query_cache(**kwargs):
+    """Replace the process-wide cache, e.g. configure_query_cache(maxsize=4096, disk_path='rag_cache.db')."""
+    global _cache
+    with _cache_lock:
+        _cache = QueryResultCache(**kwargs)
+    return _cache
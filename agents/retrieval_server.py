@@ -0,0 +1,340 @@
+"""
+Local retrieval server: one resident embedding model and FAISS index for many workers.
+
+Without it, every process that runs the workflow (the Streamlit app, batch
+workers, graph.py's __main__) loads MiniLM and the vector index itself. The
+server loads them once and answers service-manual lookups over localhost
+HTTP; requests arriving within a few milliseconds of each other are
+micro-batched into one encoder pass and one FAISS search.
+
+Start it, then point the agents at it:
+
+    python agents/retrieval_server.py --port 8765 --max-wait-ms 3
+    RETRIEVAL_SERVER_URL=http://127.0.0.1:8765 python -m langgraph_flow.batch fleet.csv
+
+Endpoints (JSON in, JSON out):
+
+    POST /analyze  {"analyses": [battery_insight, ...]}  -> {"findings": [...]}
+    POST /search   {"queries": [str, ...], "k": 3}        -> {"results": [[{"page_content", "metadata"}]]}
+    GET  /health                                          -> registry timings, batch stats, index version
+"""
+import argparse
+import functools
+import http.client
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SERVER_URL_ENV = "RETRIEVAL_SERVER_URL"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH = 64
+MAX_WAIT_S = 0.003
+CLIENT_TIMEOUT_S = 30.0
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls from many threads into one call of `fn`.
+
+    submit() blocks until its items are processed. A background thread takes
+    the first waiting request, gathers whatever else arrives within
+    `max_wait_s` (up to `max_batch` items), calls `fn` once on all items and
+    hands each caller its slice of the results. The thread counterpart of
+    service_planner_agent.RetrievalBatcher, which does the same on one event loop.
+
+    Args:
+        fn (callable): Takes a list of items, returns a list of results in the same order.
+        max_batch (int): Items per call; a single larger request is still run as one call.
+        max_wait_s (float): How long the first request of a batch waits for company.
+    """
+
+    def __init__(self, fn, max_batch=MAX_BATCH, max_wait_s=MAX_WAIT_S, name="micro-batcher"):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._counters = {"batches": 0, "requests": 0, "items": 0, "max_batch_items": 0}
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items, timeout=None):
+        future = Future()
+        self._queue.put((list(items), future))
+        return future.result(timeout=timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            pending, count = [first], len(first[0])
+            deadline = time.monotonic() + self.max_wait_s
+            while count < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)  # stop after this batch
+                    break
+                pending.append(request)
+                count += len(request[0])
+            self._run(pending, count)
+
+    def _run(self, pending, count):
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["requests"] += len(pending)
+            self._counters["items"] += count
+            self._counters["max_batch_items"] = max(self._counters["max_batch_items"], count)
+        try:
+            results = self.fn([item for items, _ in pending for item in items])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        start = 0
+        for items, future in pending:
+            future.set_result(results[start:start + len(items)])
+            start += len(items)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters["mean_batch_items"] = counters["items"] / counters["batches"] if counters["batches"] else None
+        return counters
+
+
+class RetrievalService:
+    """The server's work: micro-batched findings and searches against the process-wide registry."""
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait_s=MAX_WAIT_S):
+        from agents.retriever import get_registry
+        from agents.service_planner_agent import ServicePlannerAgent
+
+        self.registry = get_registry()
+        self.started_at = time.time()
+        # Findings go through the planner's batch path, so the query cache and de-duplication apply
+        self.findings = MicroBatcher(functools.partial(ServicePlannerAgent.query_service_manual_batch, local=True),
+                                     max_batch, max_wait_s, name="findings-batcher")
+        self.searches = MicroBatcher(self._search_batch, max_batch, max_wait_s, name="search-batcher")
+
+    def _search_batch(self, requests):
+        # requests: (query, k) pairs; one search with the largest k, trimmed per query
+        k = max(k for _, k in requests)
+        results = self.registry.similarity_search_batch([query for query, _ in requests], k=k)
+        return [[_document_json(doc) for doc in docs[:wanted]] for (_, wanted), docs in zip(requests, results)]
+
+    def analyze(self, analyses):
+        return self.findings.submit(analyses, timeout=CLIENT_TIMEOUT_S)
+
+    def search(self, queries, k=3):
+        return self.searches.submit([(query, int(k)) for query in queries], timeout=CLIENT_TIMEOUT_S)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "index_version": self.registry.index_version(),
+            "registry": self.registry.stats(),
+            "findings_batches": self.findings.stats(),
+            "search_batches": self.searches.stats(),
+        }
+
+    def close(self):
+        self.findings.close()
+        self.searches.close()
+
+
+def _document_json(doc):
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+
+class RetrievalRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps client connections open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY each reply waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, self.server.service.health())
+        else:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/analyze":
+                payload = {"findings": self.server.service.analyze(body["analyses"])}
+            elif self.path == "/search":
+                payload = {"results": self.server.service.search(body["queries"], body.get("k", 3))}
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+                return
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {"error": f"bad request: {e!r}"})
+            return
+        except Exception as e:
+            self._reply(500, {"error": repr(e)})
+            return
+        self._reply(200, payload)
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RetrievalServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # many workers connect at once at start-up
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, RetrievalRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, max_batch=MAX_BATCH, max_wait_s=MAX_WAIT_S,
+          warm=True, verbose=False):
+    """
+    Create the server (bound, not yet serving) and, with `warm`, load the model and index.
+
+    Call serve_forever() on the result, or run it on a thread; port 0 picks a free port.
+    """
+    service = RetrievalService(max_batch=max_batch, max_wait_s=max_wait_s)
+    if warm:
+        service.registry.warm_up()
+    return RetrievalServer((host, port), service, verbose=verbose)
+
+
+class RetrievalClient:
+    """
+    Client for a running retrieval server; each thread keeps one keep-alive connection.
+
+    Args:
+        url (str): Server base URL, e.g. "http://127.0.0.1:8765".
+        timeout (float): Seconds to wait for a reply.
+    """
+
+    def __init__(self, url, timeout=CLIENT_TIMEOUT_S):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload, default=str).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server may have closed an idle keep-alive connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+            except Exception:
+                # e.g. a timeout: the connection is in an unknown state
+                conn.close()
+                self._local.conn = None
+                raise
+        result = json.loads(data)
+        if response.status != 200:
+            raise RuntimeError(f"retrieval server {path}: {response.status} {result.get('error')}")
+        return result
+
+    def analyze(self, battery_analyses):
+        """Service-manual findings for each battery analysis, as query_service_manual_batch returns them."""
+        # Only what the query and its cache key are built from; dates become strings as in the query text
+        analyses = [{"latest_soh": analysis.get("latest_soh", 100),
+                     "anomalies": [str(a) for a in analysis.get("anomalies", []) or []]}
+                    for analysis in battery_analyses]
+        return self._request("POST", "/analyze", {"analyses": analyses})["findings"]
+
+    def search(self, queries, k=3):
+        """Raw similarity search: a list of {"page_content", "metadata"} dicts per query."""
+        return self._request("POST", "/search", {"queries": list(queries), "k": k})["results"]
+
+    def health(self):
+        return self._request("GET", "/health")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_retrieval_client():
+    """The client for the server named in RETRIEVAL_SERVER_URL, or None when it is not set."""
+    url = os.environ.get(SERVER_URL_ENV)
+    if not url:
+        return None
+    client = _clients.get(url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(url)
+            if client is None:
+                client = _clients[url] = RetrievalClient(url)
+    return client
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve service-manual retrieval from one resident model and index.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_S * 1000)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, max_batch=args.max_batch,
+                   max_wait_s=args.max_wait_ms / 1000, verbose=args.verbose)
+    host, port = server.server_address[:2]
+    print(f"✅ Retrieval server ready on http://{host}:{port} (set {SERVER_URL_ENV} to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.chunk_store import LEGACY_DOCSTORE_FILE, open_chunk_store
+from agents.faiss_index import apply_search_params, read_faiss_index, read_index_meta
+from agents.tracing import span
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+INDEX_PATH = "vector_index"
+FINGERPRINT_CHECK_S = 5.0  # how often the index directory is re-checked for changes
+
+
+class RetrieverRegistry:
+    """
+    Process-wide holder for the embedding model and the FAISS service-manual index.
+
+    Both are loaded lazily on first use and shared by every ServicePlannerAgent
+    (and every Streamlit rerun) in the process. The index is reloaded only when
+    the files in the index directory change on disk; the directory is listed
+    at most once every `check_interval_s` seconds (None: only on reload()),
+    so searches do no filesystem work in between. langchain and the
+    embedding backend (sentence-transformers, torch) are only imported then,
+    so importing this module stays cheap.
+
+    Indexes without a chunk store (a pickled index.pkl docstore) are refused
+    unless `allow_pickle` is set; migrate them with agents/chunk_store.py.
+    """
+
+    def __init__(self, index_path=INDEX_PATH, model_name=EMBEDDING_MODEL, mmap=True,
+                 check_interval_s=FINGERPRINT_CHECK_S, allow_pickle=False):
+        self.index_path = index_path
+        self.model_name = model_name
+        self.mmap = mmap
+        # Unpickle a legacy index.pkl docstore; only for indexes you built yourself
+        self.allow_pickle = allow_pickle
+        self.check_interval_s = check_interval_s
+        self._lock = threading.RLock()
+        self._disk_fingerprint = None
+        self._checked_at = None
+        self._embeddings = None
+        self._vector_store = None
+        self._fingerprint = None
+        self._chunk_store = None
+        self._chunk_store_fingerprint = None
+        self._timings = {
+            "model_load_s": None,
+            "index_load_s": None,
+            "index_loads": 0,
+            "searches": 0,
+            "last_search_s": None,
+            "total_search_s": 0.0,
+        }
+
+    def _read_fingerprint(self):
+        # (name, size, mtime) of every file in the index directory
+        entries = []
+        for name in sorted(os.listdir(self.index_path)):
+            stat = os.stat(os.path.join(self.index_path, name))
+            entries.append((name, stat.st_size, stat.st_mtime_ns))
+        return tuple(entries)
+
+    def _index_fingerprint(self):
+        # The last fingerprint read, re-read once check_interval_s has passed
+        now = time.monotonic()
+        if self._checked_at is None or (self.check_interval_s is not None
+                                        and now - self._checked_at >= self.check_interval_s):
+            with self._lock:
+                if self._checked_at is None or (self.check_interval_s is not None
+                                                and now - self._checked_at >= self.check_interval_s):
+                    self._disk_fingerprint = self._read_fingerprint()
+                    self._checked_at = now
+        return self._disk_fingerprint
+
+    def reload(self):
+        """Re-check the index directory now; a changed index is loaded on the next search."""
+        with self._lock:
+            self._checked_at = None
+        return self.index_version()
+
+    def index_version(self):
+        """Short hash of the index files' names, sizes and mtimes; changes whenever they do."""
+        return hashlib.sha1(repr(self._index_fingerprint()).encode()).hexdigest()[:16]
+
+    def get_embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+                    start = time.perf_counter()
+                    self._embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
+                    self._timings["model_load_s"] = time.perf_counter() - start
+        return self._embeddings
+
+    def get_vector_store(self):
+        fingerprint = self._index_fingerprint()
+        if self._vector_store is None or fingerprint != self._fingerprint:
+            with self._lock:
+                if self._vector_store is None or fingerprint != self._fingerprint:
+                    embeddings = self.get_embeddings()
+                    start = time.perf_counter()
+                    self._vector_store = self._load_vector_store(embeddings)
+                    self._fingerprint = fingerprint
+                    self._timings["index_load_s"] = time.perf_counter() - start
+                    self._timings["index_loads"] += 1
+        return self._vector_store
+
+    def _load_vector_store(self, embeddings):
+        # Equivalent to FAISS.load_local, but memory-maps the index, applies the
+        # search parameters recorded by the index builder, and reads chunks
+        # lazily from the SQLite chunk store instead of unpickling a docstore
+        from langchain_community.vectorstores import FAISS
+
+        meta = read_index_meta(self.index_path)
+        index = read_faiss_index(self.index_path, mmap=self.mmap)
+        apply_search_params(index, nprobe=meta.get("nprobe"), ef_search=meta.get("ef_search"))
+        chunk_store = open_chunk_store(self.index_path)
+        if chunk_store is not None:
+            # index.faiss and chunks.sqlite are replaced one after the other; refuse a mismatched pair
+            if index.ntotal != len(chunk_store):
+                raise RuntimeError(f"{self.index_path}: index.faiss has {index.ntotal} vectors but "
+                                   f"{len(chunk_store)} chunks; the index is being rebuilt or is out of date")
+            return FAISS(embeddings, index, chunk_store, chunk_store.index_to_docstore_id)
+
+        if not self.allow_pickle:
+            raise RuntimeError(f"{self.index_path} has no chunk store; migrate its {LEGACY_DOCSTORE_FILE} with "
+                               f"`python agents/chunk_store.py {self.index_path}` (or pass allow_pickle=True "
+                               "to unpickle it, only for indexes you built yourself)")
+        print(f"⚠️  {self.index_path} has no chunk store; unpickling {LEGACY_DOCSTORE_FILE} (allow_pickle=True)")
+        with open(os.path.join(self.index_path, LEGACY_DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    def get_chunk_store(self):
+        """The index's chunk store on its own, without loading the embedding model (None for legacy indexes)."""
+        fingerprint = self._index_fingerprint()
+        if self._chunk_store is None or fingerprint != self._chunk_store_fingerprint:
+            with self._lock:
+                if self._chunk_store is None or fingerprint != self._chunk_store_fingerprint:
+                    self._chunk_store = open_chunk_store(self.index_path)
+                    self._chunk_store_fingerprint = fingerprint
+        return self._chunk_store
+
+    def lookup_routine(self, routine_id):
+        """Manual chunks mentioning an ODIN routine id, from the routine index (no embedding search)."""
+        chunk_store = self.get_chunk_store()
+        if chunk_store is None:
+            # Legacy index: scan every chunk through the docstore's public lookup
+            vector_store = self.get_vector_store()
+            docs = (vector_store.docstore.search(doc_id) for doc_id in vector_store.index_to_docstore_id.values())
+            return [doc for doc in docs if routine_id in doc.page_content]
+        return chunk_store.find_routine(routine_id)
+
+    def warm_up(self):
+        """Load the model and index ahead of the first request."""
+        self.get_vector_store()
+        return self.stats()
+
+    def similarity_search(self, query, k=3):
+        vector_store = self.get_vector_store()
+        start = time.perf_counter()
+        # Same as vector_store.similarity_search, split so each step is traced
+        with span("embedding", queries=1):
+            vector = self.get_embeddings().embed_query(query)
+        with span("faiss_search", queries=1, k=k):
+            docs = vector_store.similarity_search_by_vector(vector, k=k)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._timings["searches"] += 1
+            self._timings["last_search_s"] = elapsed
+            self._timings["total_search_s"] += elapsed
+        return docs
+
+    def similarity_search_batch(self, queries, k=3):
+        """
+        Search many queries at once: one batched encoder call and one
+        multi-query FAISS search. Returns a list of document lists, in query order.
+        """
+        if not queries:
+            return []
+        import numpy as np
+        from langchain_core.documents import Document
+
+        vector_store = self.get_vector_store()
+        start = time.perf_counter()
+        with span("embedding", queries=len(queries)):
+            vectors = np.asarray(self.get_embeddings().embed_documents(list(queries)), dtype=np.float32)
+        with span("faiss_search", queries=len(queries), k=k):
+            # Same rule as FAISS.similarity_search_by_vector, so both paths return the same documents
+            if vector_store._normalize_L2:
+                import faiss
+                faiss.normalize_L2(vectors)
+            _, indices = vector_store.index.search(vectors, k)
+            results = []
+            for row in indices:
+                docs = []
+                for i in row:
+                    if i == -1:  # fewer than k documents in the index
+                        continue
+                    doc_id = vector_store.index_to_docstore_id[i]
+                    doc = vector_store.docstore.search(doc_id)
+                    if not isinstance(doc, Document):
+                        # Docstores return an error string, not a Document, for unknown ids
+                        raise RuntimeError(f"{self.index_path}: vector {i} points to chunk {doc_id!r}, "
+                                           "which is not in the chunk store; the index is out of date")
+                    docs.append(doc)
+                results.append(docs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._timings["searches"] += len(queries)
+            self._timings["last_search_s"] = elapsed
+            self._timings["total_search_s"] += elapsed
+        return results
+
+    def stats(self):
+        with self._lock:
+            return dict(self._timings)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide RetrieverRegistry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = RetrieverRegistry()
+    return _registry
+
+
+def warm_up():
+    """Pre-load the embedding model and vector index, e.g. at server startup."""
+    return get_registry().warm_up()
+
+
+if __name__ == "__main__":
+    print("Warm-up timings:")
+    for key, value in warm_up().items():
+        print(f"{key}: {value}")
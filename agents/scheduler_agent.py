@@ -1,56 +1,87 @@
-from datetime import datetime, timedelta
-import pandas as pd
-import random
+import asyncio
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.slot_inventory import get_slot_inventory
+from agents.tracing import span
+
+# Plans at these urgencies are booked even if the action text does not say "schedule"
+SCHEDULE_URGENCIES = ("high", "medium")
 
 class SchedulerAgent:
-    def __init__(self, state):
+    def __init__(self, state, inventory=None):
         """
         Initialize the SchedulerAgent with the current state.
 
         Args:
             state (dict): The current state containing battery insights and other relevant information.
+            inventory (SlotInventory): Dealer slot inventory to book from (default: the process-wide one).
         """
         self.state = state
         self.insight = self.state.get('battery_insight', {})
         self.recommendation = self.state.get('service_plan', {}).get('action', "")
-        self.dealers = {
-            "Dealer_A": self._generate_slots(),
-            "Dealer_B": self._generate_slots(),
-            "Dealer_C": self._generate_slots()}
+        self.urgency = self.state.get('service_plan', {}).get('urgency', "unknown")
+        # Without a vehicle id the booking is a one-off: it takes capacity but is not remembered
+        self.vehicle_id = self.state.get('vehicle_id')
+        self.inventory = inventory if inventory is not None else get_slot_inventory()
 
-    # internal method to generate mock available slots for dealers    
-    def _generate_slots(self):
-        
-        slots = []
-        base_date = datetime.now()
-        for i in range(1, 15):  # Next two weeks
-            day = base_date + timedelta(days=i)
-            for hour in [9, 11, 13, 15]:  # Four slots per day
-                slots.append(day.replace(hour=hour, minute=0, second=0, microsecond=0))
-        return slots
+    def needs_appointment(self):
+        return self.urgency in SCHEDULE_URGENCIES or "schedule" in self.recommendation.lower()
     
     def select_slot(self):
-        dealer = random.choice(list(self.dealers.keys()))
-        slots = random.choice(self.dealers[dealer])
-        dealer_slot = {"dealer": dealer, "slot": slots}
-        return dealer_slot
+        # Reserves the slot, so no other vehicle can be given it
+        with span("slot_selection", urgency=self.urgency):
+            return self.inventory.book(self.vehicle_id, urgency=self.urgency)
+
+    def _record_appointment(self, selection):
+        if selection is None:
+            self.state["appointment"] = {
+                "status": "no slot available",
+                "details": "All dealer slots in the booking window are taken."
+            }
+        else:
+            self.state["appointment"] = {
+                "status": "scheduled",
+                "dealer": selection["dealer"],
+                "slot": selection["slot"],
+                "method": "auto-selected by scheduler agent"
+            }
+        return self.state
     
     def schedule(self):
-        if "schedule" not in self.recommendation.lower():
+        if not self.needs_appointment():
             self.state["appointment"] = {
                 "status": "no schedule needed",
                 "details": "No scheduling action required based on current battery status."
             }
             return self.state  # No scheduling needed
         
-        selection = self.select_slot()
-        self.state["appointment"] = {
-            "status": "scheduled",
-            "dealer": selection["dealer"],
-            "slot": selection["slot"],
-            "method": "auto-selected by scheduler agent"
-        }
-        return self.state
+        return self._record_appointment(self.select_slot())
+
+    @classmethod
+    def schedule_batch(cls, states, inventory=None):
+        """
+        Book appointments for a whole fleet batch in one inventory transaction.
+
+        High-urgency vehicles are allocated first; states without a vehicle id
+        are booked one by one as one-offs. Updates and returns the states, in order.
+        """
+        agents = [cls(state, inventory=inventory) for state in states]
+        to_book = [agent for agent in agents if agent.needs_appointment() and agent.vehicle_id is not None]
+        inventory = inventory if inventory is not None else get_slot_inventory()
+        with span("slot_selection", vehicles=len(to_book)):
+            bookings = inventory.book_many([(agent.vehicle_id, agent.urgency) for agent in to_book])
+        for agent in agents:
+            if agent.needs_appointment() and agent.vehicle_id is not None:
+                agent._record_appointment(bookings.get(agent.vehicle_id))
+            else:
+                agent.schedule()
+        return [agent.state for agent in agents]
+
+    async def aschedule(self):
+        # Booking writes to the SQLite inventory, so it runs on a worker thread
+        return await asyncio.to_thread(self.schedule)
     
 if __name__ == "__main__":
     mock_state = {
@@ -1,8 +1,76 @@
-import pandas as pd
+import copy
 import os
-from typing import Dict
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
+import sys
+import weakref
+from typing import Dict, List
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.chunk_store import extract_chunk_metadata
+from agents.query_cache import get_query_cache
+from agents.retriever import get_registry
+
+# asyncio, numpy (via soh_forecast) and the retrieval server's HTTP modules
+# are imported on first use, so importing the planner stays cheap
+
+URGENCY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+class RetrievalBatcher:
+    """
+    Coalesces concurrent async service-manual queries on one event loop.
+
+    Queries submitted within `max_wait_s` of each other are answered by one
+    query_service_manual_batch call (one encoder pass, one FAISS search) on a
+    worker thread, so hundreds of concurrent workflows share the model
+    instead of queueing for it one query at a time.
+    """
+
+    def __init__(self, max_batch=64, max_wait_s=0.005):
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._pending = []
+        self._flush_task = None
+
+    async def submit(self, battery_analysis):
+        import asyncio
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((battery_analysis, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush())
+        return await future
+
+    async def _flush(self):
+        import asyncio
+
+        await asyncio.sleep(self.max_wait_s)
+        pending, self._pending = self._pending, []
+        self._flush_task = None  # later arrivals start the next batch
+        for i in range(0, len(pending), self.max_batch):
+            chunk = pending[i:i + self.max_batch]
+            try:
+                results = await asyncio.to_thread(
+                    ServicePlannerAgent.query_service_manual_batch, [analysis for analysis, _ in chunk])
+            except Exception as e:
+                for _, future in chunk:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(chunk, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+_batchers = weakref.WeakKeyDictionary()
+
+def get_retrieval_batcher():
+    """Return the RetrievalBatcher for the running event loop."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = RetrievalBatcher()
+    return batcher
 
 class ServicePlannerAgent:
 
@@ -40,6 +108,28 @@ class ServicePlannerAgent:
             "urgency": urgency,
             "source_status": source_status
         }
+        return self.apply_forecast(service_plan)
+
+    def apply_forecast(self, service_plan):
+        """
+        Escalate urgency when the SoH forecast reaches the service floor soon.
+
+        The status above reflects past degradation only; a pack projected to
+        cross the floor within FORECAST_URGENCY_DAYS is planned for proactively.
+        Urgency is never lowered.
+        """
+        from agents.soh_forecast import forecast_urgency
+
+        forecast = self.insight.get("forecast")
+        if not forecast:
+            return service_plan
+        service_plan["projected_days_to_floor"] = forecast["days_to_floor"]
+        urgency = forecast_urgency(forecast)
+        if urgency is not None and URGENCY_RANK[urgency] < URGENCY_RANK.get(service_plan["urgency"], len(URGENCY_RANK)):
+            service_plan["urgency"] = urgency
+            service_plan["action"] = (f"Battery projected to reach {forecast['soh_floor']:g}% SoH in about "
+                                      f"{forecast['days_to_floor']:.0f} days. Schedule service before then.")
+            service_plan["escalated_by_forecast"] = True
         return service_plan
     def plan(self):
         # Step 1: Create baseline plan (rule-based)
@@ -49,6 +139,18 @@ class ServicePlannerAgent:
 
         # Step 2: Augment with service manual (RAG)
         rag_find = self.query_service_manual(self.insight)
+        return self.apply_rag_findings(decision, rag_find)
+
+    async def aplan(self):
+        """Async plan(): retrieval is batched with concurrent plans and runs off the event loop."""
+        decision = self.plan_service()
+        print("Baseline Service Plan:")
+        print(decision)
+
+        rag_find = await self.aquery_service_manual(self.insight)
+        return self.apply_rag_findings(decision, rag_find)
+
+    def apply_rag_findings(self, decision, rag_find):
         print("RAG Findings:")
         print(rag_find)
 
@@ -62,59 +164,144 @@ class ServicePlannerAgent:
         
         return self.state
     
-    def query_service_manual(self, battery_analysis: Dict) -> Dict:
-        """Query Tesla service manual using RAG"""
-        
-        # Build query from battery analysis
+    @staticmethod
+    def build_query(battery_analysis: Dict) -> str:
+        """Build the service-manual query for one vehicle's battery analysis"""
         soh = battery_analysis.get('latest_soh', 100)
         anomalies = battery_analysis.get('anomalies', [])
         
-        query = f"""
+        return f"""
         Tesla battery at {soh}% State of Health.
-        Issues: {', '.join(anomalies) if anomalies else 'None'}.
+        Issues: {', '.join(str(a) for a in anomalies) if anomalies else 'None'}.
         What service procedures and ODIN routines are recommended?
         """
+
+    @staticmethod
+    def extract_findings(docs) -> Dict:
+        """Turn retrieved manual sections into procedures and ODIN routines"""
+        procedures = []
+        odin_routines = []
         
-        try:
-            # Define embeddings
-            embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-            # Retrieve relevant manual sections
-            vector_store = FAISS.load_local(
-                    "vector_index", 
-                    embeddings,
-                    allow_dangerous_deserialization=True
-                )
-            docs = vector_store.similarity_search(query, k=3)
-            
-            # Extract key information
-            procedures = []
-            odin_routines = []
+        for doc in docs:
+            # Routines, procedure flag, section and summary are extracted when
+            # the index is built; only chunks from older indexes need the scan
+            info = doc.metadata
+            if 'odin_routines' not in info:
+                info = extract_chunk_metadata(doc.page_content)
+            odin_routines.extend(info['odin_routines'])
             
-            for doc in docs:
-                content = doc.page_content
-                
-                # Extract ODIN routines (Tesla diagnostic commands)
-                import re
-                routines = re.findall(r'PROC_[A-Z0-9_-]+', content)
-                odin_routines.extend(routines)
-                
-                # Extract procedure info
-                if 'SOH' in content or 'procedure' in content.lower():
-                    procedures.append({
-                        'section': doc.metadata.get('section', 'Unknown'),
-                        'summary': content[:200] + "..."
-                    })
-            
-            return {
-                'procedures': procedures[:2],  # Top 2 relevant procedures
-                'odin_routines': list(set(odin_routines))[:3],  # Top 3 unique routines
-                'manual_sections_found': len(docs)
-            }
+            if info['has_procedure']:
+                procedures.append({
+                    'section': info['section'],
+                    'summary': info['summary']
+                })
+        
+        return {
+            'procedures': procedures[:2],  # Top 2 relevant procedures
+            'odin_routines': list(set(odin_routines))[:3],  # Top 3 unique routines
+            'manual_sections_found': len(docs)
+        }
+
+    @staticmethod
+    def lookup_odin_routine(routine_id: str) -> List[Dict]:
+        """Manual sections that mention an ODIN routine, looked up directly by id"""
+        return [{'section': doc.metadata.get('section', 'Unknown'),
+                 'summary': doc.metadata.get('summary', doc.page_content[:200] + "...")}
+                for doc in get_registry().lookup_routine(routine_id)]
+
+    def query_service_manual(self, battery_analysis: Dict) -> Dict:
+        """Query Tesla service manual using RAG"""
+        
+        # Build query from battery analysis
+        query = self.build_query(battery_analysis)
+        
+        try:
+            # With RETRIEVAL_SERVER_URL set, the shared server holds the model and index
+            from agents.retrieval_server import get_retrieval_client
+
+            client = get_retrieval_client()
+            if client is not None:
+                return client.analyze([battery_analysis])[0]
+
+            # Near-identical analyses share one cached result per index version
+            registry = get_registry()
+            cache = get_query_cache()
+            if cache.enabled:
+                cache_key = cache.key_for(battery_analysis)
+                version = registry.index_version()
+                cached = cache.get(cache_key, version)
+                if cached is not None:
+                    return copy.deepcopy(cached)
+
+            # Retrieve relevant manual sections (model and index are cached per process)
+            docs = registry.similarity_search(query, k=3)
+            findings = self.extract_findings(docs)
+            if cache.enabled:
+                cache.put(cache_key, version, copy.deepcopy(findings))
+            return findings
             
         except Exception as e:
             print(f"⚠️  RAG query failed: {e}")
             return {'procedures': [], 'odin_routines': [], 'manual_sections_found': 0}
 
+    async def aquery_service_manual(self, battery_analysis: Dict) -> Dict:
+        """Async query_service_manual(), batched with concurrent queries on this event loop"""
+        # The batch call checks the query cache too, so hits also stay off the loop
+        return await get_retrieval_batcher().submit(battery_analysis)
+
+    @classmethod
+    def query_service_manual_batch(cls, battery_analyses: List[Dict], local: bool = False) -> List[Dict]:
+        """
+        Query the service manual for many vehicles at once.
+
+        Analyses already in the query cache are served from it (when it is
+        enabled); the remaining queries are deduplicated by exact query text,
+        embedded in one batched encoder call and searched with one multi-query
+        FAISS call. Returns one findings dict per input analysis, in order.
+        The batch goes to the retrieval server when RETRIEVAL_SERVER_URL is
+        set, unless `local` (the server itself).
+        """
+        try:
+            from agents.retrieval_server import get_retrieval_client
+
+            client = None if local else get_retrieval_client()
+            if client is not None:
+                return client.analyze(battery_analyses)
+
+            registry = get_registry()
+            cache = get_query_cache()
+            queries = [cls.build_query(analysis) for analysis in battery_analyses]
+            if cache.enabled:
+                version = registry.index_version()
+                keys = [cache.key_for(analysis) for analysis in battery_analyses]
+            else:
+                keys = [None] * len(queries)
+
+            findings = {}  # query -> findings
+            missing = {}  # query -> cache key (None with the cache off) for queries to search
+            for query, key in zip(queries, keys):
+                if query in findings or query in missing:
+                    continue
+                cached = cache.get(key, version) if key is not None else None
+                if cached is not None:
+                    findings[query] = cached
+                else:
+                    missing[query] = key
+
+            docs_per_query = registry.similarity_search_batch(list(missing), k=3)
+            for (query, key), docs in zip(missing.items(), docs_per_query):
+                findings[query] = cls.extract_findings(docs)
+                if key is not None:
+                    cache.put(key, version, copy.deepcopy(findings[query]))
+
+            # Copies so callers can modify one vehicle's findings safely
+            return [copy.deepcopy(findings[query]) for query in queries]
+            
+        except Exception as e:
+            print(f"⚠️  Batched RAG query failed: {e}")
+            return [{'procedures': [], 'odin_routines': [], 'manual_sections_found': 0}
+                    for _ in battery_analyses]
+
     def enhance_plan_with_rag(self, baseline_plan: Dict, rag_insights: Dict) -> Dict:
         """Enhance baseline plan with RAG insights"""
         
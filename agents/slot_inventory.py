@@ -0,0 +1,298 @@
+"""
+Persistent dealer slot inventory for the SchedulerAgent.
+
+Every dealer slot has a capacity and a booked count in SQLite
+(`dealer_slots.db`). A partial index over slots that still have room makes
+"earliest free slot" lookups an index seek, and every booking runs in a
+`BEGIN IMMEDIATE` transaction, so threads and processes sharing the file can
+never book the same capacity twice.
+
+Allocation is urgency-aware: high-urgency plans take the earliest free
+slot, while medium and low urgency start looking a few days out
+(URGENCY_LEAD_DAYS) and leave the first days for urgent work. A vehicle
+holds at most one upcoming booking; booking it again keeps that booking
+unless the new urgency can get an earlier slot, in which case the vehicle is
+moved to the earlier slot in the same transaction.
+Bookings without a vehicle id are one-offs: they take a slot's capacity but
+are not recorded, so nothing is handed back to later unidentified runs.
+"""
+import bisect
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+DEALERS = ("Dealer_A", "Dealer_B", "Dealer_C")
+SLOT_HOURS = (9, 11, 13, 15)  # Four slots per day
+CALENDAR_DAYS = 14  # Next two weeks
+DEFAULT_CAPACITY = 1
+SLOT_DB_PATH = "dealer_slots.db"
+
+# Days from tomorrow before a plan of this urgency may take a slot
+URGENCY_LEAD_DAYS = {"high": 0, "medium": 3, "low": 7}
+URGENCY_ORDER = ("high", "medium", "low")
+
+
+@lru_cache(maxsize=2)
+def dealer_calendar(today, days=CALENDAR_DAYS, hours=SLOT_HOURS):
+    """Slot start times for the days after `today` (the same calendar for every dealer)."""
+    base_date = datetime.combine(today, datetime.min.time())
+    slots = []
+    for i in range(1, days + 1):
+        day = base_date + timedelta(days=i)
+        for hour in hours:
+            slots.append(day.replace(hour=hour, minute=0, second=0, microsecond=0))
+    return tuple(slots)
+
+
+def not_before(today, urgency):
+    """Earliest slot start (ISO time) a plan of this urgency may take, from URGENCY_LEAD_DAYS."""
+    lead = URGENCY_LEAD_DAYS.get(urgency, URGENCY_LEAD_DAYS["low"])
+    return datetime.combine(today + timedelta(days=1 + lead), datetime.min.time()).isoformat()
+
+
+class SlotInventory:
+    """
+    Dealer capacity and bookings in SQLite, safe to share across threads and processes.
+
+    Args:
+        path (str): SQLite file; ":memory:" is not supported (each thread opens its own connection).
+        dealers (tuple): Dealers whose calendars are created on demand.
+        capacity (int): Vehicles each dealer can take per slot.
+    """
+
+    def __init__(self, path=SLOT_DB_PATH, dealers=DEALERS, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.dealers = tuple(dealers)
+        self.capacity = capacity
+        self._local = threading.local()
+        self._calendar_day = None
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS slots (
+                dealer TEXT NOT NULL,
+                start TEXT NOT NULL,
+                capacity INTEGER NOT NULL,
+                booked INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dealer, start));
+            CREATE INDEX IF NOT EXISTS free_slots ON slots (start, dealer) WHERE booked < capacity;
+            CREATE INDEX IF NOT EXISTS free_slots_by_dealer ON slots (dealer, start) WHERE booked < capacity;
+            CREATE TABLE IF NOT EXISTS bookings (
+                vehicle_id TEXT PRIMARY KEY,
+                dealer TEXT NOT NULL,
+                start TEXT NOT NULL,
+                urgency TEXT,
+                booked_at TEXT NOT NULL);
+        """)
+
+    def _connection(self):
+        # One connection per thread and process; transactions are managed explicitly
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction (BEGIN IMMEDIATE) on this thread's connection; yields the connection."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def ensure_calendar(self, today=None):
+        """Create the slots for the next CALENDAR_DAYS days (once per day per process)."""
+        today = today or date.today()
+        if self._calendar_day == today:
+            return
+        rows = [(dealer, start.isoformat(), self.capacity)
+                for dealer in self.dealers for start in dealer_calendar(today)]
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO slots (dealer, start, capacity) VALUES (?, ?, ?)", rows)
+        self._calendar_day = today
+
+    def upcoming_booking(self, conn, vehicle_id, now):
+        """A vehicle's booking if it is still ahead of `now` (ISO time); call inside transaction()."""
+        row = conn.execute("SELECT dealer, start FROM bookings WHERE vehicle_id = ?", (vehicle_id,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            # Past appointment: forget it so the vehicle can book again
+            conn.execute("DELETE FROM bookings WHERE vehicle_id = ?", (vehicle_id,))
+            return None
+        return {"dealer": row[0], "slot": datetime.fromisoformat(row[1])}
+
+    def release(self, conn, vehicle_id):
+        """Drop a vehicle's booking and hand its capacity back; call inside transaction()."""
+        row = conn.execute("SELECT dealer, start FROM bookings WHERE vehicle_id = ?", (vehicle_id,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM bookings WHERE vehicle_id = ?", (vehicle_id,))
+            conn.execute("UPDATE slots SET booked = booked - 1 WHERE dealer = ? AND start = ? AND booked > 0", row)
+        return row is not None
+
+    def _earliest_free(self, conn, not_before, dealer=None):
+        if dealer is None:
+            return conn.execute(
+                "SELECT dealer, start FROM slots INDEXED BY free_slots "
+                "WHERE booked < capacity AND start >= ? ORDER BY start, dealer LIMIT 1",
+                (not_before,)).fetchone()
+        return conn.execute(
+            "SELECT dealer, start FROM slots INDEXED BY free_slots_by_dealer "
+            "WHERE booked < capacity AND dealer = ? AND start >= ? ORDER BY start LIMIT 1",
+            (dealer, not_before)).fetchone()
+
+    def book(self, vehicle_id, urgency="low", dealer=None, today=None):
+        """
+        Atomically reserve the earliest suitable slot for one vehicle.
+
+        Args:
+            vehicle_id (str): Vehicle to book; an upcoming booking is kept unless this
+                urgency can get an earlier slot, which then replaces it.
+                None books a one-off slot that is not recorded against any vehicle.
+            urgency (str): "high", "medium" or "low" (see URGENCY_LEAD_DAYS).
+            dealer (str): Optional preferred dealer.
+
+        Returns:
+            dict: {"dealer", "slot"} or None when no capacity is left.
+        """
+        today = today or date.today()
+        self.ensure_calendar(today)
+        with self.transaction() as conn:
+            booking = None
+            if vehicle_id is not None:
+                booking = self.upcoming_booking(conn, vehicle_id, datetime.now().isoformat())
+            slot = self._earliest_free(conn, not_before(today, urgency), dealer)
+            if booking is not None:
+                if slot is None or datetime.fromisoformat(slot[1]) >= booking["slot"]:
+                    return booking  # Already as soon as this urgency allows
+                self.release(conn, vehicle_id)
+            elif slot is None:
+                # Fall back to earlier slots only when nothing later is free
+                slot = self._earliest_free(conn, not_before(today, "high"), dealer)
+            if slot is None:
+                return None
+            self.reserve(conn, [(vehicle_id, slot[0], slot[1], urgency)])
+        return {"dealer": slot[0], "slot": datetime.fromisoformat(slot[1])}
+
+    def book_many(self, requests, today=None):
+        """
+        Book a whole batch of vehicles in one transaction.
+
+        Args:
+            requests (list): (vehicle_id, urgency) pairs.
+
+        Returns:
+            dict: vehicle_id -> {"dealer", "slot"} or None when capacity ran out.
+
+        Free slots are read once in time order and handed out by a pointer per
+        urgency level (high urgency first), so finding each vehicle's slot is
+        amortized constant time instead of one free-slot search per vehicle.
+        A vehicle that already has an upcoming booking is moved only when its
+        urgency's pointer reaches an earlier slot than the one it holds.
+        """
+        today = today or date.today()
+        self.ensure_calendar(today)
+        with self.transaction() as conn:
+            now = datetime.now().isoformat()
+            results = {}
+            pending = []
+            for vehicle_id, urgency in requests:
+                if vehicle_id in results:
+                    continue
+                results[vehicle_id] = self.upcoming_booking(conn, vehicle_id, now)
+                pending.append((vehicle_id, urgency))
+
+            free = self.free_slots(conn, not_before(today, "high"))
+            starts = [start for _, start, _ in free]
+            remaining = [room for _, _, room in free]
+
+            def take(position):
+                while position < len(free) and remaining[position] == 0:
+                    position += 1
+                return position
+
+            rank = {urgency: i for i, urgency in enumerate(URGENCY_ORDER)}
+            pending.sort(key=lambda request: rank.get(request[1], len(URGENCY_ORDER)))
+            pointers = {}
+            fallback = 0
+            reservations = []
+            for vehicle_id, urgency in pending:
+                existing = results[vehicle_id]
+                if urgency not in pointers:
+                    pointers[urgency] = bisect.bisect_left(starts, not_before(today, urgency))
+                position = pointers[urgency] = take(pointers[urgency])
+                if existing is not None:
+                    if position == len(free) or datetime.fromisoformat(starts[position]) >= existing["slot"]:
+                        continue  # Already as soon as this urgency allows
+                    self.release(conn, vehicle_id)
+                elif position == len(free):
+                    # Nothing left after this urgency's lead time: use earlier slots
+                    position = fallback = take(fallback)
+                    if position == len(free):
+                        continue
+                dealer, start, _ = free[position]
+                remaining[position] -= 1
+                reservations.append((vehicle_id, dealer, start, urgency))
+                results[vehicle_id] = {"dealer": dealer, "slot": datetime.fromisoformat(start)}
+
+            self.reserve(conn, reservations)
+        return results
+
+    def free_slots(self, conn, not_before):
+        """(dealer, start, free capacity) rows from `not_before` (ISO time) on, in time order."""
+        return conn.execute(
+            "SELECT dealer, start, capacity - booked FROM slots INDEXED BY free_slots "
+            "WHERE booked < capacity AND start >= ? ORDER BY start, dealer",
+            (not_before,)).fetchall()
+
+    def reserve(self, conn, reservations):
+        """Record (vehicle_id, dealer, start, urgency) bookings (vehicle_id None: one-off); call inside transaction()."""
+        booked_at = datetime.now().isoformat()
+        conn.executemany(
+            "UPDATE slots SET booked = booked + 1 WHERE dealer = ? AND start = ? AND booked < capacity",
+            [(dealer, start) for _, dealer, start, _ in reservations])
+        conn.executemany(
+            "INSERT INTO bookings (vehicle_id, dealer, start, urgency, booked_at) VALUES (?, ?, ?, ?, ?)",
+            [(vehicle_id, dealer, start, urgency, booked_at)
+             for vehicle_id, dealer, start, urgency in reservations if vehicle_id is not None])
+
+    def cancel(self, vehicle_id):
+        """Release a vehicle's booking; returns False if it had none."""
+        with self.transaction() as conn:
+            return self.release(conn, vehicle_id)
+
+    def stats(self):
+        slots, capacity, booked = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(capacity), 0), COALESCE(SUM(booked), 0) FROM slots").fetchone()
+        return {"slots": slots, "capacity": capacity, "booked": booked, "free": capacity - booked}
+
+
+_inventory = None
+_inventory_lock = threading.Lock()
+
+
+def get_slot_inventory():
+    """Return the process-wide SlotInventory (backed by dealer_slots.db), creating it on first use."""
+    global _inventory
+    if _inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                _inventory = SlotInventory()
+    return _inventory
+
+
+def configure_slot_inventory(**kwargs):
+    """Replace the process-wide inventory, e.g. configure_slot_inventory(path='fleet_slots.db', capacity=4)."""
+    global _inventory
+    with _inventory_lock:
+        _inventory = SlotInventory(**kwargs)
+    return _inventory
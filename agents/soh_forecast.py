@@ -0,0 +1,276 @@
+"""
+Fleet-wide SoH trajectory forecasting.
+
+Each vehicle's SoH history is fitted with a weighted linear model of its
+cumulative stress:
+
+    SoH(t) = a - b_fast * fast_charges(t) - b_slow * slow_charges(t)
+               - b_heat * heat_degree_days(t)
+
+where the cumulative counts run from the vehicle's first reading and heat
+degree-days accumulate max(temperature - HEAT_REFERENCE_C, 0). Readings are
+weighted by recency (half-life `half_life_days`), so a vehicle whose
+degradation changed pace is forecast from its recent trend.
+
+All vehicles are fitted at once: the 4x4 normal equations of every vehicle
+are accumulated from the long, vehicle-sorted arrays with grouped sums (no
+padding, no per-vehicle model objects) and solved as one stacked batch. The
+projected daily loss, at the vehicle's recent charge mix and heat exposure,
+gives the days until SoH reaches `floor`.
+"""
+import os
+import sys
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SOH_SERVICE_FLOOR = 70.0  # percent; packs below this are due for service
+HEAT_REFERENCE_C = 25.0
+HALF_LIFE_DAYS = 90.0
+MIN_FORECAST_READINGS = 7
+RIDGE = 1e-9  # keeps vehicles that never fast-charge (or never run hot) solvable
+CHUNK_ROWS = 65_536  # readings per block; small enough to stay in CPU cache
+
+# Projected days to the floor at which the planner escalates urgency, checked in order
+FORECAST_URGENCY_DAYS = (("high", 30), ("medium", 90))
+
+FORECAST_FIELDS = ("days_to_floor", "daily_loss", "fast_loss_per_charge", "slow_loss_per_charge",
+                   "heat_loss_per_degree_day", "fast_share", "rmse", "latest_soh", "readings")
+
+
+def heat_degrees(temperature):
+    """Daily heat exposure max(temperature - HEAT_REFERENCE_C, 0); missing readings count as none."""
+    temp = np.nan_to_num(np.asarray(temperature, dtype=np.float64), nan=HEAT_REFERENCE_C)
+    return np.maximum(temp - HEAT_REFERENCE_C, 0.0)
+
+
+def _group_cumsum(values, starts, counts):
+    # Cumulative sum restarting at each group's first row
+    total = np.cumsum(values)
+    before = np.concatenate(([0.0], total))[starts]
+    return total - np.repeat(before, counts)
+
+
+def _moments(days, soh, fast, heat, starts, counts, half_life_days):
+    """
+    Per-vehicle weighted sums for a block of whole vehicles (rows sorted by vehicle).
+
+    Returns (xtx, xty, extra) where xtx is (m, 4, 4), xty is (m, 4) and
+    `extra` holds yty, total weight, weighted fast and heat sums, the days
+    spanned and the latest SoH per vehicle.
+    """
+    first = np.repeat(days[starts], counts)
+    elapsed = days - first
+    ends = starts + counts - 1
+    span = elapsed[ends]
+    # Feature-major (k, rows) arrays keep every product and sum contiguous
+    features = np.stack((np.ones(len(days)),
+                         _group_cumsum(fast, starts, counts),
+                         _group_cumsum(1.0 - fast, starts, counts),
+                         _group_cumsum(heat, starts, counts)))
+    if half_life_days:
+        weight = np.exp2((elapsed - np.repeat(span, counts)) / half_life_days)
+    else:
+        weight = np.ones(len(days))
+
+    k = len(features)
+    rows, cols = np.triu_indices(k)
+    weighted = features * weight
+    columns = np.empty((len(rows) + k + 4, len(days)))
+    for n, (i, j) in enumerate(zip(rows, cols)):
+        np.multiply(weighted[i], features[j], out=columns[n])
+    np.multiply(weighted, soh, out=columns[len(rows):len(rows) + k])
+    extra = columns[len(rows) + k:]
+    np.multiply(weight, soh * soh, out=extra[0])
+    extra[1] = weight
+    np.multiply(weight, fast, out=extra[2])
+    np.multiply(weight, heat, out=extra[3])
+    # Rows are grouped by vehicle, so one reduceat sums every vehicle's block
+    sums = np.add.reduceat(columns, starts, axis=1).T
+
+    xtx = np.empty((len(starts), k, k))
+    xtx[:, rows, cols] = sums[:, :len(rows)]
+    xtx[:, cols, rows] = sums[:, :len(rows)]
+    xty = sums[:, len(rows):len(rows) + k]
+    yty, total_weight, fast_weight, heat_weight = sums[:, len(rows) + k:].T
+    return xtx, xty, {"yty": yty, "weight": total_weight, "fast": fast_weight, "heat": heat_weight,
+                      "span": span, "latest": soh[ends]}
+
+
+def solve_moments(xtx, xty, extra, counts, floor=SOH_SERVICE_FLOOR):
+    """
+    Solve accumulated normal equations for per-vehicle forecasts.
+
+    Args:
+        xtx, xty, extra: Weighted moments per vehicle, as returned by _moments
+            (or kept up to date incrementally, see IncrementalBatteryAgent).
+        counts (np.ndarray): Readings per vehicle.
+
+    Returns a dict of per-vehicle arrays (FORECAST_FIELDS without `readings`).
+    """
+    k = xtx.shape[-1]
+    diagonal = np.diagonal(xtx, axis1=1, axis2=2)
+    regularized = xtx + np.eye(k) * (RIDGE * diagonal + RIDGE)[:, None, :]
+    beta = np.linalg.solve(regularized, xty[..., None])[..., 0]
+
+    total_weight = extra["weight"]
+    sse = extra["yty"] - 2 * np.einsum('ni,ni->n', beta, xty) + np.einsum('ni,nij,nj->n', beta, xtx, beta)
+    rmse = np.sqrt(np.maximum(sse, 0.0) / total_weight)
+
+    # Per-charge losses (coefficients are SoH gains, so negate), projected at
+    # the recent charge mix and heat exposure, scaled to readings per day
+    fast_loss, slow_loss, heat_loss = -beta[:, 1], -beta[:, 2], -beta[:, 3]
+    fast_share = extra["fast"] / total_weight
+    heat_rate = extra["heat"] / total_weight
+    span = extra["span"]
+    readings_per_day = np.where(span > 0, (counts - 1) / np.where(span > 0, span, 1.0), 1.0)
+    daily_loss = readings_per_day * (fast_share * fast_loss + (1 - fast_share) * slow_loss
+                                     + heat_rate * heat_loss)
+
+    latest = extra["latest"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_to_floor = np.where(daily_loss > 0, (latest - floor) / daily_loss, np.inf)
+    days_to_floor = np.where(latest <= floor, 0.0, days_to_floor)
+    days_to_floor = np.where(counts >= MIN_FORECAST_READINGS, days_to_floor, np.nan)
+
+    return {
+        "days_to_floor": days_to_floor,
+        "daily_loss": daily_loss,
+        "fast_loss_per_charge": fast_loss,
+        "slow_loss_per_charge": slow_loss,
+        "heat_loss_per_degree_day": heat_loss,
+        "fast_share": fast_share,
+        "rmse": rmse,
+        "latest_soh": latest,
+    }
+
+
+def fit_fleet(codes, days, soh, is_fast, temperature=None, n_vehicles=None,
+              floor=SOH_SERVICE_FLOOR, half_life_days=HALF_LIFE_DAYS, chunk_rows=CHUNK_ROWS):
+    """
+    Fit every vehicle's degradation trend and project days to `floor`.
+
+    Args:
+        codes (np.ndarray): Vehicle number per reading (0..n_vehicles-1), sorted
+            ascending, readings of one vehicle in date order.
+        days (np.ndarray): Reading date as a day number (e.g. datetime64[D] as int).
+        soh (np.ndarray): SoH per reading, in percent.
+        is_fast (np.ndarray): True where the reading's charge was a fast charge.
+        temperature (np.ndarray): Ambient temperature per reading (optional).
+        floor (float): SoH level to forecast.
+        half_life_days (float): Recency weighting; None weights all readings equally.
+        chunk_rows (int): Readings processed at a time, which bounds memory.
+
+    Returns a dict of per-vehicle arrays (see FORECAST_FIELDS). days_to_floor
+    is inf for vehicles that are not degrading and NaN for vehicles with
+    fewer than MIN_FORECAST_READINGS readings.
+    """
+    codes = np.asarray(codes)
+    if n_vehicles is None:
+        n_vehicles = int(codes[-1]) + 1 if len(codes) else 0
+    counts = np.bincount(codes, minlength=n_vehicles)
+    present = np.flatnonzero(counts)
+    present_counts = counts[present]
+    ends = np.cumsum(present_counts)
+    starts = ends - present_counts
+
+    k = 4
+    xtx = np.zeros((len(present), k, k))
+    xty = np.zeros((len(present), k))
+    extra = {name: np.zeros(len(present)) for name in ("yty", "weight", "fast", "heat", "span", "latest")}
+    block = 0
+    while block < len(present):
+        # Whole vehicles only, at least one per block
+        stop = max(block + 1, int(np.searchsorted(ends, starts[block] + chunk_rows, side='right')))
+        r0, r1 = starts[block], ends[stop - 1]
+        fast = np.asarray(is_fast[r0:r1], dtype=np.float64)
+        heat = np.zeros(r1 - r0) if temperature is None else heat_degrees(temperature[r0:r1])
+        part = _moments(np.asarray(days[r0:r1], dtype=np.float64), np.asarray(soh[r0:r1], dtype=np.float64),
+                        fast, heat, starts[block:stop] - r0, present_counts[block:stop], half_life_days)
+        xtx[block:stop], xty[block:stop] = part[0], part[1]
+        for name, values in part[2].items():
+            extra[name][block:stop] = values
+        block = stop
+
+    values = solve_moments(xtx, xty, extra, present_counts, floor)
+    # Vehicles without readings get NaN
+    result = {}
+    for name, per_present in values.items():
+        result[name] = np.full(n_vehicles, np.nan)
+        result[name][present] = per_present
+    result["readings"] = counts
+    return result
+
+
+def forecast_fleet(df, vehicle_column="vin", floor=SOH_SERVICE_FLOOR, half_life_days=HALF_LIFE_DAYS):
+    """
+    Forecast every vehicle in a long telemetry DataFrame.
+
+    Needs `date`, `SoH` and `charge_type` columns (`temperature` is used when
+    present). Returns a DataFrame indexed by vehicle id with FORECAST_FIELDS
+    and `projected_date` (NaT when the vehicle is not degrading).
+    """
+    import pandas as pd
+
+    codes, ids = pd.factorize(df[vehicle_column], sort=True)
+    day_numbers = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    order = slice(None)
+    if len(codes) > 1 and not np.all((np.diff(codes) > 0) | ((np.diff(codes) == 0) & (np.diff(day_numbers) >= 0))):
+        order = np.lexsort((day_numbers, codes))
+        codes, day_numbers = codes[order], day_numbers[order]
+    temperature = df['temperature'].to_numpy()[order] if 'temperature' in df.columns else None
+
+    result = fit_fleet(codes, day_numbers, df['SoH'].to_numpy()[order],
+                       df['charge_type'].to_numpy()[order] == 'fast', temperature,
+                       n_vehicles=len(ids), floor=floor, half_life_days=half_life_days)
+    forecast = pd.DataFrame(result, index=pd.Index(ids, name=vehicle_column))
+
+    last_dates = day_numbers[np.cumsum(result["readings"]) - 1].astype('datetime64[D]')
+    ahead = np.where(np.isfinite(result["days_to_floor"]), np.ceil(result["days_to_floor"]), np.nan)
+    forecast['projected_date'] = pd.to_datetime(last_dates) + pd.to_timedelta(ahead, unit='D')
+    return forecast
+
+
+def forecast_summary(row, floor=SOH_SERVICE_FLOOR):
+    """
+    The `forecast` dict stored in battery_insight, from one forecast_fleet()
+    row (as a dict); None when there were too few readings to fit.
+    """
+    if row['readings'] < MIN_FORECAST_READINGS:
+        return None
+    projected = np.isfinite(row['days_to_floor'])  # False when not degrading
+    return {
+        "soh_floor": floor,
+        "days_to_floor": round(float(row['days_to_floor']), 1) if projected else None,
+        "projected_date": row['projected_date'].strftime('%Y-%m-%d') if projected else None,
+        "daily_loss": round(float(row['daily_loss']), 4) + 0.0,  # no -0.0
+        "fast_share": round(float(row['fast_share']), 3),
+        "rmse": round(float(row['rmse']), 4),
+    }
+
+
+def forecast_vehicle(df, floor=SOH_SERVICE_FLOOR, half_life_days=HALF_LIFE_DAYS):
+    """Forecast one vehicle's telemetry (BatteryInsightAgent.load_data output); see forecast_summary."""
+    if len(df) < MIN_FORECAST_READINGS:
+        return None
+    forecast = forecast_fleet(df.assign(_vehicle=0), vehicle_column='_vehicle', floor=floor,
+                              half_life_days=half_life_days)
+    return forecast_summary(forecast.to_dict('records')[0], floor)
+
+
+def forecast_urgency(forecast):
+    """Urgency implied by a forecast ("high"/"medium"), or None if the floor is far off or unknown."""
+    days = (forecast or {}).get("days_to_floor")
+    if days is None:
+        return None
+    for urgency, horizon in FORECAST_URGENCY_DAYS:
+        if days <= horizon:
+            return urgency
+    return None
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    df = pd.read_csv('battery_logs.csv')
+    print(forecast_vehicle(df))
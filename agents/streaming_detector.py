@@ -0,0 +1,135 @@
+import os
+import sys
+from collections import deque
+
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.battery_agent import (
+    ANOMALY_THRESHOLD,
+    HIGH_DEGRADATION_THRESHOLD,
+    classify_status,
+)
+
+class _VehicleState:
+    # Constant-size running state kept per vehicle
+    __slots__ = ("last_soh", "last_date", "drop_sum", "drop_count", "status", "recent_anomalies")
+
+    def __init__(self, max_recent):
+        self.last_soh = None
+        self.last_date = None
+        self.drop_sum = 0.0
+        self.drop_count = 0
+        self.status = None
+        self.recent_anomalies = deque(maxlen=max_recent)
+
+class StreamingAnomalyDetector:
+    """
+    Online version of BatteryInsightAgent's anomaly and status checks.
+
+    Records (dicts with vehicle id, `date`, `SoH` and optionally
+    `charge_type`) are processed one at a time or in micro-batches, with O(1)
+    state per vehicle. An event is emitted as soon as a drop crosses a
+    threshold or the vehicle's degradation status changes:
+
+        {"type": "anomaly" | "high_degradation" | "status_change",
+         "vehicle_id": ..., "date": ..., "soh": ..., "soh_drop": ...,
+         "status": ..., "previous_status": ...}
+    """
+
+    def __init__(self, vehicle_column="vin", anomaly_threshold=ANOMALY_THRESHOLD,
+                 high_degradation_threshold=HIGH_DEGRADATION_THRESHOLD, max_recent_anomalies=10):
+        self.vehicle_column = vehicle_column
+        self.anomaly_threshold = anomaly_threshold
+        self.high_degradation_threshold = high_degradation_threshold
+        self.max_recent_anomalies = max_recent_anomalies
+        self.vehicles = {}
+
+    def update(self, record):
+        """Process one record and return the list of events it triggered."""
+        vehicle_id = record.get(self.vehicle_column, "default")
+        vehicle = self.vehicles.get(vehicle_id)
+        if vehicle is None:
+            vehicle = self.vehicles[vehicle_id] = _VehicleState(self.max_recent_anomalies)
+
+        soh = float(record["SoH"])
+        date = pd.Timestamp(record["date"])
+        events = []
+
+        if vehicle.last_soh is not None:
+            drop = vehicle.last_soh - soh
+            vehicle.drop_sum += drop
+            vehicle.drop_count += 1
+            base = {"vehicle_id": vehicle_id, "date": date, "soh": soh, "soh_drop": drop}
+            if drop > self.anomaly_threshold:
+                vehicle.recent_anomalies.append(date)
+                events.append({"type": "anomaly", **base})
+            if drop > self.high_degradation_threshold:
+                events.append({"type": "high_degradation", **base})
+
+            status, _ = classify_status(vehicle.drop_sum / vehicle.drop_count)
+            if vehicle.status is not None and status != vehicle.status:
+                events.append({"type": "status_change", **base,
+                               "status": status, "previous_status": vehicle.status})
+            vehicle.status = status
+
+        vehicle.last_soh = soh
+        vehicle.last_date = date
+        return events
+
+    def process(self, records):
+        """
+        Yield events from an iterable of records or micro-batches.
+
+        Each item may be a single record dict, a list of record dicts, or a DataFrame.
+        """
+        for item in records:
+            for record in self._records(item):
+                yield from self.update(record)
+
+    async def aprocess(self, queue):
+        """
+        Async generator over an asyncio.Queue of records or micro-batches.
+
+        Put `None` on the queue to stop.
+        """
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                for record in self._records(item):
+                    for event in self.update(record):
+                        yield event
+            finally:
+                queue.task_done()
+
+    def _records(self, item):
+        if isinstance(item, pd.DataFrame):
+            return item.to_dict("records")
+        if isinstance(item, dict):
+            return [item]
+        return item
+
+    def insight(self, vehicle_id):
+        """Current battery_insight for a vehicle, in the shape the service planner reads."""
+        vehicle = self.vehicles[vehicle_id]
+        avg_loss = vehicle.drop_sum / vehicle.drop_count if vehicle.drop_count else float("nan")
+        status, recommendation = classify_status(avg_loss)
+        anomalies = list(vehicle.recent_anomalies)
+        return {
+            "status": status,
+            "recommendation": recommendation,
+            "anomalies": anomalies,
+            "average_loss_per_cycle": avg_loss,
+            "anomalies_count": anomalies,
+            "latest_soh": round(vehicle.last_soh, 2),
+            "latest_date": vehicle.last_date,
+        }
+
+if __name__ == "__main__":
+    detector = StreamingAnomalyDetector()
+    df = pd.read_csv('battery_logs.csv')
+    for event in detector.process(df.to_dict("records")):
+        print(event)
+    print(detector.insight("default"))
@@ -0,0 +1,243 @@
+"""
+Pluggable telemetry sources for battery logs.
+
+Every source exposes `read(columns, vehicle_ids, start, end)` and returns a
+DataFrame with a parsed `date` column. The Parquet backend pushes the column
+selection and the vehicle/date filters down to the file (row groups that
+cannot match are never decoded) and can memory-map the file; the CSV backend
+keeps the original behaviour and filters after parsing. FrameTelemetrySource
+wraps data that is already in memory (a DataFrame, an Arrow table or raw
+file bytes) so it is never written out and parsed again; read_csv_blocks()
+parses large in-memory CSVs (e.g. dashboard uploads) block by block.
+"""
+import csv
+import io
+import os
+
+import pandas as pd
+
+# Columns BatteryInsightAgent actually needs
+TELEMETRY_COLUMNS = ['date', 'SoH', 'charge_type']
+VEHICLE_COLUMN = 'vin'
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+class CsvTelemetrySource:
+    """CSV logs; `path` may also be a list of part files of one log, read in order and concatenated."""
+
+    def __init__(self, path, vehicle_column=VEHICLE_COLUMN, chunksize=1_000_000):
+        self.path = path
+        self.vehicle_column = vehicle_column
+        self.chunksize = chunksize
+
+    def read(self, columns=None, vehicle_ids=None, start=None, end=None):
+        if isinstance(self.path, (list, tuple)):
+            parts = [CsvTelemetrySource(path, self.vehicle_column, self.chunksize)
+                     .read(columns=columns, vehicle_ids=vehicle_ids, start=start, end=end)
+                     for path in self.path]
+            return pd.concat(parts, ignore_index=True)
+        wanted = set(columns) if columns is not None else None
+        if wanted is not None and vehicle_ids is not None:
+            wanted.add(self.vehicle_column)
+        usecols = (lambda c: c in wanted) if wanted is not None else None
+        parse_dates = ['date'] if wanted is None or 'date' in wanted else None
+
+        if vehicle_ids is None and start is None and end is None:
+            return pd.read_csv(self.path, usecols=usecols, parse_dates=parse_dates)
+
+        # CSV has no pushdown: filter chunk by chunk so only matching rows are kept
+        parts = []
+        for chunk in pd.read_csv(self.path, usecols=usecols, parse_dates=parse_dates,
+                                 chunksize=self.chunksize):
+            parts.append(_filter_frame(chunk, self.vehicle_column, vehicle_ids, start, end))
+        df = pd.concat(parts, ignore_index=True)
+        if columns is not None and self.vehicle_column not in columns:
+            df = df.drop(columns=[self.vehicle_column], errors='ignore')
+        return df
+
+
+class ParquetTelemetrySource:
+    def __init__(self, path, vehicle_column=VEHICLE_COLUMN, memory_map=True):
+        self.path = path
+        self.vehicle_column = vehicle_column
+        self.memory_map = memory_map
+
+    def read_table(self, columns=None, vehicle_ids=None, start=None, end=None):
+        """Read a pyarrow Table with column and predicate pushdown."""
+        import pyarrow.parquet as pq
+
+        filters = []
+        if vehicle_ids is not None:
+            filters.append((self.vehicle_column, 'in', list(vehicle_ids)))
+        if start is not None:
+            filters.append(('date', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('date', '<=', pd.Timestamp(end)))
+
+        if columns is not None:
+            # Like the CSV and in-memory sources, skip requested columns the file lacks
+            schema = (pq.read_schema(self.path, memory_map=self.memory_map) if os.path.isfile(self.path)
+                      else pq.ParquetDataset(self.path).schema)
+            columns = [c for c in columns if c in schema.names]
+        return pq.read_table(self.path, columns=columns, filters=filters or None,
+                             memory_map=self.memory_map)
+
+    def read(self, columns=None, vehicle_ids=None, start=None, end=None):
+        table = self.read_table(columns=columns, vehicle_ids=vehicle_ids, start=start, end=end)
+        df = table.to_pandas()
+        if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+            df['date'] = pd.to_datetime(df['date'])
+        return df
+
+
+class FrameTelemetrySource:
+    """
+    Telemetry already loaded in memory.
+
+    `data` may be a pandas DataFrame, a pyarrow Table, or CSV/Parquet file
+    contents as bytes or a binary file-like object. A DataFrame is never
+    re-parsed; it is returned as-is only when read() gets no columns and no
+    filters (the caller's frame, not a copy). Selecting columns, filtering
+    or parsing `date` returns a new frame.
+    """
+
+    def __init__(self, data, vehicle_column=VEHICLE_COLUMN):
+        self.data = data
+        self.vehicle_column = vehicle_column
+
+    def _to_frame(self, columns):
+        data = self.data
+        if isinstance(data, pd.DataFrame):
+            return data if columns is None else data[[c for c in columns if c in data.columns]]
+        if hasattr(data, 'select') and hasattr(data, 'to_pandas'):  # pyarrow Table
+            if columns is not None:
+                data = data.select([c for c in columns if c in data.column_names])
+            return data.to_pandas()
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = io.BytesIO(data)
+        if hasattr(data, 'seek'):
+            data.seek(0)
+        if data.read(4) == b'PAR1':
+            data.seek(0)
+            return pd.read_parquet(data, columns=columns)
+        data.seek(0)
+        usecols = (lambda c: c in columns) if columns is not None else None
+        return pd.read_csv(data, usecols=usecols)
+
+    def read(self, columns=None, vehicle_ids=None, start=None, end=None):
+        wanted = columns
+        if columns is not None and vehicle_ids is not None:
+            wanted = list(columns) + [self.vehicle_column]
+        df = self._to_frame(wanted)
+        if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+            df = df.assign(date=pd.to_datetime(df['date']))
+        if vehicle_ids is not None or start is not None or end is not None:
+            df = _filter_frame(df, self.vehicle_column, vehicle_ids, start, end)
+        if columns is not None and self.vehicle_column not in columns:
+            df = df.drop(columns=[self.vehicle_column], errors='ignore')
+        return df
+
+
+def _filter_frame(df, vehicle_column, vehicle_ids, start, end):
+    mask = pd.Series(True, index=df.index)
+    if vehicle_ids is not None:
+        if vehicle_column not in df.columns:
+            raise ValueError(f"Cannot filter by vehicle id: telemetry has no '{vehicle_column}' column")
+        mask &= df[vehicle_column].isin(list(vehicle_ids))
+    if start is not None:
+        mask &= df['date'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['date'] <= pd.Timestamp(end)
+    return df[mask]
+
+
+def read_csv_blocks(data, columns=None, block_size=CSV_BLOCK_SIZE, on_progress=None,
+                    vehicle_column=VEHICLE_COLUMN):
+    """
+    Parse CSV contents into a DataFrame one block at a time.
+
+    Uses pyarrow's streaming reader, so only one block of text is being
+    converted at a time and `charge_type` is kept as a category instead of
+    a column of Python strings. `date` becomes datetime64; the vehicle
+    column is always read as text, so numeric VINs match string ids.
+
+    Args:
+        data (bytes | file-like): CSV contents.
+        columns (list): Columns to keep (missing ones are skipped), or None for all.
+        block_size (int): Bytes parsed per block.
+        on_progress (callable): Called with the fraction of the input read after every block.
+        vehicle_column (str): Column holding vehicle ids.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        if hasattr(data, 'seek'):
+            data.seek(0)
+        data = data.read()
+    if columns is not None:
+        # Like the other sources, skip requested columns the header lacks
+        first_line = bytes(data[:64 * 1024]).split(b'\n', 1)[0]
+        header = next(csv.reader([first_line.decode('utf-8-sig')]), [])
+        columns = [c for c in columns if c in header]
+    source = pa.BufferReader(pa.py_buffer(data))  # zero-copy view of the bytes
+    size = max(len(data), 1)
+
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={'charge_type': pa.dictionary(pa.int32(), pa.string()),
+                          vehicle_column: pa.string()}))
+
+    batches = []
+    for batch in reader:
+        batches.append(batch)
+        if on_progress is not None:
+            # Every block but the last is block_size bytes of input (the reader reads ahead, so tell() can't be used)
+            on_progress(min(len(batches) * block_size / size, 1.0))
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    df = table.to_pandas(date_as_object=False, self_destruct=True)
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def open_source(path, **kwargs):
+    """Pick a telemetry source from the path: Parquet files/datasets, otherwise CSV (also for a list of CSV parts)."""
+    if isinstance(path, (list, tuple)):
+        return CsvTelemetrySource(list(path), **kwargs)
+    if os.path.isdir(path) or str(path).lower().endswith(PARQUET_EXTENSIONS):
+        return ParquetTelemetrySource(path, **kwargs)
+    return CsvTelemetrySource(path, **kwargs)
+
+
+def csv_to_parquet(csv_path, parquet_path, vehicle_column=VEHICLE_COLUMN,
+                   row_group_size=128 * 1024, compression='zstd'):
+    """
+    Convert a battery_logs.csv-style file to Parquet.
+
+    Rows are sorted by vehicle (if present) and date so row-group statistics
+    are tight and vehicle/date filters can skip most of the file. `date` is
+    stored as a timestamp and `charge_type` as a dictionary column.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = pd.read_csv(csv_path, parse_dates=['date'])
+    sort_keys = [vehicle_column, 'date'] if vehicle_column in df.columns else ['date']
+    df = df.sort_values(sort_keys, kind='stable', ignore_index=True)
+    if 'charge_type' in df.columns:
+        df['charge_type'] = df['charge_type'].astype('category')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, parquet_path, row_group_size=row_group_size,
+                   compression=compression)
+    return parquet_path
+
+
+if __name__ == "__main__":
+    out = csv_to_parquet('battery_logs.csv', 'battery_logs.parquet')
+    print(f"✅ Converted 'battery_logs.csv' to '{out}'")
@@ -0,0 +1,49 @@
+"""
+Lightweight sub-spans for the workflow instrumentation.
+
+Agents mark expensive steps with `with span("faiss_search"):`. While a node
+is being instrumented (see langgraph_flow/instrumentation.py) each span's
+wall time, CPU time and start timestamp are appended to that node's record;
+outside an instrumented node a span costs one context-variable lookup.
+
+The collector lives in a context variable, so spans opened in threads
+started with asyncio.to_thread (which copies the context) still land in
+the node that started them.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_collector = contextvars.ContextVar("span_collector", default=None)
+
+
+@contextmanager
+def collect_spans(spans):
+    """Append spans opened inside this block (in this context) to the `spans` list."""
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    spans = _collector.get()
+    if spans is None:
+        yield
+        return
+    start_ns = time.time_ns()
+    wall_start = time.perf_counter()
+    # The work inside a span runs on one thread, so thread CPU time is exact
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        spans.append({
+            "name": name,
+            "start_ns": start_ns,
+            "wall_s": time.perf_counter() - wall_start,
+            "cpu_s": time.thread_time() - cpu_start,
+            "attributes": attributes,
+        })
@@ -1,9 +1,71 @@
+import hashlib
+import os
+import time
+
 import streamlit as st
 import pandas as pd
 
-from langgraph.graph import StateGraph, END
+from agents.downsample import DEFAULT_CHART_POINTS, downsample_frame, fleet_overview
+from agents.telemetry_sources import VEHICLE_COLUMN, read_csv_blocks
 from langgraph_flow.state import initial_state
-from langgraph_flow.graph import build_graph
+from langgraph_flow.jobs import start_job
+from langgraph_flow.instrumentation import TRACE_MEMORY_ENV, configure_instrumentation, node_breakdown
+
+# Per-node allocation peaks: opt in with WORKFLOW_TRACE_MEMORY=1. tracemalloc slows
+# every allocation in the process, upload parsing included, for as long as it runs
+if os.environ.get(TRACE_MEMORY_ENV) == "1":
+    configure_instrumentation(trace_memory=True)
+
+POLL_INTERVAL_S = 0.5  # how often the page refreshes while a workflow runs
+
+
+def upload_hash(file):
+    # Hashing a large upload takes a while; do it once per uploaded file, not on every rerun
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    key = getattr(file, "file_id", None) or (file.name, file.size)
+    if key not in hashes:
+        hashes[key] = hashlib.sha256(file.getbuffer()).hexdigest()
+    return hashes[key]
+
+
+# Leading-underscore arguments are not hashed by Streamlit: the content hash is the cache key.
+# cache_resource hands back the same DataFrame without copying it; treat it as read-only.
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_upload(file_hash, _data, _on_progress=None):
+    """Parse an uploaded CSV block by block, once per file content."""
+    return read_csv_blocks(_data, on_progress=_on_progress)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def quick_stats(file_hash, _df):
+    """Metric label -> formatted value, computed once per file content."""
+    stats = {"Total Records": f"{len(_df):,}"}
+    if VEHICLE_COLUMN in _df.columns:
+        stats["Vehicles"] = f"{_df[VEHICLE_COLUMN].nunique():,}"
+    if 'SoH' in _df.columns:
+        stats["Avg SoH"] = f"{_df['SoH'].mean():.1f}%"
+    if 'temperature' in _df.columns:
+        stats["Avg Temp"] = f"{_df['temperature'].mean():.1f}°C"
+    return stats
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def soh_chart_data(file_hash, _df, vehicle_id="", points=DEFAULT_CHART_POINTS):
+    """
+    SoH over time, downsampled to `points` with LTTB, for one vehicle or all rows.
+
+    Returns (chart rows, readings before downsampling). Without a vehicle id
+    a fleet upload is summarized as the per-date mean and min SoH plus the
+    worst vehicles (fleet_overview), each in its own `series`.
+    """
+    df = _df
+    if VEHICLE_COLUMN not in df.columns:
+        return downsample_frame(df, 'date', 'SoH', points), len(df)
+    if vehicle_id:
+        # The text input is a string; compare as strings whatever dtype the ids were read with
+        df = df[df[VEHICLE_COLUMN].astype(str) == vehicle_id]
+        return downsample_frame(df, 'date', 'SoH', points), len(df)
+    return fleet_overview(df, VEHICLE_COLUMN, 'date', 'SoH', points), len(df)
 
 # Page configuration
 st.set_page_config(
@@ -31,8 +93,12 @@ file = st.sidebar.file_uploader(
 )
 
 if file:
-    # Load and display data
-    df = pd.read_csv(file)
+    # Load and display data; the content hash keys this upload's cached results
+    file_hash = upload_hash(file)
+    parsing = st.progress(0.0, text="Parsing upload...")
+    df = load_upload(file_hash, file.getbuffer(),
+                     _on_progress=lambda done: parsing.progress(done, text="Parsing upload..."))
+    parsing.empty()
     
     # Data preview section
     with st.container():
@@ -44,33 +110,66 @@ if file:
         
         with col2:
             st.markdown("### 📈 Quick Stats")
-            st.metric("Total Records", len(df))
-            if 'SoH' in df.columns:
-                st.metric("Avg SoH", f"{df['SoH'].mean():.1f}%")
-            if 'temperature' in df.columns:
-                st.metric("Avg Temp", f"{df['temperature'].mean():.1f}°C")
+            for label, value in quick_stats(file_hash, df).items():
+                st.metric(label, value)
+
+    if {'date', 'SoH'} <= set(df.columns):
+        st.markdown("### 📉 SoH Trend")
+        vehicle_id = ""
+        if VEHICLE_COLUMN in df.columns:
+            vehicle_id = st.text_input("Vehicle ID", placeholder="All vehicles (fleet overview)").strip()
+        chart, readings = soh_chart_data(file_hash, df, vehicle_id)
+        if chart.empty:
+            st.info(f"No SoH readings for vehicle {vehicle_id!r}")
+        else:
+            # Fleet overview: one line per series (mean, min, worst vehicles)
+            st.line_chart(chart, x='date', y='SoH',
+                          color='series' if 'series' in chart.columns else None)
+            if len(chart) < readings:
+                st.caption(f"Downsampled from {readings:,} to {len(chart):,} points (LTTB)")
 
     # Workflow execution
     st.markdown("---")
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
+        # Per-session results keyed by upload content, so reruns are instant
+        results = st.session_state.setdefault("workflow_results", {})
+        jobs = st.session_state.setdefault("workflow_jobs", {})
         if st.button("🚀 Run AI Analysis", type="primary", use_container_width=True):
-            # Initialize state
-            state = initial_state()
-            state["battery_data_csv"] = df
-            
-            # Run workflow with progress
-            with st.spinner("Running AI analysis..."):
-                final_state = build_graph(state)
-            
+            if file_hash not in results and file_hash not in jobs:
+                # Initialize state; the parsed DataFrame is handed to the agents as-is
+                state = initial_state()
+                state["battery_data"] = df
+                # Bookings are kept per vehicle; one upload stands for one vehicle
+                state["vehicle_id"] = f"upload-{file_hash[:16]}"
+
+                # Run the workflow in the background; the page polls it below
+                jobs[file_hash] = start_job(state)
+
+        job = jobs.get(file_hash)
+        if job is not None:
+            if not job.done:
+                st.progress(job.progress,
+                            text=f"Running AI analysis: {job.current_node} ({job.elapsed_s:.0f}s)")
+                time.sleep(POLL_INTERVAL_S)
+                st.rerun()
+            del jobs[file_hash]
+            if job.error is not None:
+                st.error(f"❌ Analysis failed: {job.error!r}")
+            else:
+                results[file_hash] = job.result()
+
+        if file_hash in results:
+            final_state = results[file_hash]
             st.success("✅ Analysis Complete!")
             
             # Results display
             st.markdown("## 📋 Analysis Results")
             
             # Create tabs for different outputs
-            tab1, tab2, tab3 = st.tabs(["🛠️ Service Plan", "📅 Appointment", "✉️ Communication"])
+            tab1, tab2, tab3, tab4 = st.tabs(["🛠️ Service Plan", "📅 Appointment", "✉️ Communication",
+                                              "⏱️ Performance"])
             
             with tab1:
                 if "service_plan" in final_state:
@@ -90,6 +189,18 @@ if file:
                 else:
                     st.info("No communication generated")
 
+            with tab4:
+                breakdown = pd.DataFrame(node_breakdown(final_state))
+                if breakdown.empty:
+                    st.info("No timing data recorded for this run")
+                else:
+                    totals = breakdown[breakdown["span"] == "(total)"].set_index("node")
+                    st.markdown("**Per-node latency (ms)**")
+                    st.bar_chart(totals[["wall_ms", "cpu_ms"]])
+                    st.metric("Total workflow time", f"{totals['wall_ms'].sum():.1f} ms")
+                    st.markdown("**Nodes and sub-spans**")
+                    st.dataframe(breakdown, use_container_width=True)
+
 else:
     # Welcome screen
     st.markdown("""
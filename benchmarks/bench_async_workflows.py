@@ -0,0 +1,96 @@
+"""
+Load test: concurrent vehicle workflows on one event loop.
+
+Runs the async graph for a synthetic fleet at increasing concurrency
+limits and reports throughput and per-workflow latency, against the
+synchronous graph run one vehicle at a time. Each workflow is a
+WorkflowRunner.ainvoke call under a semaphore (the limit abatch applies
+with max_concurrency), so its latency can be timed on its own. Retrieval
+is measured uncached by default so every workflow hits the embedding model;
+pass --cache to keep the query-result cache on. Run from the repo root so
+`vector_index/` is found:
+
+    python benchmarks/bench_async_workflows.py --vehicles 512 --concurrency 1,8,64,256
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.query_cache import configure_query_cache
+from agents.retriever import warm_up
+from benchmarks.bench_fleet_battery import make_fleet
+from langgraph_flow.graph import get_runner
+from langgraph_flow.state import initial_state
+
+
+def make_states(n_vehicles, days):
+    states = []
+    for vin, group in make_fleet(n_vehicles, days).groupby("vin", sort=False):
+        state = initial_state()
+        state["vehicle_id"] = vin
+        state["battery_data"] = group.drop(columns=["vin"]).reset_index(drop=True)
+        states.append(state)
+    return states
+
+
+async def _timed(runner, state, semaphore, latencies):
+    async with semaphore:
+        start = time.perf_counter()
+        result = await runner.ainvoke(state)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+
+async def run_concurrent(runner, states, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_timed(runner, dict(state), semaphore, latencies) for state in states))
+    return time.perf_counter() - start, latencies
+
+
+def run_sequential(runner, states):
+    latencies = []
+    start = time.perf_counter()
+    for state in states:
+        t0 = time.perf_counter()
+        runner.invoke(dict(state))
+        latencies.append(time.perf_counter() - t0)
+    return time.perf_counter() - start, latencies
+
+
+def report(label, elapsed, latencies):
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{label:>12} {len(latencies) / elapsed:12.1f} {p50:9.1f} {p99:9.1f} {elapsed:9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=512)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--concurrency", default="1,8,64,256")
+    parser.add_argument("--cache", action="store_true", help="Keep the RAG query-result cache on")
+    args = parser.parse_args()
+
+    if not args.cache:
+        configure_query_cache(maxsize=0)
+    print("Warm-up:", warm_up())
+    states = make_states(args.vehicles, args.days)
+    runner = get_runner()
+
+    print(f"{args.vehicles} vehicles x {args.days} days")
+    print(f"{'mode':>12} {'workflows/s':>12} {'p50_ms':>9} {'p99_ms':>9} {'total_s':>9}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        sequential = run_sequential(runner, states)
+    report("sync", *sequential)
+    for concurrency in [int(x) for x in args.concurrency.split(",")]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run_concurrent(runner, states, concurrency))
+        report(f"async x{concurrency}", *result)
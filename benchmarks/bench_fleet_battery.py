@@ -0,0 +1,68 @@
+"""
+Benchmark: vectorized FleetBatteryAnalyzer vs. one BatteryInsightAgent per vehicle.
+
+Scales from 1 to 100k vehicles. The per-vehicle baseline is only run up to
+--loop-max vehicles because it grows linearly with Python-level overhead.
+
+    python benchmarks/bench_fleet_battery.py --days 90
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.battery_agent import BatteryInsightAgent
+from agents.fleet_battery_agent import FleetBatteryAnalyzer
+from data.synthetic_data import generate_fleet_soh_data
+
+
+def make_fleet(n_vehicles, days, seed=42):
+    """Long fleet table from the synthetic data generator, with `date` parsed to datetime64."""
+    df = generate_fleet_soh_data(n_vehicles, days, seed=seed)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+class _FrameAgent(BatteryInsightAgent):
+    # Baseline agent fed from memory so the comparison excludes CSV parsing
+    def __init__(self, state, df):
+        super().__init__(state, data_path=None)
+        self.df = df
+
+    def load_data(self):
+        df = self.df.sort_values('date')
+        df['SoH_drop'] = df['SoH'].shift(1) - df['SoH']
+        return df
+
+
+def time_loop(df):
+    start = time.perf_counter()
+    for _, group in df.groupby("vin", sort=False):
+        _FrameAgent({}, group.drop(columns="vin")).analyze()
+    return time.perf_counter() - start
+
+
+def time_vectorized(df):
+    start = time.perf_counter()
+    FleetBatteryAnalyzer().analyze(df)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--sizes", default="1,10,100,1000,10000,100000")
+    parser.add_argument("--loop-max", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'vehicles':>9} {'rows':>10} {'vectorized_s':>13} {'veh/s':>10} {'per_vehicle_s':>14} {'speedup':>8}")
+    for n_vehicles in [int(x) for x in args.sizes.split(",")]:
+        df = make_fleet(n_vehicles, args.days)
+        vec_s = time_vectorized(df)
+        loop_s = time_loop(df) if n_vehicles <= args.loop_max else None
+        loop_col = f"{loop_s:14.3f}" if loop_s is not None else f"{'-':>14}"
+        speedup = f"{loop_s / vec_s:7.1f}x" if loop_s is not None else f"{'-':>8}"
+        print(f"{n_vehicles:>9} {len(df):>10} {vec_s:13.3f} {n_vehicles / vec_s:10.0f} {loop_col} {speedup}")
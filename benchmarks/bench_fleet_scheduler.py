@@ -0,0 +1,106 @@
+"""
+Benchmark: fleet-wide appointment assignment.
+
+Assigns a synthetic batch of vehicles (mixed urgency and SoH) to dealer slot
+inventories and compares:
+
+  * random   - the old SchedulerAgent behaviour: a random dealer and slot per
+               vehicle, in isolation (double bookings are counted, not prevented)
+  * sequential - SlotInventory.book per vehicle, in arrival order
+  * fleet    - FleetScheduler: one global solve and one booking transaction
+
+reporting solve time, weighted wait, deadline misses and unassigned vehicles.
+
+    python benchmarks/bench_fleet_scheduler.py --vehicles 10000 --dealers 50 --capacity 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.fleet_scheduler import FleetScheduler, URGENCY_DEADLINE_DAYS, vehicle_weight
+from agents.slot_inventory import SlotInventory, dealer_calendar
+
+
+def make_vehicles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    urgencies = rng.choice(["high", "medium", "low"], size=n, p=[0.1, 0.3, 0.6])
+    soh = rng.uniform(65, 100, n).round(2)
+    return [{"vehicle_id": f"VIN_{i:06d}", "urgency": str(u), "latest_soh": float(s)}
+            for i, (u, s) in enumerate(zip(urgencies, soh))]
+
+
+def score(vehicles, slots, today):
+    """Weighted wait, deadline misses and unassigned count for {vehicle_id: slot or None}."""
+    origin = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    weighted_wait, late, unassigned = 0.0, 0, 0
+    for vehicle in vehicles:
+        slot = slots.get(vehicle["vehicle_id"])
+        if slot is None:
+            unassigned += 1
+            continue
+        wait = (slot - origin).total_seconds() / 86400
+        weighted_wait += vehicle_weight(vehicle["urgency"], vehicle["latest_soh"]) * wait
+        deadline = URGENCY_DEADLINE_DAYS.get(vehicle["urgency"])
+        late += deadline is not None and wait >= deadline
+    return round(weighted_wait, 1), late, unassigned
+
+
+def report(label, seconds, vehicles, slots, today, extra=""):
+    weighted_wait, late, unassigned = score(vehicles, slots, today)
+    print(f"{label:<11} {seconds:9.3f} {weighted_wait:14.1f} {late:6d} {unassigned:11d}  {extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--dealers", type=int, default=50)
+    parser.add_argument("--capacity", type=int, default=4, help="Vehicles per dealer slot")
+    parser.add_argument("--skip-sequential", action="store_true",
+                        help="Skip booking vehicles one by one (one transaction each)")
+    args = parser.parse_args()
+
+    today = date.today()
+    dealers = tuple(f"Dealer_{i:02d}" for i in range(args.dealers))
+    vehicles = make_vehicles(args.vehicles)
+    calendar = dealer_calendar(today)
+    print(f"{args.vehicles} vehicles, {args.dealers} dealers x {len(calendar)} slots x "
+          f"capacity {args.capacity} = {args.dealers * len(calendar) * args.capacity} places")
+    print(f"{'mode':<11} {'seconds':>9} {'weighted_wait':>14} {'late':>6} {'unassigned':>11}")
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    picks = {v["vehicle_id"]: (rng.choice(dealers), rng.choice(calendar)) for v in vehicles}
+    elapsed = time.perf_counter() - start
+    taken = {}
+    for pick in picks.values():
+        taken[pick] = taken.get(pick, 0) + 1
+    overbooked = sum(max(0, n - args.capacity) for n in taken.values())
+    report("random", elapsed, vehicles, {vid: slot for vid, (_, slot) in picks.items()}, today,
+           f"overbooked={overbooked}")
+
+    workdir = tempfile.mkdtemp(prefix="fleet_sched_")
+    if not args.skip_sequential:
+        inventory = SlotInventory(os.path.join(workdir, "sequential.db"), dealers=dealers,
+                                  capacity=args.capacity)
+        start = time.perf_counter()
+        booked = {}
+        for vehicle in vehicles:
+            booking = inventory.book(vehicle["vehicle_id"], urgency=vehicle["urgency"], today=today)
+            booked[vehicle["vehicle_id"]] = booking["slot"] if booking else None
+        report("sequential", time.perf_counter() - start, vehicles, booked, today)
+
+    inventory = SlotInventory(os.path.join(workdir, "fleet.db"), dealers=dealers, capacity=args.capacity)
+    inventory.ensure_calendar(today)
+    start = time.perf_counter()
+    assignments, summary = FleetScheduler(inventory).assign(vehicles, today=today)
+    elapsed = time.perf_counter() - start
+    report("fleet", elapsed, vehicles, {a["vehicle_id"]: a["slot"] for a in assignments}, today,
+           f"solve_s={summary['solve_s']}")
+    print("Inventory after fleet solve:", inventory.stats())
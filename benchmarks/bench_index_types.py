@@ -0,0 +1,113 @@
+"""
+Benchmark: FAISS index types vs. the flat index on the project's manual chunks.
+
+Takes the chunk vectors from `vector_index/` (optionally replicated with
+noise via --replicate to simulate a larger manual library), builds every
+index type from agents.faiss_index, and reports recall@k against exact flat
+search, p50/p99 single-query latency, and resident memory after loading the
+index from disk (with and without memory-mapping, each in a fresh process).
+
+    python benchmarks/bench_index_types.py --replicate 200 --k 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.faiss_index import (
+    DEFAULT_SEARCH_PARAMS,
+    INDEX_TYPES,
+    apply_search_params,
+    make_faiss_index,
+    read_faiss_index,
+)
+
+
+def _current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def load_corpus(index_path, replicate, seed=0):
+    index = read_faiss_index(index_path, mmap=False)
+    base = index.reconstruct_n(0, index.ntotal)
+    if replicate <= 1:
+        return base
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.05, (replicate, *base.shape)).astype(np.float32)
+    return (base[None, :, :] + noise).reshape(-1, base.shape[1])
+
+
+def make_queries(corpus, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, len(corpus), n_queries)]
+    return (picks + rng.normal(0, 0.1, picks.shape)).astype(np.float32)
+
+
+def measure_memory(index_dir, mmap):
+    """RSS growth of a fresh process that loads the index and runs one search."""
+    code = (
+        "import sys, json, numpy as np; sys.path.insert(0, %r);"
+        "from benchmarks.bench_index_types import _current_rss_mb;"
+        "from agents.faiss_index import read_faiss_index; import faiss;"
+        # Warm faiss' thread pools first so only the index itself is measured
+        "faiss.IndexFlatL2(4).search(np.zeros((1, 4), dtype=np.float32), 1);"
+        "before = _current_rss_mb(); index = read_faiss_index(%r, mmap=%r);"
+        "index.search(np.zeros((1, index.d), dtype=np.float32), 3);"
+        "print(json.dumps(round(_current_rss_mb() - before, 1)))"
+    ) % (os.path.abspath(os.path.join(os.path.dirname(__file__), '..')), index_dir, mmap)
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-path", default="vector_index")
+    parser.add_argument("--replicate", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_SEARCH_PARAMS["nprobe"])
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_SEARCH_PARAMS["ef_search"])
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.index_path, args.replicate)
+    queries = make_queries(corpus, args.queries)
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    exact = None
+    workdir = tempfile.mkdtemp(prefix="index_bench_")
+    print(f"{'index':<9} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p99_ms':>8} "
+          f"{'disk_mb':>8} {'rss_mb':>7} {'rss_mmap_mb':>12}")
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = make_faiss_index(corpus, index_type)
+        index.add(corpus)
+        build_s = time.perf_counter() - start
+        apply_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+
+        latencies = []
+        results = np.empty((len(queries), args.k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            t0 = time.perf_counter()
+            _, ids = index.search(query[None, :], args.k)
+            latencies.append(time.perf_counter() - t0)
+            results[i] = ids[0]
+        if exact is None:
+            exact = results  # "flat" is first in INDEX_TYPES
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(results, exact)])
+
+        index_dir = os.path.join(workdir, index_type)
+        os.makedirs(index_dir)
+        faiss.write_index(index, os.path.join(index_dir, "index.faiss"))
+        disk_mb = os.path.getsize(os.path.join(index_dir, "index.faiss")) / 2**20
+
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{index_type:<9} {build_s:8.3f} {recall:9.3f} {p50:8.3f} {p99:8.3f} "
+              f"{disk_mb:8.2f} {measure_memory(index_dir, False):7.1f} {measure_memory(index_dir, True):12.1f}")
@@ -0,0 +1,66 @@
+"""
+Benchmark: per-query RAG latency, one query at a time vs. batched retrieval.
+
+Builds synthetic battery analyses (a mix of repeated and distinct SoH values)
+and times ServicePlannerAgent.query_service_manual per vehicle against
+query_service_manual_batch at increasing batch sizes. Run from the repo root
+so `vector_index/` is found:
+
+    python benchmarks/bench_rag_batch.py --sizes 1,8,32,128,512
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.query_cache import configure_query_cache
+from agents.retriever import warm_up
+from agents.service_planner_agent import ServicePlannerAgent
+
+
+def make_analyses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    soh = rng.uniform(80, 100, n).round(1)
+    analyses = []
+    for i in range(n):
+        anomalies = ["2025-07-01"] if rng.random() < 0.1 else []
+        analyses.append({"latest_soh": float(soh[i]), "anomalies": anomalies})
+    return analyses
+
+
+def time_sequential(analyses):
+    agent = ServicePlannerAgent(state={})
+    start = time.perf_counter()
+    for analysis in analyses:
+        agent.query_service_manual(analysis)
+    return time.perf_counter() - start
+
+
+def time_batched(analyses):
+    start = time.perf_counter()
+    ServicePlannerAgent.query_service_manual_batch(analyses)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,8,32,128,512")
+    args = parser.parse_args()
+
+    # Measure retrieval itself, not the query-result cache
+    configure_query_cache(maxsize=0)
+    print("Warm-up:", warm_up())
+    print(f"{'batch':>6} {'unique':>7} {'sequential_ms/q':>16} {'batched_ms/q':>13} {'speedup':>8}")
+    for size in [int(x) for x in args.sizes.split(",")]:
+        analyses = make_analyses(size)
+        unique = len({ServicePlannerAgent.build_query(a) for a in analyses})
+        with contextlib.redirect_stdout(io.StringIO()):
+            seq_s = time_sequential(analyses)
+            batch_s = time_batched(analyses)
+        print(f"{size:>6} {unique:>7} {seq_s / size * 1000:16.2f} "
+              f"{batch_s / size * 1000:13.2f} {seq_s / batch_s:7.1f}x")
@@ -0,0 +1,144 @@
+"""
+Load test: requests/sec and latency percentiles of the local retrieval server.
+
+For each concurrency level, that many client threads send requests back to
+back for --duration seconds. The script reports throughput, p50/p95/p99
+latency, and the server's mean micro-batch size over the run. By default
+the server is started as a subprocess (its own interpreter, as in
+production); --url targets one that is already running, and --in-process
+runs it on a thread of this process.
+
+/analyze requests carry a random battery analysis; SoH is spread over
+--soh-values distinct values, so a small number lets the server's query
+cache answer most of them. /search requests use unique query text and
+always reach the model.
+
+    python benchmarks/bench_retrieval_server.py --clients 1,8,32 --duration 10 --endpoint search
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.retrieval_server import MAX_WAIT_S, RetrievalClient, serve
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STARTUP_TIMEOUT_S = 300
+
+
+def start_subprocess_server(port, max_wait_ms):
+    env = {key: value for key, value in os.environ.items() if key != "RETRIEVAL_SERVER_URL"}
+    process = subprocess.Popen([sys.executable, os.path.join("agents", "retrieval_server.py"),
+                                "--port", str(port), "--max-wait-ms", str(max_wait_ms)],
+                               cwd=REPO_ROOT, env=env)
+    client = RetrievalClient(f"http://127.0.0.1:{port}", timeout=5)
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    while True:
+        try:
+            client.health()
+            return process
+        except (OSError, RuntimeError):
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("retrieval server did not start")
+            time.sleep(0.2)
+
+
+def start_thread_server(max_wait_ms):
+    server = serve(port=0, max_wait_s=max_wait_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_request(endpoint, soh_values, rng):
+    if endpoint == "analyze":
+        soh = 60 + 40 * rng.randrange(soh_values) / max(soh_values - 1, 1)
+        anomalies = [f"2025-06-{day:02d}" for day in rng.sample(range(1, 29), rng.randrange(3))]
+        return {"latest_soh": round(soh, 2), "anomalies": anomalies}
+    return f"Battery at {rng.uniform(60, 100):.3f}% SoH. Which service procedures apply? {rng.random()}"
+
+
+def run_clients(url, n_clients, duration_s, endpoint, soh_values):
+    latencies = [[] for _ in range(n_clients)]
+    errors = [0] * n_clients
+    start_barrier = threading.Barrier(n_clients + 1)
+
+    def worker(i):
+        client = RetrievalClient(url)
+        rng = random.Random(i)
+        call = client.analyze if endpoint == "analyze" else client.search
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration_s
+        while True:
+            request = make_request(endpoint, soh_values, rng)
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            try:
+                call([request])
+            except Exception:
+                errors[i] += 1
+                continue
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - start
+    return np.concatenate([np.asarray(l) for l in latencies]) * 1000, sum(errors), wall_s
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the local retrieval server.")
+    parser.add_argument("--url", help="Server to test (default: start one)")
+    parser.add_argument("--in-process", action="store_true", help="Run the server on a thread of this process")
+    parser.add_argument("--port", type=int, default=8799, help="Port for the server started by this script")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_S * 1000)
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--endpoint", choices=["analyze", "search"], default="analyze")
+    parser.add_argument("--soh-values", type=int, default=1000)
+    args = parser.parse_args()
+
+    process = server = None
+    url = args.url
+    if url is None and args.in_process:
+        server, url = start_thread_server(args.max_wait_ms)
+    elif url is None:
+        process = start_subprocess_server(args.port, args.max_wait_ms)
+        url = f"http://127.0.0.1:{args.port}"
+
+    monitor = RetrievalClient(url)
+    batch_key = "findings_batches" if args.endpoint == "analyze" else "search_batches"
+    print(f"{'clients':>7} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50_ms':>8} {'p95_ms':>8} "
+          f"{'p99_ms':>8} {'mean_batch':>10}")
+    try:
+        for n_clients in [int(x) for x in args.clients.split(",")]:
+            before = monitor.health()[batch_key]
+            latencies, errors, wall_s = run_clients(url, n_clients, args.duration, args.endpoint,
+                                                    args.soh_values)
+            after = monitor.health()[batch_key]
+            batches = after["batches"] - before["batches"]
+            mean_batch = (after["items"] - before["items"]) / batches if batches else float("nan")
+            p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) if len(latencies)
+                             else (float("nan"),) * 3)
+            print(f"{n_clients:>7} {len(latencies):>9} {errors:>7} {len(latencies) / wall_s:9.1f} "
+                  f"{p50:8.2f} {p95:8.2f} {p99:8.2f} {mean_batch:10.1f}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            server.service.close()
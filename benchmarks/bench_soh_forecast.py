@@ -0,0 +1,87 @@
+"""
+Benchmark: batched SoH forecasting (agents/soh_forecast.fit_fleet) vs. one
+weighted least-squares fit per vehicle.
+
+Telemetry arrays come straight from data/synthetic_data.simulate_vehicles,
+so the timings cover the fit only. The per-vehicle baseline (np.linalg.lstsq
+on each vehicle's design matrix) is run up to --loop-max vehicles and also
+checks that both give the same days to the floor.
+
+    python benchmarks/bench_soh_forecast.py --days 365 --sizes 1000,10000,100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.soh_forecast import HALF_LIFE_DAYS, HEAT_REFERENCE_C, SOH_SERVICE_FLOOR, fit_fleet
+from data.synthetic_data import simulate_vehicles
+
+
+def make_arrays(n_vehicles, days, seed=42):
+    sim = simulate_vehicles(np.random.default_rng(seed), n_vehicles, days)
+    return {
+        "codes": np.repeat(np.arange(n_vehicles), days),
+        "days": np.tile(np.arange(days), n_vehicles),
+        "soh": sim["SoH"].ravel(),
+        "is_fast": sim["is_fast_charge"].ravel(),
+        "temperature": sim["temperature"].ravel(),
+    }
+
+
+def fit_one(days, soh, is_fast, temperature):
+    # Same model and weighting as fit_fleet, one vehicle at a time
+    fast = is_fast.astype(float)
+    heat = np.maximum(temperature - HEAT_REFERENCE_C, 0.0)
+    X = np.column_stack((np.ones(len(days)), fast.cumsum(), (1 - fast).cumsum(), heat.cumsum()))
+    w = np.sqrt(0.5 ** ((days[-1] - days) / HALF_LIFE_DAYS))
+    beta = np.linalg.lstsq(X * w[:, None], soh * w, rcond=None)[0]
+    weight = w ** 2
+    fast_share = (weight * fast).sum() / weight.sum()
+    heat_rate = (weight * heat).sum() / weight.sum()
+    daily_loss = -(fast_share * beta[1] + (1 - fast_share) * beta[2] + heat_rate * beta[3])
+    return (soh[-1] - SOH_SERVICE_FLOOR) / daily_loss if daily_loss > 0 else np.inf
+
+
+def time_loop(arrays, n_vehicles, days):
+    start = time.perf_counter()
+    results = []
+    for v in range(n_vehicles):
+        rows = slice(v * days, (v + 1) * days)
+        results.append(fit_one(arrays["days"][rows].astype(float), arrays["soh"][rows],
+                               arrays["is_fast"][rows], arrays["temperature"][rows]))
+    return time.perf_counter() - start, np.array(results)
+
+
+def time_batched(arrays, n_vehicles):
+    start = time.perf_counter()
+    result = fit_fleet(arrays["codes"], arrays["days"], arrays["soh"], arrays["is_fast"],
+                       arrays["temperature"], n_vehicles=n_vehicles)
+    return time.perf_counter() - start, result["days_to_floor"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--sizes", default="1,100,1000,10000,100000")
+    parser.add_argument("--loop-max", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'vehicles':>9} {'readings':>11} {'batched_s':>10} {'veh/s':>10} {'per_vehicle_s':>14} "
+          f"{'speedup':>8} {'max_diff_days':>14}")
+    for n_vehicles in [int(x) for x in args.sizes.split(",")]:
+        arrays = make_arrays(n_vehicles, args.days)
+        batched_s, batched = time_batched(arrays, n_vehicles)
+        line = f"{n_vehicles:>9} {len(arrays['codes']):>11} {batched_s:10.3f} {n_vehicles / batched_s:10.0f}"
+        if n_vehicles <= args.loop_max:
+            loop_s, looped = time_loop(arrays, n_vehicles, args.days)
+            finite = np.isfinite(looped) & np.isfinite(batched)
+            diff = np.abs(looped[finite] - batched[finite]).max() if finite.any() else 0.0
+            line += f" {loop_s:14.3f} {loop_s / batched_s:7.1f}x {diff:14.3f}"
+        else:
+            line += f" {'-':>14} {'-':>8} {'-':>14}"
+        print(line)
+        del arrays
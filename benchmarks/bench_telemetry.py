@@ -0,0 +1,97 @@
+"""
+Benchmark: CSV vs. Parquet telemetry loading (time and peak memory).
+
+Writes a synthetic fleet log as CSV and Parquet, then loads it through each
+telemetry source in a fresh subprocess so peak RSS is measured per load:
+a full read of the agent's columns, and a single-vehicle read with a date
+range (pushed down to the file for Parquet).
+
+    python benchmarks/bench_telemetry.py --vehicles 20000 --days 90
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.telemetry_sources import TELEMETRY_COLUMNS, csv_to_parquet, open_source
+
+
+def _peak_rss_mb():
+    # VmHWM is per address space; ru_maxrss would inherit the parent's peak across exec
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+def _current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def run_load(path, vehicle_id=None, start=None, end=None, memory_map=True):
+    kwargs = {"memory_map": memory_map} if path.endswith(".parquet") else {}
+    baseline = _current_rss_mb()
+    t0 = time.perf_counter()
+    df = open_source(path, **kwargs).read(
+        columns=TELEMETRY_COLUMNS,
+        vehicle_ids=[vehicle_id] if vehicle_id else None,
+        start=start, end=end)
+    df.sort_values("date", inplace=True)
+    elapsed = time.perf_counter() - t0
+    return {"rows": len(df), "load_s": round(elapsed, 3),
+            "peak_rss_delta_mb": round(_peak_rss_mb() - baseline, 1)}
+
+
+def _measure(args):
+    # Re-run this script as a worker so each load starts from a clean process
+    out = subprocess.run([sys.executable, __file__, "--worker", json.dumps(args)],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--worker")
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_load(**json.loads(args.worker))))
+        sys.exit(0)
+
+    from bench_fleet_battery import make_fleet
+
+    workdir = tempfile.mkdtemp(prefix="telemetry_bench_")
+    csv_path = os.path.join(workdir, "fleet_logs.csv")
+    parquet_path = os.path.join(workdir, "fleet_logs.parquet")
+
+    df = make_fleet(args.vehicles, args.days)
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    df.to_csv(csv_path, index=False)
+    del df
+    csv_to_parquet(csv_path, parquet_path)
+    print(f"CSV {os.path.getsize(csv_path) / 1e6:.1f} MB, "
+          f"Parquet {os.path.getsize(parquet_path) / 1e6:.1f} MB, "
+          f"{args.vehicles * args.days} rows")
+
+    vehicle_id = f"VIN_{args.vehicles // 2:06d}"
+    cases = [
+        ("csv full", {"path": csv_path}),
+        ("parquet full", {"path": parquet_path}),
+        ("parquet full (no mmap)", {"path": parquet_path, "memory_map": False}),
+        ("csv one vehicle + dates", {"path": csv_path, "vehicle_id": vehicle_id,
+                                     "start": "2025-07-01", "end": "2025-07-31"}),
+        ("parquet one vehicle + dates", {"path": parquet_path, "vehicle_id": vehicle_id,
+                                         "start": "2025-07-01", "end": "2025-07-31"}),
+    ]
+    print(f"{'case':<30} {'rows':>10} {'load_s':>8} {'peak_rss_mb':>12}")
+    for name, case in cases:
+        result = _measure(case)
+        print(f"{name:<30} {result['rows']:>10} {result['load_s']:>8} {result['peak_rss_delta_mb']:>12}")
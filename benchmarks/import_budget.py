@@ -0,0 +1,131 @@
+"""
+Import-time budget for the agents and the workflow graph.
+
+Each entry module is imported in a fresh interpreter under
+`python -X importtime`, and checked for:
+
+  * cold import time (cumulative microseconds reported by -X importtime,
+    best of --repeat runs) against its budget,
+  * heavy packages it must not load at import time (they are deferred to
+    first use: pandas, langchain, langgraph, faiss, torch, ...).
+
+Two process-level cold starts are also timed end to end (interpreter start
+included): the batch CLI printing its help, and a batch worker process
+running its initializer (graph compile plus every agent import).
+
+Prints the heaviest top-level packages per module and exits 1 when any
+budget is exceeded or a deferred package is imported eagerly.
+tests/test_import_budget.py asserts the per-module import budgets.
+
+    python benchmarks/import_budget.py --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFERRED = ("pandas", "pyarrow", "langchain", "langchain_core", "langchain_community",
+            "langgraph", "faiss", "torch", "sentence_transformers", "transformers")
+
+# module -> (budget_ms, packages it may import eagerly)
+IMPORT_BUDGETS = {
+    "langgraph_flow.graph": (100, ()),
+    "langgraph_flow.batch": (100, ()),
+    "langgraph_flow.instrumentation": (50, ()),
+    "langgraph_flow.jobs": (100, ()),
+    "agents.retriever": (150, ()),
+    "agents.service_planner_agent": (150, ()),
+    "agents.scheduler_agent": (100, ()),
+    "agents.fleet_scheduler": (100, ()),
+    "agents.communicator_agent": (50, ()),
+    "agents.retrieval_server": (100, ()),
+    # telemetry_sources needs pandas at import; pandas loads pyarrow itself
+    "agents.battery_agent": (600, ("pandas", "pyarrow")),
+}
+
+# name -> (budget_ms, python code run in a fresh interpreter)
+PROCESS_BUDGETS = {
+    "batch CLI --help": (400, "import runpy, sys; sys.argv = ['batch', '--help']\n"
+                              "try:\n    runpy.run_module('langgraph_flow.batch', run_name='__main__')\n"
+                              "except SystemExit:\n    pass"),
+    "batch worker start": (3000, "from langgraph_flow.batch import _warm_worker; _warm_worker()"),
+}
+
+
+def _python(args, code):
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    return subprocess.run([sys.executable, *args, "-c", code], cwd=REPO_ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_profile(module):
+    """(total_us, {top-level package: self_us}, imported module names) for one cold import."""
+    stderr = _python(["-X", "importtime"], f"import {module}").stderr
+    total_us, by_package, names = 0, {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        names.add(name)
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us, by_package, names
+
+
+def process_time_ms(code):
+    start = time.perf_counter()
+    _python([], code)
+    return (time.perf_counter() - start) * 1000
+
+
+def check_imports(repeat=3, top=5, report=print):
+    """Profile every IMPORT_BUDGETS module; returns the list of budget failures."""
+    failures = []
+    report(f"{'module':<32} {'import_ms':>10} {'budget_ms':>10}  heaviest packages (self ms)")
+    for module, (budget_ms, allowed) in IMPORT_BUDGETS.items():
+        runs = [import_profile(module) for _ in range(repeat)]
+        total_us, by_package, names = min(runs, key=lambda run: run[0])
+        total_ms = total_us / 1000
+        heaviest = sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        report(f"{module:<32} {total_ms:10.1f} {budget_ms:10d}  "
+               + ", ".join(f"{package} {us / 1000:.1f}" for package, us in heaviest))
+        if total_ms > budget_ms:
+            failures.append(f"{module}: {total_ms:.1f} ms > {budget_ms} ms")
+        eager = sorted({name.split(".")[0] for name in names} & (set(DEFERRED) - set(allowed)))
+        if eager:
+            failures.append(f"{module} imports {', '.join(eager)} eagerly")
+    return failures
+
+
+def check_processes(repeat=3, report=print):
+    """Time every PROCESS_BUDGETS cold start; returns the list of budget failures."""
+    failures = []
+    report(f"{'process':<32} {'wall_ms':>10} {'budget_ms':>10}")
+    for name, (budget_ms, code) in PROCESS_BUDGETS.items():
+        wall_ms = min(process_time_ms(code) for _ in range(repeat))
+        report(f"{name:<32} {wall_ms:10.1f} {budget_ms:10d}")
+        if wall_ms > budget_ms:
+            failures.append(f"{name}: {wall_ms:.1f} ms > {budget_ms} ms")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check cold import and start-up times against their budgets.")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold runs per check (best is kept)")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest packages to show per module")
+    args = parser.parse_args()
+
+    failures = check_imports(args.repeat, args.top)
+    print()
+    failures += check_processes(args.repeat)
+
+    for failure in failures:
+        print(f"⚠️  {failure}")
+    if not failures:
+        print("\n✅ All import and start-up budgets met")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,219 @@
+"""
+Whole-pipeline benchmark suite with a JSON history.
+
+Generates N vehicles x D days of synthetic telemetry
+(data/synthetic_data.generate_fleet_soh_data), then times every stage per
+vehicle and the full graph:
+
+  load      BatteryInsightAgent.load_data from the vehicle's CSV
+  analyze   BatteryInsightAgent.analyze on the already-parsed DataFrame
+  retrieve  ServicePlannerAgent.query_service_manual (query cache off)
+  schedule  SchedulerAgent.schedule against a scratch slot inventory
+  render    ComunicationAgent.email_summary
+  graph     the compiled workflow, one vehicle at a time (latency)
+  batch     langgraph_flow.batch.run_batch over all vehicles (throughput)
+
+Each run appends one JSON line to the history file, tagged with the git
+commit and a machine fingerprint. With --compare, stage latencies are
+checked against the previous run on the same machine with the same
+parameters, and regressions beyond --threshold are reported (exit code 1).
+
+    python benchmarks/run_suite.py --vehicles 200 --days 365 --compare
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.battery_agent import BatteryInsightAgent
+from agents.communicator_agent import ComunicationAgent
+from agents.query_cache import configure_query_cache
+from agents.retriever import warm_up
+from agents.scheduler_agent import SchedulerAgent
+from agents.service_planner_agent import ServicePlannerAgent
+from agents.slot_inventory import SlotInventory, configure_slot_inventory
+from data.synthetic_data import generate_fleet_soh_data
+from langgraph_flow.batch import partition_logs, run_batch, vehicle_state
+from langgraph_flow.graph import get_runner
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.jsonl")
+STAGES = ("load", "analyze", "retrieve", "schedule", "render", "graph")
+
+
+def machine_fingerprint():
+    info = {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "node": platform.node(),
+    }
+    return hashlib.sha1(json.dumps(info, sort_keys=True).encode()).hexdigest()[:12], info
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run_stages(paths, workdir):
+    """Time each agent on its own, vehicle by vehicle, feeding each stage the previous one's state."""
+    samples = {stage: [] for stage in STAGES}
+    inventory = SlotInventory(os.path.join(workdir, "stage_slots.db"), capacity=len(paths))
+    for vehicle_id, path in paths:
+        state = vehicle_state(vehicle_id, path)
+        df, seconds = timed(lambda: BatteryInsightAgent(state, data_path=path).load_data())
+        samples["load"].append(seconds)
+        raw = df.drop(columns=["SoH_drop"])
+        state, seconds = timed(lambda: BatteryInsightAgent(state, data=raw).analyze())
+        samples["analyze"].append(seconds)
+        planner = ServicePlannerAgent(state)
+        rag, seconds = timed(lambda: planner.query_service_manual(planner.insight))
+        samples["retrieve"].append(seconds)
+        state["service_plan"] = planner.enhance_plan_with_rag(planner.plan_service(), rag)
+        state, seconds = timed(lambda: SchedulerAgent(state, inventory=inventory).schedule())
+        samples["schedule"].append(seconds)
+        _, seconds = timed(lambda: ComunicationAgent(state).email_summary())
+        samples["render"].append(seconds)
+    return samples
+
+
+def run_graph(paths):
+    runner = get_runner()
+    samples = []
+    for vehicle_id, path in paths:
+        _, seconds = timed(lambda: runner.invoke(vehicle_state(vehicle_id, path)))
+        samples.append(seconds)
+    return samples
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(run, history, threshold, min_delta_ms=1.0):
+    """
+    Stages whose p50 grew by more than `threshold` (fraction) and `min_delta_ms`
+    since the last comparable run; the absolute floor keeps sub-millisecond
+    stages from flagging on timer noise.
+    """
+    baseline = next((r for r in reversed(history)
+                     if r["machine_id"] == run["machine_id"] and r["params"] == run["params"]), None)
+    if baseline is None:
+        return None, []
+    regressions = []
+    for stage, stats in run["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before and before["p50_ms"] > 0:
+            change = stats["p50_ms"] / before["p50_ms"] - 1
+            if change > threshold and stats["p50_ms"] - before["p50_ms"] > min_delta_ms:
+                regressions.append((stage, before["p50_ms"], stats["p50_ms"], change))
+    before = baseline.get("batch", {}).get("vehicles_per_s")
+    after = run["batch"]["vehicles_per_s"]
+    if before and after and 1 - after / before > threshold:
+        regressions.append(("batch vehicles/s", before, after, after / before - 1))
+    return baseline, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage and record the results.")
+    parser.add_argument("--vehicles", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=4, help="Batch-throughput pool size")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--compare", action="store_true", help="Report regressions against the last comparable run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold on p50 (0.2 = +20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore p50 increases smaller than this")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="suite_")
+    fleet_csv = os.path.join(workdir, "fleet.csv")
+    generate_fleet_soh_data(args.vehicles, args.days, seed=args.seed).to_csv(fleet_csv, index=False)
+    paths = [(os.path.splitext(os.path.basename(p))[0], p)
+             for p in partition_logs(fleet_csv, os.path.join(workdir, "by_vin"))]
+
+    # Measure retrieval itself, and keep benchmark bookings out of dealer_slots.db
+    configure_query_cache(maxsize=0)
+    configure_slot_inventory(path=os.path.join(workdir, "graph_slots.db"), capacity=3 * args.vehicles)
+    _, warm_s = timed(warm_up)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        samples = run_stages(paths, workdir)
+        samples["graph"] = run_graph(paths)
+        batch = run_batch([vehicle_state(v, p) for v, p in paths], max_workers=args.workers,
+                          executor=args.executor)
+
+    machine_id, machine = machine_fingerprint()
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "machine_id": machine_id,
+        "machine": machine,
+        "params": {"vehicles": args.vehicles, "days": args.days, "workers": args.workers,
+                   "executor": args.executor, "seed": args.seed},
+        "warm_up_s": round(warm_s, 3),
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "batch": {key: batch[key] for key in ("vehicles", "failed", "wall_time_s", "vehicles_per_s")},
+    }
+
+    print(f"{args.vehicles} vehicles x {args.days} days, commit {run['commit']}, machine {machine_id}")
+    print(f"{'stage':<9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9}")
+    for stage, stats in run["stages"].items():
+        print(f"{stage:<9} {stats['mean_ms']:9.2f} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['max_ms']:9.2f}")
+    print(f"batch: {run['batch']['vehicles_per_s']} vehicles/s with {args.workers} {args.executor} workers")
+
+    history = load_history(args.history)
+    regressions = []
+    if args.compare:
+        baseline, regressions = compare(run, history, args.threshold, args.min_delta_ms)
+        if baseline is None:
+            print("No earlier run with the same machine and parameters to compare against")
+        elif not regressions:
+            print(f"✅ No regressions beyond {args.threshold:.0%} vs {baseline['timestamp']} ({baseline['commit']})")
+        for stage, before, after, change in regressions:
+            print(f"⚠️  {stage}: {before} -> {after} ({change:+.0%}) vs {baseline['timestamp']} ({baseline['commit']})")
+
+    if not args.no_save:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"Appended to {args.history}")
+    sys.exit(1 if regressions else 0)
@@ -1,49 +1,182 @@
 # synthetic_soh_data.py
+## Vectorized: each vehicle's days are generated as whole arrays, and large
+## fleets are sharded across processes and streamed to Parquet or CSV files
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+
+START_DATE = datetime(2025, 6, 1)
+FAST_CHARGE_PROBABILITY = 0.3  # 30% chance of fast charging
+FAST_DEGRADATION = (0.02, 0.06)
+SLOW_DEGRADATION = (0.005, 0.02)
+SOH_FLOOR = 60.0  # Cap minimum SoH at 60%
+CHARGE_TYPES = np.array(['slow', 'fast'])
+
+def simulate_vehicles(rng, n_vehicles, days):
+    """
+    Simulates n_vehicles x days of battery data as (n_vehicles, days) arrays.
+    SoH degradation is a cumulative sum of per-day losses, which depend on
+    whether the day's charge was fast or slow.
+    """
+    shape = (n_vehicles, days)
+    is_fast_charge = rng.random(shape) < FAST_CHARGE_PROBABILITY
+    # One uniform draw per day, scaled to the fast or slow degradation range
+    u = rng.random(shape)
+    degradation = np.where(is_fast_charge,
+                           FAST_DEGRADATION[0] + (FAST_DEGRADATION[1] - FAST_DEGRADATION[0]) * u,
+                           SLOW_DEGRADATION[0] + (SLOW_DEGRADATION[1] - SLOW_DEGRADATION[0]) * u)
+    soh = np.maximum(100.0 - degradation.cumsum(axis=1), SOH_FLOOR)
+    return {
+        'temperature': rng.normal(25, 5, shape).round(2),  # Simulate ambient temperature
+        'is_fast_charge': is_fast_charge,
+        'SoH': soh.round(2),
+        'charge_cycles': rng.integers(1, 3, shape),  # Simulate 1-2 cycles/day
+    }
+
+def _vins(first, count, width):
+    return np.array([f"VIN_{i:0{width}d}" for i in range(first, first + count)])
+
+def generate_fleet_soh_data(n_vehicles=100, days=90, seed=42, start_date=START_DATE):
+    """
+    Generates N vehicles x D days of synthetic battery data in memory.
+    Returns a long DataFrame with a `vin` column, sorted by vin and date.
+    """
+    sim = simulate_vehicles(np.random.default_rng(seed), n_vehicles, days)
+    dates = pd.date_range(start_date, periods=days).strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'vin': np.repeat(_vins(0, n_vehicles, 6), days),
+        'date': np.tile(dates, n_vehicles),
+        'temperature': sim['temperature'].ravel(),
+        'charge_type': CHARGE_TYPES[sim['is_fast_charge'].ravel().astype(np.int8)],
+        'SoH': sim['SoH'].ravel(),
+        'charge_cycles': sim['charge_cycles'].ravel(),
+    })
 
 def generate_synthetic_soh_data(days=90, seed=42):
     """
     Generates synthetic EV battery data over a specified number of days.
     Includes SoH degradation influenced by fast and slow charging patterns.
     """
-    np.random.seed(seed)
-
-    start_date = datetime(2025, 6, 1)
-    data = []
-    soh = 100.0  # Start with full battery health
-
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        temperature = np.random.normal(25, 5)  # Simulate ambient temperature
-        is_fast_charge = np.random.rand() < 0.3  # 30% chance of fast charging
-        charge_type = 'fast' if is_fast_charge else 'slow'
-
-        # Apply different degradation rates based on charge type
-        if is_fast_charge:
-            degradation = np.random.uniform(0.02, 0.06)
-        else:
-            degradation = np.random.uniform(0.005, 0.02)
-        
-        soh = max(soh - degradation, 60.0)  # Cap minimum SoH at 60%
-
-        # Append daily record
-        data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'temperature': round(temperature, 2),
-            'charge_type': charge_type,
-            'SoH': round(soh, 2),
-            'charge_cycles': np.random.randint(1, 3)  # Simulate 1-2 cycles/day
-        })
-
-    # Create and export DataFrame
-    df = pd.DataFrame(data)
+    df = generate_fleet_soh_data(1, days, seed=seed).drop(columns=['vin'])
     df.to_csv('battery_logs.csv', index=False)
     print("✅ Synthetic SoH data generated and saved to 'battery_logs.csv'")
 
+def _chunk_table(rng, first_vehicle, n_vehicles, days, start_date, vin_width, file_format):
+    import pyarrow as pa
+
+    sim = simulate_vehicles(rng, n_vehicles, days)
+    dates = np.arange(np.datetime64(start_date.date()), np.datetime64(start_date.date()) + days)
+    if file_format == 'parquet':
+        # Same types as agents.telemetry_sources.csv_to_parquet: timestamp dates, dictionary charge_type
+        date_array = pa.array(np.tile(dates.astype('datetime64[ns]'), n_vehicles))
+        charge_type = pa.DictionaryArray.from_arrays(
+            pa.array(sim['is_fast_charge'].ravel().astype(np.int8)), pa.array(CHARGE_TYPES))
+    else:
+        date_array = pa.array(np.tile(dates, n_vehicles), type=pa.date32())
+        charge_type = pa.array(CHARGE_TYPES[sim['is_fast_charge'].ravel().astype(np.int8)])
+    return pa.table({
+        'vin': pa.array(np.repeat(_vins(first_vehicle, n_vehicles, vin_width), days)),
+        'date': date_array,
+        'temperature': pa.array(sim['temperature'].ravel()),
+        'charge_type': charge_type,
+        'SoH': pa.array(sim['SoH'].ravel()),
+        'charge_cycles': pa.array(sim['charge_cycles'].ravel()),
+    })
+
+def _write_shard(spec):
+    # Top-level so process pools can pickle it; writes one shard file chunk by chunk
+    import pyarrow.csv as pcsv
+    import pyarrow.parquet as pq
+
+    (out_dir, shard, first_vehicle, n_vehicles, days, seed_sequence,
+     file_format, chunk_vehicles, start_date, vin_width) = spec
+    rng = np.random.default_rng(seed_sequence)
+    path = os.path.join(out_dir, f"part-{shard:05d}.{file_format}")
+    writer = None
+    rows = 0
+    try:
+        for first in range(first_vehicle, first_vehicle + n_vehicles, chunk_vehicles):
+            count = min(chunk_vehicles, first_vehicle + n_vehicles - first)
+            table = _chunk_table(rng, first, count, days, start_date, vin_width, file_format)
+            if writer is None:
+                writer = (pq.ParquetWriter(path, table.schema, compression='zstd') if file_format == 'parquet'
+                          else pcsv.CSVWriter(path, table.schema))
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return path, rows
+
+def write_fleet_dataset(out_dir, n_vehicles, days=365, seed=42, file_format='parquet',
+                        vehicles_per_shard=10_000, workers=None, start_date=START_DATE,
+                        max_chunk_rows=1_000_000):
+    """
+    Streams N vehicles x D days to `out_dir/part-XXXXX.<format>` shard files.
+
+    Shards are generated in parallel processes, each from its own child of
+    SeedSequence(seed), so output depends on seed, vehicles_per_shard and
+    max_chunk_rows but not on the worker count or file format. Each shard is
+    written in chunks of at most `max_chunk_rows` rows, so memory stays
+    bounded whatever the fleet size.
+    Files are sorted by vin and date; a Parquet directory can be read directly
+    with agents.telemetry_sources.open_source.
+    """
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unknown format {file_format!r}; expected 'parquet' or 'csv'")
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    n_shards = -(-n_vehicles // vehicles_per_shard)
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    vin_width = max(6, len(str(n_vehicles - 1)))
+    chunk_vehicles = max(1, max_chunk_rows // days)
+    specs = [(out_dir, shard, shard * vehicles_per_shard,
+              min(vehicles_per_shard, n_vehicles - shard * vehicles_per_shard), days, seeds[shard],
+              file_format, chunk_vehicles, start_date, vin_width)
+             for shard in range(n_shards)]
+
+    if workers == 1 or n_shards == 1:
+        results = [_write_shard(spec) for spec in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_write_shard, specs))
+
+    elapsed = time.perf_counter() - start
+    rows = sum(r for _, r in results)
+    stats = {
+        "files": len(results),
+        "vehicles": n_vehicles,
+        "rows": rows,
+        "bytes": sum(os.path.getsize(path) for path, _ in results),
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed) if elapsed > 0 else None,
+    }
+    print(f"✅ Fleet data written to '{out_dir}': {stats}")
+    return stats
+
 if __name__ == "__main__":
-    generate_synthetic_soh_data()
+    parser = argparse.ArgumentParser(description="Generate synthetic battery logs.")
+    parser.add_argument("--vehicles", type=int, default=None,
+                        help="Fleet size; without it, one vehicle is written to battery_logs.csv")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="fleet_data", help="Output directory for fleet shards")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--vehicles-per-shard", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.vehicles is None:
+        generate_synthetic_soh_data(days=args.days, seed=args.seed)
+    else:
+        write_fleet_dataset(args.out, args.vehicles, days=args.days, seed=args.seed,
+                            file_format=args.format, vehicles_per_shard=args.vehicles_per_shard,
+                            workers=args.workers)
 
-# Note: The above script can be run independently to generate the synthetic data.
\ No newline at end of file
+# Note: The above script can be run independently to generate the synthetic data.
@@ -1,33 +1,186 @@
 ### This script runs a vector embedding on service manual data and saves the results to a file
-## This is a one time run and the results are saved to a file for later use
+## Re-running it only re-embeds chunks that are new or changed since the last build
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
+import argparse
+import hashlib
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.chunk_store import extract_chunk_metadata, open_chunk_store, save_vector_store
+from agents.faiss_index import (
+    DEFAULT_SEARCH_PARAMS,
+    INDEX_TYPES,
+    REBUILD_ON_REMOVE_TYPES,
+    make_faiss_index,
+    read_faiss_index,
+    read_index_meta,
+    write_index_meta,
+)
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+def chunk_fingerprint(chunk):
+    # Content hash (scoped to the source PDF) doubles as the chunk's docstore id
+    source = os.path.basename(chunk.metadata.get("source", ""))
+    return hashlib.sha256(f"{source}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+
+def iter_chunks(pdf_paths, chunk_size=1000, chunk_overlap=200):
+    """Yield (fingerprint, chunk) pairs, loading and splitting one PDF page at a time."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for pdf_path in pdf_paths:
+        for page in PyPDFLoader(pdf_path).lazy_load():
+            for chunk in text_splitter.split_documents([page]):
+                # Routine ids, procedure flag, section and summary are extracted
+                # once here instead of on every retrieval
+                chunk.metadata.update(extract_chunk_metadata(chunk.page_content))
+                yield chunk_fingerprint(chunk), chunk
+
+_worker_embeddings = None
+
+def _init_worker(model_name):
+    global _worker_embeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name)
 
-def create_vector_embeddings(pdf_path, index_path):
-    # Load PDF
-    loader = PyPDFLoader(pdf_path)
-    documents = loader.load()
+def _embed_batch(texts):
+    return _worker_embeddings.embed_documents(texts)
 
-    # Split text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    texts = text_splitter.split_documents(documents)
+def _batches(items, batch_size):
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
 
-    # Create embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+def embed_chunks(chunks, embeddings, workers=1, batch_size=64, model_name=EMBEDDING_MODEL):
+    """Embed chunks in batches, in-process or across a pool of worker processes."""
+    texts = [chunk.page_content for chunk in chunks]
+    if not texts:
+        return []
+    if workers <= 1:
+        return [vector for batch in _batches(texts, batch_size)
+                for vector in embeddings.embed_documents(batch)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_name,)) as pool:
+        return [vector for batch in pool.map(_embed_batch, _batches(texts, batch_size))
+                for vector in batch]
 
-    # Create vector store
-    vector_store = FAISS.from_documents(texts, embeddings)
+def load_existing_index(index_path, embeddings):
+    if not os.path.exists(os.path.join(index_path, "index.faiss")):
+        return None
+    chunk_store = open_chunk_store(index_path)
+    if chunk_store is None:
+        # Legacy pickle docstore; it is replaced by chunks.sqlite on save
+        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    docstore, index_to_docstore_id = chunk_store.to_docstore()
+    index = read_faiss_index(index_path, mmap=False)  # writable copy for updates
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
 
-    # Save vector store to disk
-    vector_store.save_local(index_path)
-    print(f"✅ Vector embeddings created and saved to {index_path}")
+def create_vector_embeddings(pdf_path, index_path, workers=1, batch_size=64, rebuild=False,
+                             index_type="flat", nprobe=DEFAULT_SEARCH_PARAMS["nprobe"],
+                             ef_search=DEFAULT_SEARCH_PARAMS["ef_search"]):
+    """
+    Build or incrementally update the FAISS index for one or more PDFs.
+
+    Chunks are fingerprinted by content hash, which is also their docstore id.
+    Chunks already in the index are reused as-is; only new or changed chunks
+    are embedded (in parallel batches when workers > 1), and chunks that no
+    longer appear in any PDF are removed from the index in place.
+
+    `index_type` is one of agents.faiss_index.INDEX_TYPES. Trained types (IVF,
+    PQ) are trained on the vectors of a full build; changing the type, or
+    removing chunks from an IVF or HNSW index, triggers a full rebuild.
+
+    Every chunk and every new vector is held in memory until the index is
+    written: removals need the full set of current fingerprints, and trained
+    index types are trained on all vectors of the build.
+    """
+    pdf_paths = [pdf_path] if isinstance(pdf_path, str) else list(pdf_path)
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    vector_store = None if rebuild else load_existing_index(index_path, embeddings)
+    if vector_store is not None and read_index_meta(index_path).get("index_type", "flat") != index_type:
+        print(f"Index type changed to {index_type}; rebuilding")
+        vector_store = None
+    existing_ids = set(vector_store.index_to_docstore_id.values()) if vector_store else set()
+
+    start = time.perf_counter()
+    chunks = {}
+    for fingerprint, chunk in iter_chunks(pdf_paths):
+        # setdefault skips identical chunks repeated within a PDF
+        chunks.setdefault(fingerprint, chunk)
+    removed_ids = list(existing_ids - chunks.keys())
+    if removed_ids and index_type in REBUILD_ON_REMOVE_TYPES:
+        print(f"{index_type} cannot remove vectors in place; rebuilding")
+        vector_store, existing_ids, removed_ids = None, set(), []
+    new_chunks = [(fingerprint, chunk) for fingerprint, chunk in chunks.items()
+                  if fingerprint not in existing_ids]
+    reused = len(chunks) - len(new_chunks)
+
+    embed_start = time.perf_counter()
+    vectors = embed_chunks([chunk for _, chunk in new_chunks], embeddings,
+                           workers=workers, batch_size=batch_size)
+    embed_s = time.perf_counter() - embed_start
+
+    if removed_ids and vector_store is not None:
+        vector_store.delete(removed_ids)
+    if new_chunks:
+        if vector_store is None:
+            index = make_faiss_index(np.array(vectors, dtype=np.float32), index_type)
+            vector_store = FAISS(embeddings, index, InMemoryDocstore(), {})
+        text_embeddings = [(chunk.page_content, vector) for (_, chunk), vector in zip(new_chunks, vectors)]
+        metadatas = [chunk.metadata for _, chunk in new_chunks]
+        ids = [fingerprint for fingerprint, _ in new_chunks]
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    if vector_store is None:
+        print("⚠️  No chunks found; index not written")
+        return None
+
+    # Save vector store to disk (index.faiss + chunks.sqlite)
+    save_vector_store(vector_store, index_path)
+    write_index_meta(index_path, {
+        "index_type": index_type,
+        "ntotal": vector_store.index.ntotal,
+        "dim": vector_store.index.d,
+        "nprobe": nprobe,
+        "ef_search": ef_search,
+    })
+    total_s = time.perf_counter() - start
+    stats = {
+        "pdfs": len(pdf_paths),
+        "index_type": index_type,
+        "chunks": len(chunks),
+        "reused": reused,
+        "embedded": len(new_chunks),
+        "removed": len(removed_ids),
+        "embed_chunks_per_s": round(len(new_chunks) / embed_s, 1) if new_chunks and embed_s > 0 else None,
+        "total_s": round(total_s, 2),
+    }
+    print(f"✅ Vector embeddings saved to {index_path}: {stats}")
+    return stats
 
 if __name__ == "__main__":
-    pdf_path = 'service_mode_user_guide.pdf'  # Path to your service manual PDF
-    index_path = 'vector_index'      # Directory to save the vector index
-    os.makedirs(index_path, exist_ok=True)
-    create_vector_embeddings(pdf_path, index_path)
+    parser = argparse.ArgumentParser(description="Build or update the service-manual vector index.")
+    parser.add_argument("pdfs", nargs="*", default=['service_mode_user_guide.pdf'],
+                        help="Service manual PDFs to index")
+    parser.add_argument("--index-path", default='vector_index', help="Directory to save the vector index")
+    parser.add_argument("--workers", type=int, default=1, help="Embedding worker processes")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the existing index and re-embed everything")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_SEARCH_PARAMS["nprobe"],
+                        help="IVF lists searched per query")
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_SEARCH_PARAMS["ef_search"],
+                        help="HNSW search depth")
+    args = parser.parse_args()
+
+    create_vector_embeddings(args.pdfs, args.index_path, workers=args.workers,
+                             batch_size=args.batch_size, rebuild=args.rebuild,
+                             index_type=args.index_type, nprobe=args.nprobe,
+                             ef_search=args.ef_search)
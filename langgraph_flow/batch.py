@@ -0,0 +1,249 @@
+"""
+Fleet-scale batch mode for the agentic workflow.
+
+Runs the compiled graph for many vehicles concurrently on a thread or process
+pool and streams each vehicle's result as soon as it finishes. Usage:
+
+    python -m langgraph_flow.batch fleet_logs/ --workers 8 --executor process
+
+With --checkpoint, every vehicle's state is saved after each node (see
+langgraph_flow.checkpoints); re-running the same --run-id after a crash
+skips finished vehicles and resumes the others at their last completed node.
+"""
+import argparse
+import glob
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from .checkpoints import get_checkpoint_store
+from .graph import get_runner, load_agents
+from .instrumentation import configure_recorder, get_recorder
+from .state import initial_state
+
+VIN_COLUMN = "vin"
+DEFAULT_RUN_ID = "fleet"
+# Vehicles submitted to the pool per worker at any time; the rest wait in the input iterator
+IN_FLIGHT_PER_WORKER = 2
+
+
+def vehicle_state(vehicle_id, data_path):
+    """Create the initial workflow state for one vehicle's log file (or list of CSV part files)."""
+    state = initial_state()
+    state["vehicle_id"] = vehicle_id
+    state["battery_data_path"] = data_path
+    return state
+
+
+def partition_logs(csv_path, out_dir, vin_column=VIN_COLUMN):
+    """
+    Split one long CSV keyed by VIN into a `<out_dir>/<vin>.csv` file per vehicle.
+
+    Returns the list of written file paths.
+    """
+    import pandas as pd
+
+    os.makedirs(out_dir, exist_ok=True)
+    df = pd.read_csv(csv_path)
+    paths = []
+    for vin, group in df.groupby(vin_column, sort=False):
+        path = os.path.join(out_dir, f"{vin}.csv")
+        group.drop(columns=[vin_column]).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def fleet_states(path, vin_column=VIN_COLUMN, partition_dir=None):
+    """
+    Build per-vehicle states from a fleet log location.
+
+    `path` can be:
+      * a directory of `<vin>.csv` files,
+      * a hive-style partitioned directory (`vin=<vin>/*.csv`; one state per
+        partition, reading all of its part files),
+      * a single CSV with a `vin` column, which is partitioned once into
+        `partition_dir` (default: `<path>_by_vin/`).
+    """
+    if os.path.isfile(path):
+        if partition_dir is None:
+            partition_dir = os.path.splitext(path)[0] + "_by_vin"
+        files = partition_logs(path, partition_dir, vin_column=vin_column)
+        return [vehicle_state(os.path.splitext(os.path.basename(f))[0], f) for f in files]
+
+    states = []
+    for file_path in sorted(glob.glob(os.path.join(path, "*.csv"))):
+        vehicle_id = os.path.splitext(os.path.basename(file_path))[0]
+        states.append(vehicle_state(vehicle_id, file_path))
+    for partition in sorted(glob.glob(os.path.join(path, f"{vin_column}=*"))):
+        # One state per vehicle: all part files of a partition are read together
+        vehicle_id = os.path.basename(partition).split("=", 1)[1]
+        files = sorted(glob.glob(os.path.join(partition, "*.csv")))
+        if files:
+            states.append(vehicle_state(vehicle_id, files[0] if len(files) == 1 else files))
+    return states
+
+
+def _run_vehicle(state):
+    # Top-level so it can be pickled for process pools; the compiled graph
+    # is cached per worker process by get_runner().
+    start = time.perf_counter()
+    # A resumed state carries the node_metrics of the runs before the checkpoint
+    result = {"vehicle_id": state.get("vehicle_id"), "state": None, "error": None,
+              "metrics_from": len(state.get("node_metrics", []))}
+    try:
+        result["state"] = get_runner().invoke(state)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["elapsed_s"] = time.perf_counter() - start
+    return result
+
+
+def _warm_worker():
+    # Pay compile and import time at pool start-up rather than in the first vehicle's run.
+    # The parent re-records and exports every worker's metrics, so workers never export
+    configure_recorder(export_path=None)
+    get_runner()
+    load_agents()
+
+
+def _skipped(state):
+    return {"vehicle_id": state.get("vehicle_id"), "state": None, "error": None,
+            "elapsed_s": 0.0, "skipped": True}
+
+
+def stream_batch(states, max_workers=4, executor="thread", checkpoint_path=None, run_id=DEFAULT_RUN_ID):
+    """
+    Run the workflow for every state concurrently and yield results as they finish.
+
+    Each result is a dict with `vehicle_id`, `state` (final state or None),
+    `error` (None on success) and `elapsed_s`. A failure in one vehicle never
+    affects the others. With `checkpoint_path`, vehicles that already finished
+    under `run_id` are not run again; their results have `skipped` set and no state.
+    Checkpointed runs need a unique `vehicle_id` per state (ValueError before
+    any vehicle starts otherwise). At most IN_FLIGHT_PER_WORKER * max_workers
+    vehicles are submitted at a time; the next state is taken from `states`
+    as each one finishes, so a large fleet is never queued in the pool at once.
+
+    Args:
+        states (iterable): Per-vehicle initial states.
+        max_workers (int): Pool size.
+        executor (str): "thread" or "process".
+        checkpoint_path (str): SQLite checkpoint store, or None to run without checkpoints.
+        run_id (str): Run whose checkpoints are written and resumed.
+    """
+    if executor == "thread":
+        get_runner()
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    elif executor == "process":
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_warm_worker)
+    else:
+        raise ValueError(f"Unknown executor: {executor!r} (expected 'thread' or 'process')")
+
+    if checkpoint_path is not None:
+        states = get_checkpoint_store(checkpoint_path).resume(run_id, states)
+    else:
+        states = ((state, False) for state in states)
+
+    max_in_flight = IN_FLIGHT_PER_WORKER * max_workers
+    with pool:
+        in_flight = set()
+        for state, finished in states:
+            if finished:
+                yield _skipped(state)
+                continue
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(pool.submit(_run_vehicle, state))
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def run_batch(states, max_workers=4, executor="thread", on_result=None, metrics_path=None,
+              checkpoint_path=None, run_id=DEFAULT_RUN_ID):
+    """
+    Run a fleet batch to completion and return a throughput summary.
+
+    `on_result` is called with each result as soon as its vehicle finishes.
+    With `metrics_path`, per-node metrics for the whole batch are exported
+    there at the end (see langgraph_flow.instrumentation). `checkpoint_path`
+    and `run_id` are passed to stream_batch(); vehicles skipped because they
+    already finished are counted separately and left out of the timings.
+    """
+    start = time.perf_counter()
+    succeeded = 0
+    skipped = 0
+    failed = []
+    vehicle_times = []
+
+    for result in stream_batch(states, max_workers=max_workers, executor=executor,
+                               checkpoint_path=checkpoint_path, run_id=run_id):
+        if result.get("skipped"):
+            skipped += 1
+        elif result["error"] is None:
+            vehicle_times.append(result["elapsed_s"])
+            succeeded += 1
+            if executor == "process":
+                # Worker processes record into their own recorders; collect this run's records here
+                for record in result["state"].get("node_metrics", [])[result["metrics_from"]:]:
+                    get_recorder().record(result["state"].get("trace_id"), record)
+        else:
+            vehicle_times.append(result["elapsed_s"])
+            failed.append({"vehicle_id": result["vehicle_id"], "error": result["error"]})
+        if on_result is not None:
+            on_result(result)
+
+    wall_s = time.perf_counter() - start
+    if metrics_path:
+        get_recorder().export(metrics_path)
+    total = succeeded + len(failed)
+    return {
+        "vehicles": total + skipped,
+        "succeeded": succeeded,
+        "skipped": skipped,
+        "failed": len(failed),
+        "failures": failed,
+        "wall_time_s": round(wall_s, 3),
+        "vehicles_per_s": round(total / wall_s, 2) if wall_s > 0 else None,
+        "mean_vehicle_s": round(sum(vehicle_times) / total, 3) if total else None,
+        "max_vehicle_s": round(max(vehicle_times), 3) if total else None,
+        "workers": max_workers,
+        "executor": executor,
+    }
+
+
+def _print_result(result):
+    if result.get("skipped"):
+        print(f"⏭️  {result['vehicle_id']}: already finished")
+    elif result["error"] is None:
+        status = result["state"].get("appointment", {}).get("status", "unknown")
+        print(f"✅ {result['vehicle_id']}: {status} ({result['elapsed_s']:.2f}s)")
+    else:
+        print(f"❌ {result['vehicle_id']}: {result['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the battery workflow for a fleet of vehicles.")
+    parser.add_argument("path", help="Directory of per-VIN logs, vin=<id> partitions, or a CSV with a vin column")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--vin-column", default=VIN_COLUMN)
+    parser.add_argument("--metrics", help="Export per-node metrics here (.json: OpenTelemetry, else Prometheus text)")
+    parser.add_argument("--checkpoint", help="Checkpoint every vehicle's state to this SQLite file and resume from it")
+    parser.add_argument("--run-id", default=DEFAULT_RUN_ID, help="Checkpointed run to write or resume")
+    args = parser.parse_args()
+
+    states = fleet_states(args.path, vin_column=args.vin_column)
+    summary = run_batch(states, max_workers=args.workers,
+                        executor=args.executor, on_result=_print_result,
+                        metrics_path=args.metrics, checkpoint_path=args.checkpoint,
+                        run_id=args.run_id)
+    print("\nBatch Summary:")
+    for key, value in summary.items():
+        if key != "failures":
+            print(f"{key}: {value}")
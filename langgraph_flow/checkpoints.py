@@ -0,0 +1,327 @@
+"""
+Durable per-vehicle checkpoints for long fleet runs.
+
+With checkpointing on, every workflow node is wrapped by checkpoint_node():
+after the node returns, the vehicle's state is written to a SQLite store
+(zlib-compressed pickle) together with the name of the last completed node.
+Nodes the state has already completed are skipped, so a vehicle re-run from
+its checkpoint continues where it stopped, and run_batch skips vehicles
+that finished. Input telemetry handed over in the state (`battery_data`) is
+not stored; once battery_insight ran it is no longer needed.
+
+Besides the encoded state, each row keeps a few plain columns (status,
+urgency, appointment, SoH, forecast) so results can be filtered and
+streamed with SQL without decoding any state.
+
+Checkpoint files are unpickled when a run resumes; only load files this
+application wrote.
+
+    python -m langgraph_flow.batch fleet.csv --checkpoint runs.db --run-id june
+    python -m langgraph_flow.checkpoints runs.db --run-id june --urgency high
+"""
+import argparse
+import functools
+import inspect
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+STATE_KEY = "checkpoint"  # {"path": ..., "run_id": ...} in a state that should be checkpointed
+COMPLETED_KEY = "completed_nodes"
+EXCLUDED_KEYS = ("battery_data", "battery_data_csv", STATE_KEY)
+COMPRESSION_LEVEL = 1  # states are small; favour speed
+SUMMARY_COLUMNS = ("vehicle_id", "node", "completed", "error", "updated_at", "status", "urgency",
+                   "appointment_status", "dealer", "slot", "latest_soh", "days_to_floor")
+
+
+def encode_state(state):
+    """Compact binary form of a workflow state (without input telemetry)."""
+    kept = {key: value for key, value in state.items() if key not in EXCLUDED_KEYS}
+    return zlib.compress(pickle.dumps(kept, protocol=pickle.HIGHEST_PROTOCOL), COMPRESSION_LEVEL)
+
+
+def decode_state(blob):
+    return pickle.loads(zlib.decompress(blob))
+
+
+def _summary(state):
+    # Plain columns stored next to the encoded state, for queries
+    insight = state.get("battery_insight") or {}
+    plan = state.get("service_plan") or {}
+    appointment = state.get("appointment") or {}
+    forecast = insight.get("forecast") or {}
+    soh = insight.get("latest_soh")
+    slot = appointment.get("slot")
+    return {
+        "status": insight.get("status"),
+        "urgency": plan.get("urgency"),
+        "appointment_status": appointment.get("status"),
+        "dealer": appointment.get("dealer"),
+        "slot": str(slot) if slot is not None else None,
+        "latest_soh": float(soh) if soh is not None else None,
+        "days_to_floor": forecast.get("days_to_floor"),
+    }
+
+
+class CheckpointStore:
+    """
+    Vehicle states of one or more fleet runs in SQLite, safe to share across threads and processes.
+
+    One row per (run, vehicle) holds the state after the vehicle's last
+    completed node; it is overwritten after every node.
+
+    Args:
+        path (str): SQLite file (":memory:" is not supported; each thread opens its own connection).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS vehicle_states (
+                run_id TEXT NOT NULL,
+                vehicle_id TEXT NOT NULL,
+                node TEXT,
+                completed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                status TEXT,
+                urgency TEXT,
+                appointment_status TEXT,
+                dealer TEXT,
+                slot TEXT,
+                latest_soh REAL,
+                days_to_floor REAL,
+                state BLOB,
+                PRIMARY KEY (run_id, vehicle_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS states_by_urgency ON vehicle_states (run_id, urgency);
+        """)
+
+    def _connection(self):
+        # One connection per thread and process; each statement commits on its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL keeps readers unblocked; NORMAL sync is durable across process crashes
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start_run(self, run_id):
+        self._connection().execute("INSERT OR IGNORE INTO runs (run_id, created_at) VALUES (?, ?)",
+                                   (run_id, time.time()))
+
+    def save(self, run_id, vehicle_id, node, state, completed=False):
+        """Store `state` as the vehicle's checkpoint after `node`."""
+        summary = _summary(state)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO vehicle_states (run_id, vehicle_id, node, completed, error, updated_at, "
+            "status, urgency, appointment_status, dealer, slot, latest_soh, days_to_floor, state) "
+            "VALUES (?, ?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, vehicle_id, node, int(completed), time.time(), summary["status"], summary["urgency"],
+             summary["appointment_status"], summary["dealer"], summary["slot"], summary["latest_soh"],
+             summary["days_to_floor"], encode_state(state)))
+
+    def record_error(self, run_id, vehicle_id, node, error):
+        """Note a failed node; the vehicle's last good checkpoint is kept (node and state stay NULL without one)."""
+        self._connection().execute(
+            "INSERT INTO vehicle_states (run_id, vehicle_id, error, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (run_id, vehicle_id) DO UPDATE SET error = excluded.error, updated_at = excluded.updated_at",
+            (run_id, vehicle_id, f"{node}: {error}", time.time()))
+
+    def load_state(self, run_id, vehicle_id):
+        """The vehicle's checkpointed state, or None."""
+        row = self._connection().execute(
+            "SELECT state FROM vehicle_states WHERE run_id = ? AND vehicle_id = ?",
+            (run_id, vehicle_id)).fetchone()
+        return decode_state(row[0]) if row is not None and row[0] is not None else None
+
+    def progress(self, run_id):
+        """Vehicles per last completed node, plus completed and failed counts."""
+        conn = self._connection()
+        by_node = dict(conn.execute(
+            "SELECT node, COUNT(*) FROM vehicle_states WHERE run_id = ? GROUP BY node", (run_id,)).fetchall())
+        completed, failed = conn.execute(
+            "SELECT COALESCE(SUM(completed), 0), COUNT(error) FROM vehicle_states WHERE run_id = ?",
+            (run_id,)).fetchone()
+        return {"run_id": run_id, "vehicles": sum(by_node.values()), "completed": completed,
+                "failed": failed, "by_node": by_node}
+
+    def runs(self):
+        return [row[0] for row in self._connection().execute("SELECT run_id FROM runs ORDER BY created_at")]
+
+    def iter_results(self, run_id, completed=None, urgency=None, status=None, failed=None,
+                     with_state=False, batch_size=1000):
+        """
+        Stream one dict per vehicle (SUMMARY_COLUMNS, plus `state` if with_state)
+        in vehicle id order; only `batch_size` rows are held in memory at a time.
+        """
+        where, params = ["run_id = ?"], [run_id]
+        for column, value in (("completed", completed), ("urgency", urgency), ("status", status)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(int(value) if column == "completed" else value)
+        if failed is not None:
+            where.append("error IS NOT NULL" if failed else "error IS NULL")
+        columns = SUMMARY_COLUMNS + (("state",) if with_state else ())
+        cursor = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM vehicle_states WHERE {' AND '.join(where)} ORDER BY vehicle_id",
+            params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                result = dict(zip(columns, row))
+                result["completed"] = bool(result["completed"])
+                if with_state and result["state"] is not None:
+                    result["state"] = decode_state(result["state"])
+                yield result
+
+    def resume(self, run_id, states):
+        """
+        Match a run's initial states against its checkpoints.
+
+        Yields (state, finished) per input state, in order: finished vehicles
+        come back unchanged with finished=True; partly done ones as their
+        checkpointed state, which carries the nodes it completed; others
+        unchanged. Every state still to run is tagged so its nodes are
+        checkpointed.
+
+        Checkpoints are keyed by vehicle id, so every state needs a
+        `vehicle_id` and no id may repeat; the inputs are checked before
+        anything is yielded and a ValueError names the offending ids.
+        """
+        states = list(states)
+        _check_vehicle_ids(states)
+        self.start_run(run_id)
+        known = dict(self._connection().execute(
+            "SELECT vehicle_id, completed FROM vehicle_states WHERE run_id = ?", (run_id,)).fetchall())
+        for state in states:
+            vehicle_id = state.get("vehicle_id")
+            if known.get(vehicle_id):
+                yield state, True
+                continue
+            saved = self.load_state(run_id, vehicle_id) if vehicle_id in known else None
+            if saved is not None:
+                # Keep inputs from the fresh state (e.g. battery_data_path), progress from the checkpoint
+                state = dict(state, **saved)
+            state[STATE_KEY] = {"path": self.path, "run_id": run_id}
+            yield state, False
+
+
+def _check_vehicle_ids(states):
+    missing = sum(1 for state in states if state.get("vehicle_id") is None)
+    if missing:
+        raise ValueError(f"{missing} state(s) have no vehicle_id; checkpointed runs need one per vehicle")
+    seen, repeated = set(), set()
+    for state in states:
+        vehicle_id = state["vehicle_id"]
+        (repeated if vehicle_id in seen else seen).add(vehicle_id)
+    if repeated:
+        shown = ", ".join(sorted(map(str, repeated))[:10])
+        raise ValueError(f"vehicle ids repeat in a checkpointed run ({len(repeated)}): {shown}")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_checkpoint_store(path):
+    """Return the process-wide CheckpointStore for `path`, opening it on first use."""
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = CheckpointStore(path)
+    return store
+
+
+def _begin(name, state):
+    # (store, run_id, vehicle_id) if this node should run and be checkpointed,
+    # None if checkpointing is off, False if the node already completed
+    target = state.get(STATE_KEY)
+    if target is None:
+        return None
+    if name in state.get(COMPLETED_KEY, ()):
+        return False
+    vehicle_id = state.get("vehicle_id")
+    if vehicle_id is None:
+        raise ValueError("checkpointed states need a vehicle_id")
+    return get_checkpoint_store(target["path"]), target["run_id"], vehicle_id
+
+
+def _finish(checkpoint, name, state, final):
+    store, run_id, vehicle_id = checkpoint
+    state[COMPLETED_KEY] = list(state.get(COMPLETED_KEY, ())) + [name]
+    store.save(run_id, vehicle_id, name, state, completed=final)
+    return state
+
+
+def checkpoint_node(name, fn, final=False):
+    """
+    Wrap a sync or async node so it is skipped when the state already
+    completed it and the state is checkpointed after it runs. States without
+    a checkpoint target pass straight through. `final` marks the last node.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_node(state):
+            checkpoint = _begin(name, state)
+            if not checkpoint:
+                return state if checkpoint is False else await fn(state)
+            try:
+                result = await fn(state)
+            except Exception as e:
+                checkpoint[0].record_error(checkpoint[1], checkpoint[2], name, repr(e))
+                raise
+            return _finish(checkpoint, name, result, final)
+        return async_node
+
+    @functools.wraps(fn)
+    def node(state):
+        checkpoint = _begin(name, state)
+        if not checkpoint:
+            return state if checkpoint is False else fn(state)
+        try:
+            result = fn(state)
+        except Exception as e:
+            checkpoint[0].record_error(checkpoint[1], checkpoint[2], name, repr(e))
+            raise
+        return _finish(checkpoint, name, result, final)
+    return node
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a checkpointed fleet run.")
+    parser.add_argument("path", help="Checkpoint store (SQLite file)")
+    parser.add_argument("--run-id", help="Run to inspect (default: list runs)")
+    parser.add_argument("--urgency")
+    parser.add_argument("--status")
+    parser.add_argument("--failed", action="store_true", help="Only vehicles whose last node failed")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    store = CheckpointStore(args.path)
+    if args.run_id is None:
+        for run_id in store.runs():
+            print(store.progress(run_id))
+    else:
+        print(store.progress(args.run_id))
+        results = store.iter_results(args.run_id, urgency=args.urgency, status=args.status,
+                                     failed=True if args.failed else None)
+        for i, result in enumerate(results):
+            if i == args.limit:
+                print("...")
+                break
+            print(result)
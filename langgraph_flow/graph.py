@@ -1,38 +1,89 @@
+import importlib
 import os
 import sys
+import threading
+from functools import lru_cache
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-
-from langgraph.graph import StateGraph, END
 from .state import initial_state
+from .checkpoints import checkpoint_node
+from .instrumentation import instrument_node
 
-from agents.battery_agent import BatteryInsightAgent
-from agents.service_planner_agent import ServicePlannerAgent
-from agents.scheduler_agent import SchedulerAgent
-from agents.communicator_agent import ComunicationAgent
+# Importing this module stays cheap: langgraph, the agents and what they
+# pull in (pandas, langchain, the embedding model) are imported on first use
+DEFAULT_DATA_PATH = 'battery_logs.csv'
+AGENT_MODULES = (
+    'agents.battery_agent',
+    'agents.service_planner_agent',
+    'agents.scheduler_agent',
+    'agents.communicator_agent',
+)
+NODE_NAMES = ("battery_insight", "service_plan", "schedule_appointment", "communicate")
 
-def battery_node(state):
+def load_agents():
+    """Import every agent module now, e.g. in a worker initializer, instead of in the first run."""
+    for module in AGENT_MODULES:
+        importlib.import_module(module)
+
+def _battery_agent(state):
+    from agents.battery_agent import BatteryInsightAgent
+
+    # Prefer telemetry handed over in the state; the file path is only a fallback
+    data = state.get("battery_data")
+    if data is None:
+        data = state.get("battery_data_csv")
+    data_path = state.get("battery_data_path", DEFAULT_DATA_PATH)
     return  BatteryInsightAgent(state=state, 
-                                data_path='battery_logs.csv').analyze()
+                                data_path=data_path,
+                                data=data)
+
+def battery_node(state):
+    return _battery_agent(state).analyze()
 
 def service_plan_node(state):
+    from agents.service_planner_agent import ServicePlannerAgent
     return ServicePlannerAgent(state=state).plan()
 
 def schedule_node(state):
+    from agents.scheduler_agent import SchedulerAgent
     return SchedulerAgent(state=state).schedule()
 
 def communicate_node(state):
+    from agents.communicator_agent import ComunicationAgent
     return ComunicationAgent(state=state).email_summary()
 
-def build_graph(state=None):
-    if state is None:
-        state = initial_state()
-    
+# Async variants: blocking file, pandas and embedding work is offloaded to
+# threads, so one event loop can multiplex many vehicle workflows
+async def abattery_node(state):
+    return await _battery_agent(state).aanalyze()
+
+async def aservice_plan_node(state):
+    from agents.service_planner_agent import ServicePlannerAgent
+    return await ServicePlannerAgent(state=state).aplan()
+
+async def aschedule_node(state):
+    from agents.scheduler_agent import SchedulerAgent
+    return await SchedulerAgent(state=state).aschedule()
+
+async def acommunicate_node(state):
+    from agents.communicator_agent import ComunicationAgent
+    return await ComunicationAgent(state=state).aemail_summary()
+
+def create_workflow(use_async=False):
+    """Register the four agent nodes (sync or async variants, instrumented and checkpointed) and their edges (uncompiled)."""
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(dict)
-    workflow.add_node("battery_insight", battery_node)
-    workflow.add_node("service_plan", service_plan_node)
-    workflow.add_node("schedule_appointment", schedule_node)
-    workflow.add_node("communicate", communicate_node)
+    nodes = {
+        "battery_insight": abattery_node if use_async else battery_node,
+        "service_plan": aservice_plan_node if use_async else service_plan_node,
+        "schedule_appointment": aschedule_node if use_async else schedule_node,
+        "communicate": acommunicate_node if use_async else communicate_node,
+    }
+    final = NODE_NAMES[-1]
+    for name, node in nodes.items():
+        # Checkpointing is outermost, so nodes skipped on resume are not measured
+        workflow.add_node(name, checkpoint_node(name, instrument_node(name, node), final=name == final))
 
     workflow.set_entry_point("battery_insight")
     workflow.add_edge("battery_insight", "service_plan")
@@ -42,12 +93,76 @@ def build_graph(state=None):
 
     #workflow.compile().draw("agentic_workflow_dag.png")
     #print("✅ DAG diagram saved as 'agentic_workflow_dag.png'")
+    return workflow
+
+class WorkflowRunner:
+    """
+    Compiles the workflow once and reuses the compiled app for every run.
+
+    `app` runs the synchronous nodes; `async_app`, used by ainvoke and
+    abatch, runs the async ones and is compiled on first use. Use
+    get_runner() for the shared, process-wide instance.
+    """
+
+    def __init__(self):
+        self.app = create_workflow().compile()
+        self._async_app = None
+        self._lock = threading.Lock()
+        #self.app.draw("agentic_workflow_compiled_dag.png")
+        #print("✅ Compiled DAG diagram saved as 'agentic_workflow_compiled_dag.png'")
+
+    @property
+    def async_app(self):
+        if self._async_app is None:
+            with self._lock:
+                if self._async_app is None:
+                    self._async_app = create_workflow(use_async=True).compile()
+        return self._async_app
+
+    def invoke(self, state=None):
+        if state is None:
+            state = initial_state()
+        return self.app.invoke(state)
+
+    def stream(self, state=None):
+        """Run one workflow, yielding (node name, state after that node) as each node finishes."""
+        if state is None:
+            state = initial_state()
+        for update in self.app.stream(state, stream_mode="updates"):
+            yield from update.items()
+
+    async def ainvoke(self, state=None):
+        if state is None:
+            state = initial_state()
+        return await self.async_app.ainvoke(state)
+
+    def batch(self, states, max_concurrency=None, return_exceptions=False):
+        """Run many states through the compiled app; results keep input order."""
+        config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        return self.app.batch(list(states), config=config,
+                              return_exceptions=return_exceptions)
+
+    async def abatch(self, states, max_concurrency=None, return_exceptions=False):
+        """Run many states concurrently on the current event loop; results keep input order."""
+        config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        return await self.async_app.abatch(list(states), config=config,
+                                           return_exceptions=return_exceptions)
+
+@lru_cache(maxsize=None)
+def get_runner():
+    """Return the process-wide WorkflowRunner, compiling the graph on first use."""
+    return WorkflowRunner()
+
+def compile_graph():
+    """Return the compiled workflow app shared by this process."""
+    return get_runner().app
+
+def build_graph(state=None):
+    return get_runner().invoke(state)
 
-    app = workflow.compile()
-    #app.draw("agentic_workflow_compiled_dag.png")
-    #print("✅ Compiled DAG diagram saved as 'agentic_workflow_compiled_dag.png'")
-    final_state = app.invoke(state)
-    return final_state
+async def abuild_graph(state=None):
+    """Async entry point: run one workflow without blocking the event loop."""
+    return await get_runner().ainvoke(state)
 
 if __name__ == "__main__":
     state = initial_state()
@@ -0,0 +1,363 @@
+"""
+Per-node latency and memory instrumentation for the workflow graph.
+
+create_workflow() wraps every node with instrument_node(), which records
+for each node run:
+
+  * wall time, and CPU time of the thread running a sync node (None for
+    async nodes: their thread is the event loop, shared with other tasks),
+  * peak traced allocation while the node ran, when tracemalloc is enabled
+    (configure_instrumentation(trace_memory=True), or WORKFLOW_TRACE_MEMORY=1
+    in the dashboard; it slows allocation-heavy code, so it is off by
+    default). tracemalloc's peak is process-wide, so it is only reported
+    for node runs that did not overlap another traced node run (thread-pool
+    batches and concurrent async workflows mostly record None),
+  * sub-spans opened by the agents (agents/tracing.py): csv_load,
+    embedding, faiss_search and slot_selection.
+
+Each record is appended to `state["node_metrics"]` and added to the
+process-wide MetricsRecorder, which exports Prometheus text
+(`*.prom`/`*.txt`) or OpenTelemetry-compatible JSON (`*.json`). Set
+WORKFLOW_METRICS_PATH to export there at most every few seconds and at
+exit, or call get_recorder().export(path). Process-pool batches
+(langgraph_flow.batch) export from the parent only: workers do not export,
+and the parent records the node runs each worker added to a vehicle's
+state (not those restored from a checkpoint).
+
+Retrieval queries batched across concurrent async workflows are traced in
+the workflow whose query opened the batch.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from agents.tracing import collect_spans
+
+METRICS_PATH_ENV = "WORKFLOW_METRICS_PATH"
+TRACE_MEMORY_ENV = "WORKFLOW_TRACE_MEMORY"
+EXPORT_INTERVAL_S = 5.0
+SERVICE_NAME = "agentic-battery-workflow"
+
+_settings = {"enabled": True, "trace_memory": False}
+
+# Node runs currently measuring memory; a peak is only theirs if none overlapped
+_memory_runs = set()
+_memory_lock = threading.Lock()
+
+
+def configure_instrumentation(enabled=None, trace_memory=None):
+    """Turn node instrumentation or tracemalloc peak tracking on or off for this process."""
+    if enabled is not None:
+        _settings["enabled"] = enabled
+    if trace_memory is not None:
+        _settings["trace_memory"] = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+    return dict(_settings)
+
+
+class _NodeRun:
+    # Measures one node run; used by both the sync and the async wrapper
+    def __init__(self, name, state, thread_cpu=True):
+        self.name = name
+        self.state = state
+        self.thread_cpu = thread_cpu
+        self.spans = []
+        self.overlapped = False
+
+    def start(self):
+        self.start_ns = time.time_ns()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.memory = _settings["trace_memory"] and tracemalloc.is_tracing()
+        if self.memory:
+            with _memory_lock:
+                if _memory_runs:
+                    # Shared peak: neither this run nor the running ones can claim it
+                    self.overlapped = True
+                    for run in _memory_runs:
+                        run.overlapped = True
+                else:
+                    self.alloc_start = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                _memory_runs.add(self)
+
+    def _peak_alloc(self):
+        if not self.memory:
+            return None
+        with _memory_lock:
+            _memory_runs.discard(self)
+            if self.overlapped:
+                return None
+            return max(0, tracemalloc.get_traced_memory()[1] - self.alloc_start)
+
+    def finish(self, result, error=None):
+        record = {
+            "node": self.name,
+            "start_ns": self.start_ns,
+            "wall_s": time.perf_counter() - self.wall_start,
+            "cpu_s": time.thread_time() - self.cpu_start if self.thread_cpu else None,
+            "peak_alloc_bytes": self._peak_alloc(),
+            "spans": self.spans,
+            "error": repr(error) if error is not None else None,
+        }
+        state = result if isinstance(result, dict) else self.state
+        trace_id = state.setdefault("trace_id", secrets.token_hex(16))
+        state.setdefault("node_metrics", []).append(record)
+        get_recorder().record(trace_id, record)
+
+
+def instrument_node(name, fn):
+    """Wrap a sync or async node function so every run is measured."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_node(state):
+            if not _settings["enabled"]:
+                return await fn(state)
+            run = _NodeRun(name, state, thread_cpu=False)
+            with collect_spans(run.spans):
+                run.start()
+                try:
+                    result = await fn(state)
+                except Exception as e:
+                    run.finish(state, e)
+                    raise
+            run.finish(result)
+            return result
+        return async_node
+
+    @functools.wraps(fn)
+    def node(state):
+        if not _settings["enabled"]:
+            return fn(state)
+        run = _NodeRun(name, state)
+        with collect_spans(run.spans):
+            run.start()
+            try:
+                result = fn(state)
+            except Exception as e:
+                run.finish(state, e)
+                raise
+        run.finish(result)
+        return result
+    return node
+
+
+class MetricsRecorder:
+    """
+    Process-wide aggregate of node and span measurements.
+
+    Keeps count/sum/max per node and per (node, span) for Prometheus, and
+    the most recent `max_traces` node records for OpenTelemetry export.
+    With `export_path`, the file is rewritten at most every
+    `export_interval_s` as records come in, and once more at exit.
+    """
+
+    def __init__(self, export_path=None, max_traces=1000, export_interval_s=EXPORT_INTERVAL_S):
+        self.export_path = export_path
+        self.export_interval_s = export_interval_s
+        self._last_export = float("-inf")  # the first record is exported right away
+        self._unexported = False
+        if export_path:
+            atexit.register(self.flush)
+        self._lock = threading.Lock()
+        self._nodes = {}  # node -> totals
+        self._spans = {}  # (node, span) -> totals
+        self._recent = deque(maxlen=max_traces)  # (trace_id, record)
+
+    @staticmethod
+    def _add(totals, wall_s, cpu_s, peak=None):
+        totals["count"] += 1
+        totals["wall_s_sum"] += wall_s
+        totals["wall_s_max"] = max(totals["wall_s_max"], wall_s)
+        if cpu_s is not None:
+            totals["cpu_s_sum"] += cpu_s
+        if peak is not None:
+            totals["peak_alloc_bytes_max"] = max(totals["peak_alloc_bytes_max"], peak)
+
+    @staticmethod
+    def _empty():
+        return {"count": 0, "errors": 0, "wall_s_sum": 0.0, "wall_s_max": 0.0, "cpu_s_sum": 0.0,
+                "peak_alloc_bytes_max": 0}
+
+    def record(self, trace_id, record):
+        with self._lock:
+            node = self._nodes.setdefault(record["node"], self._empty())
+            self._add(node, record["wall_s"], record["cpu_s"], record["peak_alloc_bytes"])
+            node["errors"] += record["error"] is not None
+            for s in record["spans"]:
+                self._add(self._spans.setdefault((record["node"], s["name"]), self._empty()),
+                          s["wall_s"], s["cpu_s"])
+            self._recent.append((trace_id, record))
+            self._unexported = True
+            due = bool(self.export_path) and (time.monotonic() - self._last_export >= self.export_interval_s)
+            if due:
+                self._last_export = time.monotonic()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Export to `export_path` now if anything was recorded since the last export."""
+        with self._lock:
+            pending, self._unexported = self._unexported, False
+        if self.export_path and pending:
+            self.export(self.export_path)
+
+    def summary(self):
+        """{"nodes": {node: totals}, "spans": {"node/span": totals}}"""
+        with self._lock:
+            return {
+                "nodes": {name: dict(totals) for name, totals in self._nodes.items()},
+                "spans": {f"{node}/{name}": dict(totals) for (node, name), totals in self._spans.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._nodes.clear()
+            self._spans.clear()
+            self._recent.clear()
+
+    def prometheus_text(self):
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value:.9g}")
+
+        nodes = summary["nodes"].items()
+        spans = [(dict(zip(("node", "span"), key.split("/", 1))), totals)
+                 for key, totals in summary["spans"].items()]
+        metric("workflow_node_runs_total", "counter", "Node runs.",
+               [({"node": n}, t["count"]) for n, t in nodes])
+        metric("workflow_node_errors_total", "counter", "Node runs that raised.",
+               [({"node": n}, t["errors"]) for n, t in nodes])
+        metric("workflow_node_wall_seconds_total", "counter", "Wall time spent in the node.",
+               [({"node": n}, t["wall_s_sum"]) for n, t in nodes])
+        metric("workflow_node_wall_seconds_max", "gauge", "Slowest node run.",
+               [({"node": n}, t["wall_s_max"]) for n, t in nodes])
+        metric("workflow_node_cpu_seconds_total", "counter", "Thread CPU time spent in sync node runs.",
+               [({"node": n}, t["cpu_s_sum"]) for n, t in nodes])
+        metric("workflow_node_peak_alloc_bytes_max", "gauge", "Largest traced allocation peak (tracemalloc).",
+               [({"node": n}, t["peak_alloc_bytes_max"]) for n, t in nodes])
+        metric("workflow_span_runs_total", "counter", "Sub-span runs.",
+               [(labels, t["count"]) for labels, t in spans])
+        metric("workflow_span_wall_seconds_total", "counter", "Wall time spent in the sub-span.",
+               [(labels, t["wall_s_sum"]) for labels, t in spans])
+        metric("workflow_span_cpu_seconds_total", "counter", "Thread CPU time spent in the sub-span.",
+               [(labels, t["cpu_s_sum"]) for labels, t in spans])
+        return "\n".join(lines) + "\n"
+
+    def otel_json(self):
+        """Recent node runs and their sub-spans in OTLP/JSON trace layout."""
+        def attributes(values):
+            out = []
+            for key, value in values.items():
+                if value is None:
+                    continue
+                if isinstance(value, bool):
+                    typed = {"boolValue": value}
+                elif isinstance(value, int):
+                    typed = {"intValue": str(value)}
+                elif isinstance(value, float):
+                    typed = {"doubleValue": value}
+                else:
+                    typed = {"stringValue": str(value)}
+                out.append({"key": key, "value": typed})
+            return out
+
+        with self._lock:
+            recent = list(self._recent)
+        spans = []
+        for trace_id, record in recent:
+            node_span_id = secrets.token_hex(8)
+            spans.append({
+                "traceId": trace_id,
+                "spanId": node_span_id,
+                "name": record["node"],
+                "kind": 1,
+                "startTimeUnixNano": str(record["start_ns"]),
+                "endTimeUnixNano": str(record["start_ns"] + int(record["wall_s"] * 1e9)),
+                "attributes": attributes({"cpu_s": record["cpu_s"],
+                                          "peak_alloc_bytes": record["peak_alloc_bytes"]}),
+                "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+            })
+            for s in record["spans"]:
+                spans.append({
+                    "traceId": trace_id,
+                    "spanId": secrets.token_hex(8),
+                    "parentSpanId": node_span_id,
+                    "name": s["name"],
+                    "kind": 1,
+                    "startTimeUnixNano": str(s["start_ns"]),
+                    "endTimeUnixNano": str(s["start_ns"] + int(s["wall_s"] * 1e9)),
+                    "attributes": attributes(dict(s["attributes"], cpu_s=s["cpu_s"])),
+                })
+        return {"resourceSpans": [{
+            "resource": {"attributes": attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "langgraph_flow.instrumentation"}, "spans": spans}],
+        }]}
+
+    def export(self, path):
+        """Write Prometheus text, or OpenTelemetry JSON if `path` ends in .json (atomic replace)."""
+        if path.endswith(".json"):
+            content = json.dumps(self.otel_json())
+        else:
+            content = self.prometheus_text()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return path
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Return the process-wide MetricsRecorder (exporting to $WORKFLOW_METRICS_PATH if set)."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = MetricsRecorder(export_path=os.environ.get(METRICS_PATH_ENV))
+    return _recorder
+
+
+def configure_recorder(**kwargs):
+    """Replace the process-wide recorder, e.g. configure_recorder(export_path=None) in pool workers."""
+    global _recorder
+    with _recorder_lock:
+        _recorder = MetricsRecorder(**kwargs)
+    return _recorder
+
+
+def node_breakdown(state):
+    """Rows of (node, span, wall_ms, cpu_ms, peak_alloc_kb) for one run's state, e.g. for a table."""
+    rows = []
+    for record in state.get("node_metrics", []):
+        peak = record["peak_alloc_bytes"]
+        cpu_s = record["cpu_s"]
+        rows.append({"node": record["node"], "span": "(total)",
+                     "wall_ms": round(record["wall_s"] * 1000, 2),
+                     "cpu_ms": round(cpu_s * 1000, 2) if cpu_s is not None else None,
+                     "peak_alloc_kb": round(peak / 1024, 1) if peak is not None else None})
+        for s in record["spans"]:
+            rows.append({"node": record["node"], "span": s["name"],
+                         "wall_ms": round(s["wall_s"] * 1000, 2), "cpu_ms": round(s["cpu_s"] * 1000, 2),
+                         "peak_alloc_kb": None})
+    return rows
@@ -0,0 +1,85 @@
+"""
+Background workflow runs for interactive front ends.
+
+start_job() runs one workflow on a small shared thread pool and returns at
+once; the caller (e.g. the Streamlit dashboard, between reruns) polls the
+returned WorkflowJob for progress and picks up the final state when it is
+done, so a slow run never blocks the UI thread.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .graph import NODE_NAMES, get_runner
+
+JOB_WORKERS = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="workflow-job")
+    return _pool
+
+
+class WorkflowJob:
+    """
+    One workflow run in the background.
+
+    `completed` lists the nodes finished so far; `result()` returns the final
+    state (re-raising the node's exception if the run failed) once `done`.
+    """
+
+    def __init__(self, state):
+        self.completed = []
+        self.started_at = time.time()
+        self.finished_at = None
+        self._future = _get_pool().submit(self._run, state)
+
+    def _run(self, state):
+        try:
+            final = state
+            for node, update in get_runner().stream(state):
+                self.completed.append(node)
+                final = update
+            return final
+        finally:
+            self.finished_at = time.time()
+
+    @property
+    def done(self):
+        return self._future.done()
+
+    @property
+    def progress(self):
+        """Fraction of the workflow's nodes that have finished (0.0 to 1.0)."""
+        return len(self.completed) / len(NODE_NAMES)
+
+    @property
+    def current_node(self):
+        """The node running now, or None once the run is over."""
+        if self.done or len(self.completed) >= len(NODE_NAMES):
+            return None
+        return NODE_NAMES[len(self.completed)]
+
+    @property
+    def elapsed_s(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def error(self):
+        """The exception that stopped the run, or None (also while it is still running)."""
+        return self._future.exception() if self.done else None
+
+    def result(self, timeout=None):
+        return self._future.result(timeout=timeout)
+
+
+def start_job(state):
+    """Start running the workflow for `state` in the background and return its WorkflowJob."""
+    return WorkflowJob(state)
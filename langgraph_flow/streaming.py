@@ -0,0 +1,63 @@
+"""
+Real-time path from live SoH feeds to service planning and scheduling.
+
+Events from StreamingAnomalyDetector that need attention (an anomaly, or a
+status change to a worse degradation level) are handed straight to the
+service_plan and schedule_appointment nodes, without waiting for a batch run.
+When a vehicle's status worsens, the higher urgency moves its existing
+appointment to an earlier slot (see SlotInventory.book).
+"""
+import asyncio
+
+from .graph import communicate_node, schedule_node, service_plan_node
+from .state import initial_state
+
+from agents.battery_agent import DEFAULT_STATUS, STATUS_RULES
+from agents.streaming_detector import StreamingAnomalyDetector
+
+TRIGGER_EVENTS = ("anomaly", "status_change")
+# Higher is worse: STATUS_RULES runs from most to least severe, the default status is the mildest
+STATUS_SEVERITY = {status: len(STATUS_RULES) - i for i, (_, status, _) in enumerate(STATUS_RULES)}
+STATUS_SEVERITY[DEFAULT_STATUS[0]] = 0
+
+
+def needs_action(event):
+    """Anomalies always trigger; status changes only when the status gets worse."""
+    if event["type"] not in TRIGGER_EVENTS:
+        return False
+    if event["type"] == "status_change":
+        return STATUS_SEVERITY.get(event["status"], 0) > STATUS_SEVERITY.get(event.get("previous_status"), 0)
+    return True
+
+
+def respond(detector, event):
+    """Run service planning, scheduling and communication for the event's vehicle."""
+    state = initial_state()
+    state["vehicle_id"] = event["vehicle_id"]
+    state["trigger_event"] = event
+    state["battery_insight"] = detector.insight(event["vehicle_id"])
+    state = service_plan_node(state)
+    state = schedule_node(state)
+    return communicate_node(state)
+
+
+def stream_responses(records, detector=None):
+    """Yield (event, final_state) for every actionable event in a record stream."""
+    detector = detector or StreamingAnomalyDetector()
+    for event in detector.process(records):
+        if needs_action(event):
+            yield event, respond(detector, event)
+
+
+async def astream_responses(queue, detector=None):
+    """
+    Async variant over an asyncio.Queue of records or micro-batches (None stops).
+
+    Planning runs in a worker thread so the event loop stays free for other
+    tasks, such as the producers filling the queue. This generator reads no
+    further records until the current event's response is ready.
+    """
+    detector = detector or StreamingAnomalyDetector()
+    async for event in detector.aprocess(queue):
+        if needs_action(event):
+            yield event, await asyncio.to_thread(respond, detector, event)
@@ -0,0 +1,26 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from agents.downsample import FLEET_WORST_SERIES, fleet_overview
+
+
+def test_fleet_overview_is_bounded():
+    vehicles, days, points = 3000, 400, 500
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "vin": np.repeat(np.arange(vehicles).astype(str), days),
+        "date": np.tile(pd.date_range("2025-01-01", periods=days), vehicles),
+        "SoH": 100 - rng.random(vehicles * days) * 10,
+    })
+    worst = df.loc[df.groupby("vin")["date"].idxmax()].nsmallest(1, "SoH")["vin"].iloc[0]
+
+    chart = fleet_overview(df, "vin", "date", "SoH", n_out=points)
+
+    assert len(chart) <= points
+    assert chart["series"].nunique() == FLEET_WORST_SERIES + 2
+    assert {"Fleet mean", "Fleet min", worst} <= set(chart["series"])
+    assert chart.groupby("series")["date"].is_monotonic_increasing.all()
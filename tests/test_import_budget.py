@@ -0,0 +1,10 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.import_budget import check_imports
+
+
+def test_modules_import_within_budget():
+    failures = check_imports(repeat=3, report=lambda line: None)
+    assert not failures, "\n".join(failures)
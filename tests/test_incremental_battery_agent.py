@@ -0,0 +1,36 @@
+import math
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from agents.battery_agent import BatteryInsightAgent
+from agents.incremental_battery_agent import IncrementalBatteryAgent
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'battery_logs.csv')
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[key], b[key]) for key in a)
+    return a == b
+
+
+def test_split_updates_match_full_analysis(tmp_path):
+    df = pd.read_csv(DATA_PATH)
+    full = BatteryInsightAgent(state={}, data=df.copy()).analyze()["battery_insight"]
+
+    agent = IncrementalBatteryAgent(state={}, state_dir=str(tmp_path))
+    for part in np.array_split(np.arange(len(df)), 4):
+        agent.analyze(new_rows=df.iloc[part])
+    # Reload the persisted state, as the next nightly run would
+    incremental = IncrementalBatteryAgent(state={}, state_dir=str(tmp_path)).analyze()["battery_insight"]
+
+    assert full.keys() == incremental.keys()
+    assert full["forecast"] is not None
+    for key in full:
+        assert _same(full[key], incremental[key]), key
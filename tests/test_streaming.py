@@ -0,0 +1,26 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from agents.slot_inventory import configure_slot_inventory
+from langgraph_flow.streaming import stream_responses
+
+
+def test_worsening_status_moves_appointment_earlier(tmp_path):
+    configure_slot_inventory(path=str(tmp_path / "slots.db"))
+    dates = pd.date_range("2025-01-01", periods=12, freq="D")
+    soh = [100.0]
+    for drop in [0.05] * 5 + [0.4] * 3 + [1.5] * 3:  # normal, then moderate, then rapid
+        soh.append(soh[-1] - drop)
+    records = [{"vin": "V1", "date": d, "SoH": s} for d, s in zip(dates, soh)]
+
+    responses = [(event, state) for event, state in stream_responses(records)
+                 if event["type"] == "status_change"]
+    statuses = [event["status"] for event, _ in responses]
+    assert statuses == ["moderate degradation", "rapid degradation"]
+
+    medium, high = (state["appointment"] for _, state in responses)
+    assert medium["status"] == high["status"] == "scheduled"
+    assert high["slot"] < medium["slot"]